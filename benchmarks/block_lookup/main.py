@@ -0,0 +1,65 @@
+import time
+
+import click
+
+from marker.schema import BlockTypes
+from marker.schema.blocks import Text
+from marker.schema.document import Document
+from marker.schema.groups.page import PageGroup
+from marker.schema.polygon import PolygonBox
+
+
+def build_document(page_count: int, blocks_per_page: int) -> Document:
+    pages = []
+    for page_id in range(page_count):
+        page = PageGroup(page_id=page_id, polygon=PolygonBox.from_bbox([0, 0, 612, 792]))
+        for i in range(blocks_per_page):
+            block = page.add_block(Text, PolygonBox.from_bbox([0, i * 10, 612, i * 10 + 10]))
+            page.add_structure(block)
+        pages.append(page)
+    return Document(filepath="synthetic.pdf", pages=pages)
+
+
+def linear_next_block(document: Document, block, ignored_block_types):
+    # The lookups before indexing: a linear scan for the page, then list.index into the structure
+    page = next(p for p in document.pages if p.page_id == block.page_id)
+    structure_idx = page.structure.index(block.id) + 1
+    for next_block_id in page.structure[structure_idx:]:
+        if next_block_id.block_type not in ignored_block_types:
+            return page.get_block(next_block_id)
+
+    for next_page in document.pages[document.pages.index(page) + 1:]:
+        for next_block_id in next_page.structure:
+            if next_block_id.block_type not in ignored_block_types:
+                return next_page.get_block(next_block_id)
+    return None
+
+
+def walk(document: Document, next_block_fn) -> float:
+    ignored_block_types = [BlockTypes.Line, BlockTypes.Span]
+    start = time.time()
+    block = document.pages[0].get_block(document.pages[0].structure[0])
+    count = 0
+    while block is not None:
+        block = next_block_fn(document, block, ignored_block_types)
+        count += 1
+    return time.time() - start, count
+
+
+@click.command(help="Benchmark neighbor block lookups on a synthetic document.")
+@click.option("--pages", type=int, default=2000, help="Number of pages in the document.")
+@click.option("--blocks_per_page", type=int, default=20, help="Number of blocks on each page.")
+def main(pages: int, blocks_per_page: int):
+    document = build_document(pages, blocks_per_page)
+
+    indexed_time, count = walk(document, lambda d, b, ignored: d.get_next_block(b, ignored))
+    linear_time, _ = walk(document, linear_next_block)
+
+    print(f"Walked {count} blocks over {pages} pages")
+    print(f"Linear scan: {linear_time:.2f}s")
+    print(f"Indexed: {indexed_time:.2f}s")
+    print(f"Speedup: {linear_time / indexed_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
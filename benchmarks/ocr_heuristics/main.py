@@ -0,0 +1,84 @@
+import random
+import re
+import time
+
+import click
+
+from marker.providers.pdf import PdfProvider
+from marker.providers.utils import alphanum_ratio
+
+WORD_CHARS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+GARBLED_CHARS = "!@#$%^&*()_+=[]{}|;:,.<>?/~`�"
+
+
+def build_page_text(rng: random.Random, chars: int, garbled: bool) -> str:
+    # Spans joined the same way check_line_spans joins them
+    alphabet = GARBLED_CHARS if garbled else WORD_CHARS
+    spans = []
+    total = 0
+    while total < chars:
+        words = [
+            "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 10)))
+            for _ in range(rng.randint(1, 8))
+        ]
+        span = " ".join(words)
+        spans.append(f" {span}\n")
+        total += len(span) + 2
+    return "".join(spans)
+
+
+def regex_detect_bad_ocr(provider: PdfProvider, text: str) -> bool:
+    # The checks before they were computed in one pass
+    if len(text) == 0:
+        return True
+
+    spaces = len(re.findall(r"\s+", text))
+    alpha_chars = len(re.sub(r"\s+", "", text))
+    if spaces / (alpha_chars + spaces) > provider.ocr_space_threshold:
+        return True
+
+    newlines = len(re.findall(r"\n+", text))
+    non_newlines = len(re.sub(r"\n+", "", text))
+    if newlines / (newlines + non_newlines) > provider.ocr_newline_threshold:
+        return True
+
+    if alphanum_ratio(text) < provider.ocr_alphanum_threshold:
+        return True
+
+    invalid_chars = len([c for c in text if c in provider.ocr_invalid_chars])
+    if invalid_chars > max(6.0, len(text) * 0.03):
+        return True
+
+    return False
+
+
+def time_checks(texts, check_fn):
+    start = time.time()
+    results = [check_fn(text) for text in texts]
+    return time.time() - start, results
+
+
+@click.command(help="Benchmark the bad text heuristics on synthetic page text.")
+@click.option("--pages", type=int, default=200, help="Number of pages to check.")
+@click.option("--chars_per_page", type=int, default=50000, help="Number of characters on each page.")
+def main(pages: int, chars_per_page: int):
+    rng = random.Random(0)
+    texts = [build_page_text(rng, chars_per_page, garbled=i % 4 == 0) for i in range(pages)]
+
+    # The heuristics only read config, so the provider does not need a file
+    provider = PdfProvider.__new__(PdfProvider)
+
+    regex_time, regex_results = time_checks(
+        texts, lambda text: regex_detect_bad_ocr(provider, text)
+    )
+    stats_time, stats_results = time_checks(texts, provider.detect_bad_ocr)
+    assert regex_results == stats_results
+
+    print(f"Checked {pages} pages of {chars_per_page} characters")
+    print(f"Regex passes: {regex_time:.2f}s")
+    print(f"Single pass: {stats_time:.2f}s")
+    print(f"Speedup: {regex_time / stats_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
-from typing import Annotated
+from typing import Annotated, Callable
 
 from marker.builders import BaseBuilder
 from marker.builders.layout import LayoutBuilder
 from marker.builders.line import LineBuilder
 from marker.builders.ocr import OcrBuilder
+from marker.metrics import ConversionMetrics, measure
+from marker.providers import LazyPageImage, PageImageCache, PagePlan
 from marker.providers.pdf import PdfProvider
 from marker.schema import BlockTypes
 from marker.schema.document import Document
@@ -27,27 +29,84 @@ class DocumentBuilder(BaseBuilder):
         bool,
         "Disable OCR processing.",
     ] = False
+    max_cached_page_images: Annotated[
+        int,
+        "The maximum number of rendered page images to keep in memory.  Pages are rendered on first use.",
+        "Default is None, which keeps every rendered image.",
+    ] = None
+    max_cached_image_mb: Annotated[
+        int,
+        "The maximum memory, in megabytes, for cached page images and the crops and masked copies made from them.",
+        "The least recently used pages are evicted first, and rendered again if they are needed.",
+    ] = 4096
+    prefetch_highres_images: Annotated[
+        bool,
+        "Render the high-resolution images of pages without a usable text layer up front, along with the low-resolution images.",
+        "This is faster when many pages will be OCRed, like with scanned documents.",
+    ] = False
+
+    def __call__(self, provider: PdfProvider, layout_builder: LayoutBuilder, line_builder: LineBuilder, ocr_builder: OcrBuilder, progress_callback: Callable | None = None, metrics: ConversionMetrics | None = None):
+        def report_progress(stage: str):
+            if progress_callback is not None:
+                progress_callback(stage, pages=len(document.pages))
 
-    def __call__(self, provider: PdfProvider, layout_builder: LayoutBuilder, line_builder: LineBuilder, ocr_builder: OcrBuilder):
-        document = self.build_document(provider)
-        layout_builder(document, provider)
-        line_builder(document, provider)
+        def run_builder(builder):
+            with measure(metrics, type(builder).__name__, "builder", len(document.pages)):
+                builder(document, provider)
+
+        with measure(metrics, type(self).__name__, "builder"):
+            document = self.build_document(provider)
+            self.prefetch_page_images(document, provider)
+        report_progress("layout")
+        run_builder(layout_builder)
+        report_progress("lines")
+        run_builder(line_builder)
         if not self.disable_ocr:
-            ocr_builder(document, provider)
+            report_progress("ocr")
+            run_builder(ocr_builder)
         return document
 
+    def prefetch_page_images(self, document: Document, provider: PdfProvider):
+        # Every low-resolution image is needed for layout, so render them together
+        lazy_images = [page.lowres_image for page in document.pages]
+        lazy_images = [image for image in lazy_images if isinstance(image, LazyPageImage)]
+        if len(lazy_images) == 0:
+            return
+
+        # High-resolution images are only needed up front for pages that will be OCRed
+        ocr_idxs = set()
+        if self.prefetch_highres_images and not self.disable_ocr:
+            ocr_idxs = {
+                image.idx
+                for image in lazy_images
+                if provider.get_page_plan(image.idx) == PagePlan.ocr
+            }
+
+        cache = lazy_images[0].cache
+        if ocr_idxs:
+            cache.prefetch(
+                [image.idx for image in lazy_images if image.idx in ocr_idxs],
+                [self.lowres_image_dpi, self.highres_image_dpi],
+            )
+        cache.prefetch(
+            [image.idx for image in lazy_images if image.idx not in ocr_idxs],
+            [self.lowres_image_dpi],
+        )
+
     def build_document(self, provider: PdfProvider):
         PageGroupClass: PageGroup = get_block_class(BlockTypes.Page)
-        lowres_images = provider.get_images(provider.page_range, self.lowres_image_dpi)
-        highres_images = provider.get_images(provider.page_range, self.highres_image_dpi)
+        max_bytes = None
+        if self.max_cached_image_mb is not None:
+            max_bytes = self.max_cached_image_mb * 1024 * 1024
+        image_cache = PageImageCache(provider, self.max_cached_page_images, max_bytes)
         initial_pages = [
             PageGroupClass(
                 page_id=p,
-                lowres_image=lowres_images[i],
-                highres_image=highres_images[i],
+                lowres_image=LazyPageImage(image_cache, p, self.lowres_image_dpi),
+                highres_image=LazyPageImage(image_cache, p, self.highres_image_dpi),
                 polygon=provider.get_page_bbox(p),
                 refs=provider.get_page_refs(p)
-            ) for i, p in enumerate(provider.page_range)
+            ) for p in provider.page_range
         ]
         DocumentClass: Document = get_block_class(BlockTypes.Document)
         return DocumentClass(filepath=provider.filepath, pages=initial_pages)
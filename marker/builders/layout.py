@@ -11,6 +11,7 @@ from marker.schema.groups.page import PageGroup
 from marker.schema.polygon import PolygonBox
 from marker.schema.registry import get_block_class
 from marker.settings import settings
+from marker.util import SpatialIndex, pipelined_batches, should_pipeline
 
 
 class LayoutBuilder(BaseBuilder):
@@ -42,6 +43,11 @@ class LayoutBuilder(BaseBuilder):
     max_expand_frac: Annotated[
         float, "The maximum fraction to expand the layout box bounds by"
     ] = 0.05
+    pipeline_depth: Annotated[
+        int,
+        "The number of batches of page images to render ahead of the model on a background thread.",
+        "Set to 0 to render every page before running the model.",
+    ] = 2
 
     def __init__(self, layout_model: LayoutPredictor, config=None):
         self.layout_model = layout_model
@@ -84,32 +90,35 @@ class LayoutBuilder(BaseBuilder):
         return layout_results
 
     def surya_layout(self, pages: List[PageGroup]) -> List[LayoutResult]:
-        self.layout_model.disable_tqdm = self.disable_tqdm
-        layout_results = self.layout_model(
-            [p.get_image(highres=False) for p in pages],
-            batch_size=int(self.get_batch_size()),
+        batch_size = int(self.get_batch_size())
+        pipelined = should_pipeline(pages, batch_size, self.pipeline_depth)
+        self.layout_model.disable_tqdm = self.disable_tqdm or pipelined
+        layout_results = pipelined_batches(
+            pages,
+            lambda batch: [p.get_image(highres=False) for p in batch],
+            lambda images: self.layout_model(images, batch_size=batch_size),
+            batch_size,
+            self.pipeline_depth,
+            desc="Recognizing layout",
+            disable_tqdm=self.disable_tqdm,
         )
         return layout_results
 
     def expand_layout_blocks(self, document: Document):
         for page in document.pages:
-            # Collect all blocks on this page as PolygonBox for easy access
             page_blocks = [document.get_block(bid) for bid in page.structure]
+            block_index = SpatialIndex([b.polygon.bbox for b in page_blocks])
 
-            for block_id in page.structure:
-                block = document.get_block(block_id)
+            for block_idx, block in enumerate(page_blocks):
                 if block.block_type in self.expand_block_types:
-                    other_blocks = [b for b in page_blocks if b != block]
-                    if not other_blocks:
+                    _, min_gap = block_index.nearest(block.polygon.bbox, exclude=block_idx)
+                    if min_gap is None:
                         block.polygon = block.polygon.expand(
                             self.max_expand_frac, self.max_expand_frac
                         )
+                        block_index.update(block_idx, block.polygon.bbox)
                         continue
 
-                    min_gap = min(
-                        block.polygon.minimum_gap(other.polygon)
-                        for other in other_blocks
-                    )
                     if min_gap <= 0:
                         continue
 
@@ -126,6 +135,7 @@ class LayoutBuilder(BaseBuilder):
                         min(self.max_expand_frac, x_expand_frac),
                         min(self.max_expand_frac, y_expand_frac),
                     )
+                    block_index.update(block_idx, block.polygon.bbox)
 
     def add_blocks_to_pages(
         self, pages: List[PageGroup], layout_results: List[LayoutResult]
@@ -1,5 +1,4 @@
 from collections import defaultdict
-from copy import deepcopy
 from itertools import chain
 from typing import Annotated, List, Tuple
 
@@ -11,7 +10,7 @@ from surya.detection import DetectionPredictor
 from surya.ocr_error import OCRErrorPredictor
 
 from marker.builders import BaseBuilder
-from marker.providers import ProviderOutput, ProviderPageLines
+from marker.providers import PagePlan, ProviderOutput, ProviderPageLines
 from marker.providers.pdf import PdfProvider
 from marker.schema import BlockTypes
 from marker.schema.document import Document
@@ -20,7 +19,7 @@ from marker.schema.polygon import PolygonBox
 from marker.schema.registry import get_block_class
 from marker.schema.text.line import Line
 from marker.settings import settings
-from marker.util import matrix_intersection_area, sort_text_lines
+from marker.util import SpatialIndex, pipelined_batches, should_pipeline, sort_text_lines
 
 
 class LineBuilder(BaseBuilder):
@@ -88,6 +87,20 @@ class LineBuilder(BaseBuilder):
         "Disable tqdm progress bars.",
     ] = False
     keep_chars: Annotated[bool, "Keep individual characters."] = False
+    provider_lines_only: Annotated[
+        bool,
+        "Use the provider lines on every page as-is, without line detection or OCR error detection.",
+        "The detection and OCR error models are not needed, and pages without provider lines are left empty.",
+    ] = False
+    trust_planned_text_pages: Annotated[
+        bool,
+        "Skip OCR error detection on pages that the provider planned as having a good text layer.",
+    ] = False
+    pipeline_depth: Annotated[
+        int,
+        "The number of batches of page images to prepare ahead of the detection model on a background thread.",
+        "Set to 0 to prepare every page before running the model.",
+    ] = 2
 
     def __init__(
         self,
@@ -121,11 +134,22 @@ class LineBuilder(BaseBuilder):
         return 4
 
     def get_detection_results(
-        self, page_images: List[Image.Image], run_detection: List[bool]
+        self, pages: List[PageGroup], run_detection: List[bool]
     ):
-        self.detection_model.disable_tqdm = self.disable_tqdm
-        page_detection_results = self.detection_model(
-            images=page_images, batch_size=self.get_detection_batch_size()
+        batch_size = self.get_detection_batch_size()
+        pipelined = should_pipeline(pages, batch_size, self.pipeline_depth)
+        self.detection_model.disable_tqdm = self.disable_tqdm or pipelined
+        page_detection_results = pipelined_batches(
+            pages,
+            lambda batch: [
+                page.get_image(highres=False, remove_blocks=self.ocr_remove_blocks)
+                for page in batch
+            ],
+            lambda images: self.detection_model(images=images, batch_size=batch_size),
+            batch_size,
+            self.pipeline_depth,
+            desc="Detecting bboxes",
+            disable_tqdm=self.disable_tqdm,
         )
 
         assert len(page_detection_results) == sum(run_detection)
@@ -137,15 +161,34 @@ class LineBuilder(BaseBuilder):
                 idx += 1
             else:
                 detection_results.append(None)
-        assert idx == len(page_images)
+        assert idx == len(pages)
 
         assert len(run_detection) == len(detection_results)
         return detection_results
 
     def get_all_lines(self, document: Document, provider: PdfProvider):
-        ocr_error_detection_results = self.ocr_error_detection(
-            document.pages, provider.page_lines
-        )
+        if self.provider_lines_only:
+            return self.get_provider_lines(document, provider)
+
+        # Pages without a usable text layer have nothing for the OCR error model to check
+        page_plans = [provider.get_page_plan(page.page_id) for page in document.pages]
+        error_check_pages = [
+            page
+            for page, plan in zip(document.pages, page_plans)
+            if plan == PagePlan.detection
+            or (plan == PagePlan.text and not self.trust_planned_text_pages)
+        ]
+        ocr_error_labels = {}
+        if error_check_pages:
+            ocr_error_detection_results = self.ocr_error_detection(
+                error_check_pages, provider.page_lines
+            )
+            ocr_error_labels = {
+                page.page_id: label
+                for page, label in zip(
+                    error_check_pages, ocr_error_detection_results.labels
+                )
+            }
 
         boxes_to_ocr = {page.page_id: [] for page in document.pages}
         page_lines = {page.page_id: [] for page in document.pages}
@@ -153,19 +196,19 @@ class LineBuilder(BaseBuilder):
         LineClass: Line = get_block_class(BlockTypes.Line)
 
         layout_good = []
-        for document_page, ocr_error_detection_label in zip(
-            document.pages, ocr_error_detection_results.labels
-        ):
-            document_page.ocr_errors_detected = ocr_error_detection_label == "bad"
+        for document_page, page_plan in zip(document.pages, page_plans):
+            default_label = "bad" if page_plan == PagePlan.ocr else "good"
+            document_page.ocr_errors_detected = (
+                ocr_error_labels.get(document_page.page_id, default_label) == "bad"
+            )
             provider_lines: List[ProviderOutput] = provider.page_lines.get(
                 document_page.page_id, []
             )
-            provider_lines_good = all(
-                [
-                    bool(provider_lines),
-                    not document_page.ocr_errors_detected,
-                    self.check_layout_coverage(document_page, provider_lines),
-                ]
+            provider_lines_good = (
+                page_plan != PagePlan.ocr
+                and bool(provider_lines)
+                and not document_page.ocr_errors_detected
+                and self.check_layout_coverage(document_page, provider_lines)
             )
             layout_good.append(provider_lines_good)
 
@@ -174,15 +217,13 @@ class LineBuilder(BaseBuilder):
             layout_good = [True] * len(document.pages)
 
         run_detection = [(not good or self.format_lines) for good in layout_good]
-        page_images = [
-            page.get_image(highres=False, remove_blocks=self.ocr_remove_blocks)
-            for page, good in zip(document.pages, run_detection)
-            if good
+        detection_pages = [
+            page for page, good in zip(document.pages, run_detection) if good
         ]
 
-        # Note: run_detection is longer than page_images, since it has a value for each page, not just good ones
+        # Note: run_detection is longer than detection_pages, since it has a value for each page, not just good ones
         # Detection results and inline detection results are for every page (we use run_detection to make the list full length)
-        detection_results = self.get_detection_results(page_images, run_detection)
+        detection_results = self.get_detection_results(detection_pages, run_detection)
 
         assert len(detection_results) == len(layout_good) == len(document.pages)
         for document_page, detection_result, provider_lines_good in zip(
@@ -257,6 +298,18 @@ class LineBuilder(BaseBuilder):
 
         return page_lines, ocr_lines
 
+    def get_provider_lines(self, document: Document, provider: PdfProvider):
+        page_lines = {}
+        for document_page in document.pages:
+            provider_lines = provider.page_lines.get(document_page.page_id, [])
+            document_page.text_extraction_method = "pdftext"
+            for provider_line in provider_lines:
+                provider_line.line.text_extraction_method = "pdftext"
+            page_lines[document_page.page_id] = provider_lines
+
+        ocr_lines = {document_page.page_id: [] for document_page in document.pages}
+        return page_lines, ocr_lines
+
     def ocr_error_detection(
         self, pages: List[PageGroup], provider_page_lines: ProviderPageLines
     ):
@@ -299,11 +352,11 @@ class LineBuilder(BaseBuilder):
         if len(provider_bboxes) == 0:
             return False
 
-        intersection_matrix = matrix_intersection_area(layout_bboxes, provider_bboxes)
+        provider_index = SpatialIndex(provider_bboxes)
 
-        for idx, layout_block in enumerate(layout_blocks):
+        for layout_block, layout_bbox in zip(layout_blocks, layout_bboxes):
             total_blocks += 1
-            intersecting_lines = np.count_nonzero(intersection_matrix[idx] > 0)
+            intersecting_lines = len(provider_index.intersection_areas(layout_bbox)[0])
 
             if intersecting_lines >= self.layout_coverage_min_lines:
                 covered_blocks += 1
@@ -360,9 +413,7 @@ class LineBuilder(BaseBuilder):
 
         good_lines = []
         for line in lines:
-            line_polygon_rescaled = deepcopy(line.line.polygon).rescale(
-                page_size, image_size
-            )
+            line_polygon_rescaled = line.line.polygon.rescale(page_size, image_size)
             line_bbox = line_polygon_rescaled.fit_to_bounds((0, 0, *image_size)).bbox
 
             if not self.is_blank_slice(page_image.crop(line_bbox)):
@@ -446,22 +497,27 @@ class LineBuilder(BaseBuilder):
             for line in detected_lines
         ]
 
-        provider_detected_overlaps = matrix_intersection_area(
-            provider_line_boxes, detected_line_boxes
-        )
+        # For each provider line, the detected lines it overlaps and the overlap areas
+        detected_line_index = SpatialIndex(detected_line_boxes)
+        provider_detected_overlaps = [
+            detected_line_index.intersection_areas(box) for box in provider_line_boxes
+        ]
 
         # Find provider lines to merge together
         # Merge lines has keys of detected line index, and values are lists of provider line indices
         # The provider lines overlap with the detected line index
         provider_lines_within_detected_lines = defaultdict(list)
-        for i in range(len(provider_line_boxes)):
-            max_overlap_pct = np.max(provider_detected_overlaps[i]) / max(
+        for i, (overlap_idxs, overlaps) in enumerate(provider_detected_overlaps):
+            if len(overlaps) == 0:
+                continue
+
+            max_overlap_pct = np.max(overlaps) / max(
                 1, horizontal_provider_lines[i][1].line.polygon.area
             )
             if max_overlap_pct <= self.provider_line_detected_line_min_overlap_pct:
                 continue
 
-            best_overlap_detected_line = np.argmax(provider_detected_overlaps[i])
+            best_overlap_detected_line = int(overlap_idxs[np.argmax(overlaps)])
             provider_lines_within_detected_lines[best_overlap_detected_line].append(i)
 
         # If a detected line contains multiple provider lines, group them by vertical proximity
@@ -533,7 +589,7 @@ class LineBuilder(BaseBuilder):
                 # This happens sometimes since providers lines are long, and will merge across whitespace
                 # We merge in all detected lines into a single polygon before assigning to the provider line
                 idx = merge_section[0]
-                overlap_idxs = np.nonzero(provider_detected_overlaps[idx])[0]
+                overlap_idxs = provider_detected_overlaps[idx][0]
                 # Account for lines that overlap, but have been assigned to a different provider line already
                 lines = [text_line]
 
@@ -553,9 +609,9 @@ class LineBuilder(BaseBuilder):
             else:
                 poly = None
                 for section_idx in merge_section:
-                    section_polygon = deepcopy(
-                        horizontal_provider_lines[section_idx][1].line.polygon
-                    )
+                    section_polygon = horizontal_provider_lines[section_idx][
+                        1
+                    ].line.polygon
                     if poly is None:
                         poly: PolygonBox = section_polygon
                     else:
@@ -590,7 +646,7 @@ class LineBuilder(BaseBuilder):
                     min_idx = min(merge_section)
                     out_idx = horizontal_provider_lines[min_idx][0]
                     for idx in merge_section:
-                        provider_line = deepcopy(horizontal_provider_lines[idx][1])
+                        provider_line = horizontal_provider_lines[idx][1]
                         if merged_line is None:
                             merged_line = provider_line
                         else:
@@ -611,10 +667,13 @@ class LineBuilder(BaseBuilder):
         out_provider_lines = [p for _, p in out_provider_lines]
 
         # Detected lines that do not overlap with any provider lines shoudl be outputted as-is
+        overlapped_detected_lines = set(
+            chain.from_iterable(idxs.tolist() for idxs, _ in provider_detected_overlaps)
+        )
         detected_only_lines = []
         LineClass: Line = get_block_class(BlockTypes.Line)
         for j in range(len(detected_line_boxes)):
-            if np.max(provider_detected_overlaps[:, j]) == 0:
+            if j not in overlapped_detected_lines:
                 detected_line_polygon = PolygonBox.from_bbox(detected_line_boxes[j])
                 detected_only_lines.append(
                     ProviderOutput(
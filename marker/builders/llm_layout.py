@@ -7,7 +7,7 @@ from tqdm import tqdm
 from pydantic import BaseModel
 
 from marker.builders.layout import LayoutBuilder
-from marker.services import BaseService
+from marker.services import BaseService, request_concurrency
 from marker.providers.pdf import PdfProvider
 from marker.schema import BlockTypes
 from marker.schema.blocks import Block
@@ -42,8 +42,9 @@ class LLMLayoutBuilder(LayoutBuilder):
     ] = "gemini-2.0-flash"
     max_concurrency: Annotated[
         int,
-        "The maximum number of concurrent requests to make to the Gemini model.",
-    ] = 3
+        "The maximum number of concurrent requests to make to the LLM service.",
+        "Default is None, which uses the service's `max_concurrency`.  The service also limits requests across all processors.",
+    ] = None
     disable_tqdm: Annotated[
         bool,
         "Whether to disable the tqdm progress bar.",
@@ -108,7 +109,9 @@ Respond only with one of `Figure`, `Picture`, `ComplexRegion`, `Table`, or `Form
 
     def relabel_blocks(self, document: Document):
         pbar = tqdm(desc="LLM layout relabelling", disable=self.disable_tqdm)
-        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+        with ThreadPoolExecutor(
+            max_workers=request_concurrency(self.llm_service, self.max_concurrency)
+        ) as executor:
             futures = []
             for page in document.pages:
                 for block_id in page.structure:
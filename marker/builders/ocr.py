@@ -1,4 +1,3 @@
-import copy
 from typing import Annotated, List
 
 from ftfy import fix_text
@@ -18,7 +17,12 @@ from marker.schema.text.line import Line
 from marker.schema.text.span import Span
 from marker.settings import settings
 from marker.schema.polygon import PolygonBox
-from marker.util import get_opening_tag_type, get_closing_tag_type
+from marker.util import (
+    get_opening_tag_type,
+    get_closing_tag_type,
+    pipelined_batches,
+    should_pipeline,
+)
 
 
 class OcrBuilder(BaseBuilder):
@@ -55,6 +59,15 @@ class OcrBuilder(BaseBuilder):
     keep_chars: Annotated[bool, "Keep individual characters."] = False
     disable_ocr_math: Annotated[bool, "Disable inline math recognition in OCR"] = False
     drop_repeated_text: Annotated[bool, "Drop repeated text in OCR results."] = False
+    ocr_pipeline_pages: Annotated[
+        int,
+        "The number of pages to send to the recognition model at once when pipelining.",
+    ] = 16
+    pipeline_depth: Annotated[
+        int,
+        "The number of batches of page images to render ahead of the recognition model on a background thread.",
+        "Set to 0 to render every page before running the model.",
+    ] = 2
 
     def __init__(self, recognition_model: RecognitionPredictor, config=None):
         super().__init__(config)
@@ -64,17 +77,47 @@ class OcrBuilder(BaseBuilder):
     def __call__(self, document: Document, provider: PdfProvider):
         # pages_to_ocr = [page for page in document.pages if page.text_extraction_method == 'surya']
         pages_to_ocr = [page for page in document.pages]
-        images, line_polygons, line_ids, line_original_texts = (
-            self.get_ocr_images_polygons_ids(document, pages_to_ocr, provider)
+        # Lines are picked on this thread, since the document changes as OCR results come in
+        pages_to_ocr, page_lines, line_original_texts = self.get_ocr_lines(
+            document, pages_to_ocr
+        )
+
+        def prepare(page_idxs: List[int]):
+            images, line_polygons = [], []
+            for idx in page_idxs:
+                image, polygons = self.get_ocr_image_polygons(
+                    pages_to_ocr[idx], page_lines[idx], provider
+                )
+                images.append(image)
+                line_polygons.append(polygons)
+            return page_idxs, images, line_polygons
+
+        def run(prepared):
+            page_idxs, images, line_polygons = prepared
+            self.ocr_extraction(
+                document,
+                [pages_to_ocr[idx] for idx in page_idxs],
+                provider,
+                images,
+                line_polygons,
+                [[line.id for line in page_lines[idx]] for idx in page_idxs],
+                [line_original_texts[idx] for idx in page_idxs],
+                pipelined=pipelined,
+            )
+            return page_idxs
+
+        page_idxs = list(range(len(pages_to_ocr)))
+        pipelined = should_pipeline(
+            page_idxs, self.ocr_pipeline_pages, self.pipeline_depth
         )
-        self.ocr_extraction(
-            document,
-            pages_to_ocr,
-            provider,
-            images,
-            line_polygons,
-            line_ids,
-            line_original_texts,
+        pipelined_batches(
+            page_idxs,
+            prepare,
+            run,
+            self.ocr_pipeline_pages,
+            self.pipeline_depth,
+            desc="Recognizing text",
+            disable_tqdm=self.disable_tqdm,
         )
 
     def get_recognition_batch_size(self):
@@ -89,15 +132,23 @@ class OcrBuilder(BaseBuilder):
     def get_ocr_images_polygons_ids(
         self, document: Document, pages: List[PageGroup], provider: PdfProvider
     ):
-        highres_images, highres_polys, line_ids, line_original_texts = [], [], [], []
+        ocr_pages, page_lines, line_original_texts = self.get_ocr_lines(
+            document, pages
+        )
+        highres_images, highres_polys = [], []
+        for document_page, lines in zip(ocr_pages, page_lines):
+            image, polygons = self.get_ocr_image_polygons(document_page, lines, provider)
+            highres_images.append(image)
+            highres_polys.append(polygons)
+
+        line_ids = [[line.id for line in lines] for lines in page_lines]
+        return ocr_pages, highres_images, highres_polys, line_ids, line_original_texts
+
+    def get_ocr_lines(self, document: Document, pages: List[PageGroup]):
+        ocr_pages, page_lines, line_original_texts = [], [], []
         for document_page in pages:
-            page_highres_image = document_page.get_image(highres=True)
-            page_highres_polys = []
-            page_line_ids = []
-            page_line_original_texts = []
+            page_lines_to_ocr: List[Line] = []
 
-            page_size = provider.get_page_bbox(document_page.page_id).size
-            image_size = page_highres_image.size
             # Search by block, and the lines, so that we can filter based on containing block type
             for block in document_page.contained_blocks(document):
                 if block.block_type in self.skip_ocr_blocks:
@@ -115,29 +166,41 @@ class OcrBuilder(BaseBuilder):
                 if document_page.text_extraction_method == "surya":
                     block.text_extraction_method = "surya"
 
-                for line in block_lines_to_ocr:
-                    # Fit the polygon to image bounds since PIL image crop expands by default which might create bad images for the OCR model.
-                    line_polygon_rescaled = (
-                        copy.deepcopy(line.polygon)
-                        .rescale(page_size, image_size)
-                        .fit_to_bounds((0, 0, *image_size))
-                    )
-                    line_bbox_rescaled = line_polygon_rescaled.polygon
-                    line_bbox_rescaled = [
-                        [int(x) for x in point] for point in line_bbox_rescaled
-                    ]
+                page_lines_to_ocr.extend(block_lines_to_ocr)
 
-                    page_highres_polys.append(line_bbox_rescaled)
-                    page_line_ids.append(line.id)
-                    # For OCRed pages, this text will be blank
-                    page_line_original_texts.append(line.ocr_input_text(document))
+            # Avoid rendering the highres image for pages with nothing to OCR
+            if len(page_lines_to_ocr) == 0:
+                continue
 
-            highres_images.append(page_highres_image)
-            highres_polys.append(page_highres_polys)
-            line_ids.append(page_line_ids)
-            line_original_texts.append(page_line_original_texts)
+            ocr_pages.append(document_page)
+            page_lines.append(page_lines_to_ocr)
+            # For OCRed pages, this text will be blank
+            line_original_texts.append(
+                [line.ocr_input_text(document) for line in page_lines_to_ocr]
+            )
+
+        return ocr_pages, page_lines, line_original_texts
 
-        return highres_images, highres_polys, line_ids, line_original_texts
+    def get_ocr_image_polygons(
+        self, document_page: PageGroup, lines: List[Line], provider: PdfProvider
+    ):
+        page_highres_image = document_page.get_image(highres=True)
+        page_highres_polys = []
+
+        page_size = provider.get_page_bbox(document_page.page_id).size
+        image_size = page_highres_image.size
+        for line in lines:
+            # Fit the polygon to image bounds since PIL image crop expands by default which might create bad images for the OCR model.
+            line_polygon_rescaled = line.polygon.rescale(
+                page_size, image_size
+            ).fit_to_bounds((0, 0, *image_size))
+            line_bbox_rescaled = line_polygon_rescaled.polygon
+            line_bbox_rescaled = [
+                [int(x) for x in point] for point in line_bbox_rescaled
+            ]
+            page_highres_polys.append(line_bbox_rescaled)
+
+        return page_highres_image, page_highres_polys
 
     def ocr_extraction(
         self,
@@ -148,11 +211,13 @@ class OcrBuilder(BaseBuilder):
         line_polygons: List[List[List[List[int]]]],  # polygons
         line_ids: List[List[BlockId]],
         line_original_texts: List[List[str]],
+        pipelined: bool = False,
     ):
         if sum(len(b) for b in line_polygons) == 0:
             return
 
-        self.recognition_model.disable_tqdm = self.disable_tqdm
+        # The pipeline shows its own progress over every page
+        self.recognition_model.disable_tqdm = self.disable_tqdm or pipelined
         recognition_results: List[OCRResult] = self.recognition_model(
             images=images,
             task_names=[self.ocr_task_name] * len(images),
@@ -189,17 +254,12 @@ class OcrBuilder(BaseBuilder):
         before_text, _, after_text = text.partition(match_text)
         before_span, after_span = None, None
         if before_text:
-            before_span = copy.deepcopy(span)
-            before_span.structure = []  # Avoid duplicate characters
-            before_span.text = before_text
+            # Empty structure avoids duplicate characters
+            before_span = span.clone(structure=[], text=before_text)
         if after_text:
-            after_span = copy.deepcopy(span)
-            after_span.text = after_text
-            after_span.structure = []  # Avoid duplicate characters
+            after_span = span.clone(text=after_text, structure=[])
 
-        match_span = copy.deepcopy(span)
-        match_span.text = match_text
-        match_span.url = url
+        match_span = span.clone(text=match_text, url=url)
 
         return before_span, match_span, after_span
 
@@ -213,8 +273,8 @@ class OcrBuilder(BaseBuilder):
         # Insert refs into new spans, since the OCR model does not (cannot) generate these
         final_new_spans = []
         for span in new_spans:
-            # Use for copying attributes into new spans
-            original_span = copy.deepcopy(span)
+            # Use for copying attributes into new spans, which are all clones
+            original_span = span
             remaining_text = span.text
             while remaining_text:
                 matched = False
@@ -235,8 +295,7 @@ class OcrBuilder(BaseBuilder):
                         del text_ref_matching[match_text]
                         break
                 if not matched:
-                    remaining_span = copy.deepcopy(original_span)
-                    remaining_span.text = remaining_text
+                    remaining_span = original_span.clone(text=remaining_text)
                     final_new_spans.append(remaining_span)
                     break
 
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+from marker.logger import get_logger
+from marker.util import marker_version
+
+logger = get_logger()
+
+# Config keys that never change conversion output
+IGNORED_CONFIG_KEYS = {
+    "disable_tqdm",
+    "cache_dir",
+    "cache_max_size_mb",
+    "collect_metrics",
+    "metrics_path",
+    "llm_cache_dir",
+    "llm_cache_ttl_days",
+    "llm_cache_max_size_mb",
+}
+
+
+class ConversionCache:
+    """
+    A size-bounded on-disk cache for the output of conversion stages.  Entries are keyed by the
+    contents of the input file and the config values that the classes in each stage read, so they
+    can be shared between processes and machines.  The least recently used entries are evicted
+    once the cache grows past `max_size_mb`.
+
+    Keys include the marker version, since entries are pickles of marker's own classes.  Loading an entry
+    can run arbitrary code, so the cache directory must not be writable by anyone untrusted.
+    """
+
+    def __init__(self, cache_dir: str, max_size_mb: int = 10240):
+        self.cache_dir = cache_dir
+        self.max_size = max_size_mb * 1024 * 1024
+        self.file_digests: Dict[Tuple[str, int, int], str] = {}
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def file_digest(self, filepath: str) -> str:
+        stat = os.stat(filepath)
+        stat_key = (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+        if stat_key not in self.file_digests:
+            digest = hashlib.sha256()
+            with open(filepath, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            self.file_digests[stat_key] = digest.hexdigest()
+        return self.file_digests[stat_key]
+
+    @staticmethod
+    def stage_config(config: Dict[str, Any] | None, classes: List[type]) -> Dict[str, Any]:
+        # Only keep the config values that a class in the stage reads, mirroring assign_config
+        stage_config = {}
+        for k, v in (config or {}).items():
+            if k in IGNORED_CONFIG_KEYS:
+                continue
+            for cls in classes:
+                if hasattr(cls, k) or (
+                    k.startswith(cls.__name__ + "_")
+                    and hasattr(cls, k.removeprefix(cls.__name__ + "_"))
+                ):
+                    stage_config[k] = v
+                    break
+        return stage_config
+
+    def key(
+        self,
+        stage: str,
+        filepath: str,
+        config: Dict[str, Any] | None,
+        classes: List[type],
+    ) -> str:
+        key_data = {
+            "marker_version": marker_version(),
+            "stage": stage,
+            "file": self.file_digest(filepath),
+            "classes": [f"{cls.__module__}.{cls.__name__}" for cls in classes],
+            "config": self.stage_config(config, classes),
+        }
+        key_str = json.dumps(key_data, sort_keys=True, default=repr)
+        return hashlib.sha256(key_str.encode()).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get(self, key: str) -> Any | None:
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(path)  # Mark as recently used
+            return value
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache entry {path}: {e}")
+            return None
+
+    def set(self, key: str, value: Any):
+        # Write to a temporary file first, so other processes never read a partial entry
+        with tempfile.NamedTemporaryFile(
+            dir=self.cache_dir, suffix=".tmp", delete=False
+        ) as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f.name, self.path(key))
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".pkl"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass  # Already evicted by another process
+            total_size -= size
+
+
+class LLMResponseCache:
+    """
+    A size-bounded SQLite cache for LLM responses, so reconverting a document does not pay for the
+    same requests again.  Services build the keys, see `BaseService.cache_key`.  Entries older than
+    `ttl_days` are ignored, and the least recently used entries are evicted once the cache grows
+    past `max_size_mb`.  The database can be shared between processes.
+    """
+
+    # Only check the size every so often, since it needs a pass over the table
+    evict_every = 100
+
+    def __init__(
+        self, cache_dir: str, ttl_days: float | None = None, max_size_mb: int = 1024
+    ):
+        self.path = os.path.join(cache_dir, "llm_responses.sqlite")
+        self.ttl = ttl_days * 24 * 60 * 60 if ttl_days is not None else None
+        self.max_size = max_size_mb * 1024 * 1024
+        self.lock = threading.Lock()
+        self.writes = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, size INTEGER, created REAL, used REAL)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_used ON responses (used)"
+            )
+
+    def __getstate__(self):
+        return {"path": self.path, "ttl": self.ttl, "max_size": self.max_size}
+
+    def __setstate__(self, state):
+        self.__init__(
+            os.path.dirname(state["path"]),
+            ttl_days=state["ttl"] / (24 * 60 * 60) if state["ttl"] is not None else None,
+            max_size_mb=state["max_size"] // (1024 * 1024),
+        )
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def get(self, key: str) -> Any | None:
+        now = time.time()
+        try:
+            with self.lock, self.connection:
+                row = self.connection.execute(
+                    "SELECT value, created FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                value, created = row
+                if self.ttl is not None and now - created > self.ttl:
+                    self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    return None
+                self.connection.execute(
+                    "UPDATE responses SET used = ? WHERE key = ?", (now, key)
+                )
+            return json.loads(value)
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"Ignoring unreadable LLM cache entry {key}: {e}")
+            return None
+
+    def set(self, key: str, value: Any):
+        now = time.time()
+        value = json.dumps(value)
+        try:
+            with self.lock, self.connection:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                    (key, value, len(value), now, now),
+                )
+                self.writes += 1
+                if self.writes % self.evict_every == 0:
+                    self.evict()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not write LLM cache entry {key}: {e}")
+
+    def evict(self):
+        # Called with the lock held, inside a transaction
+        if self.ttl is not None:
+            self.connection.execute(
+                "DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,)
+            )
+        total_size = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        if total_size <= self.max_size:
+            return
+
+        evicted = []
+        for key, size in self.connection.execute(
+            "SELECT key, size FROM responses ORDER BY used"
+        ):
+            if total_size <= self.max_size:
+                break
+            evicted.append((key,))
+            total_size -= size
+        self.connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
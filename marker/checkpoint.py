@@ -0,0 +1,249 @@
+import io
+import json
+import os
+import pickle
+import struct
+import zlib
+from typing import Any, Dict, List, Set, Tuple
+
+import pypdfium2 as pdfium
+from PIL import Image
+
+from marker.providers import LazyPageImage, PageImageCache
+from marker.providers.pdf import PDFIUM_LOCK, PdfProvider
+from marker.schema.document import Document
+from marker.util import marker_version
+
+CHECKPOINT_MAGIC = b"MRKRCKPT"
+CHECKPOINT_VERSION = 2
+
+
+class CheckpointImageProvider:
+    """
+    Serves the page images stored in a checkpoint, decoding each one only when it is first requested.
+    Pages that were never rendered before the checkpoint was saved are rendered from the source pdf.
+    """
+
+    def __init__(
+        self,
+        images: Dict[Tuple[int, int], bytes | str],
+        image_dir: str | None = None,
+        source: Dict[str, Any] | None = None,
+    ):
+        self.images = images
+        self.image_dir = image_dir
+        self.source = source
+
+    def render_source_image(self, idx: int, dpi: int) -> Image.Image:
+        filepath = self.source["filepath"] if self.source else None
+        if filepath is None or not os.path.exists(filepath):
+            raise FileNotFoundError(
+                f"Page {idx} at {dpi} DPI was not saved in the checkpoint, and its source pdf {filepath} is missing"
+            )
+        with PDFIUM_LOCK:
+            doc = pdfium.PdfDocument(filepath)
+            try:
+                if self.source["flatten_pdf"]:
+                    doc.init_forms()
+                return PdfProvider._render_page_images(
+                    doc, idx, [dpi], self.source["flatten_pdf"]
+                )[dpi]
+            finally:
+                doc.close()
+
+    def get_images(self, idxs: List[int], dpi: int) -> List[Image.Image]:
+        images = []
+        for idx in idxs:
+            data = self.images.get((idx, dpi))
+            if data is None:
+                images.append(self.render_source_image(idx, dpi))
+                continue
+            if isinstance(data, str):
+                # External images are stored relative to the checkpoint
+                image = Image.open(os.path.join(self.image_dir, data))
+            else:
+                image = Image.open(io.BytesIO(data))
+            image.load()
+            images.append(image)
+        return images
+
+    def get_images_for_dpis(
+        self, idxs: List[int], dpis: List[int]
+    ) -> Dict[int, List[Image.Image]]:
+        return {dpi: self.get_images(idxs, dpi) for dpi in dpis}
+
+
+def image_source(cache: PageImageCache) -> Dict[str, Any] | None:
+    # Where pages that were never rendered can be rendered from when the checkpoint is loaded
+    provider = cache.provider
+    if isinstance(provider, CheckpointImageProvider):
+        return provider.source
+    # Other providers convert their input to a temporary pdf, which is gone by the time the checkpoint is loaded
+    if type(provider) is PdfProvider:
+        return {
+            "filepath": os.path.abspath(provider.filepath),
+            "flatten_pdf": provider.flatten_pdf,
+        }
+    return None
+
+
+class CheckpointPickler(pickle.Pickler):
+    def __init__(
+        self,
+        file,
+        image_format: str,
+        image_dir: str | None,
+        reference_source_images: bool = False,
+    ):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.image_format = image_format
+        self.image_dir = image_dir
+        self.reference_source_images = reference_source_images
+        self.images: Dict[Tuple[int, int], bytes | str] = {}
+        self.references: Set[Tuple[int, int]] = set()
+        self.source: Dict[str, Any] | None = None
+
+    def persistent_id(self, obj):
+        if isinstance(obj, LazyPageImage):
+            key = (obj.idx, obj.dpi)
+            if key in self.images or key in self.references:
+                return key
+
+            image = obj.cache.peek(*key)
+            provider = obj.cache.provider
+            if image is None and isinstance(provider, CheckpointImageProvider) and key in provider.images:
+                image = obj.get()
+            if image is None and self.reference_source_images:
+                source = image_source(obj.cache)
+                if source is not None:
+                    # Pages that were never rendered are stored as references, and rendered from the source if they are needed
+                    self.references.add(key)
+                    self.source = source
+                    return key
+            if image is None:
+                image = obj.get()
+        elif isinstance(obj, Image.Image):
+            # Images that were never lazy get a key that cannot clash with a page index
+            key = (-len(self.images) - 1, 0)
+            image = obj
+        else:
+            return None
+
+        if key not in self.images:
+            self.images[key] = self.encode_image(key, image)
+        return key
+
+    def encode_image(self, key: Tuple[int, int], image: Image.Image) -> bytes | str:
+        if self.image_format.lower() in ("jpeg", "jpg") and image.mode != "RGB":
+            image = image.convert("RGB")
+
+        if self.image_dir is None:
+            buffer = io.BytesIO()
+            image.save(buffer, format=self.image_format)
+            return buffer.getvalue()
+
+        filename = f"{key[0]}_{key[1]}.{self.image_format.lower()}"
+        image.save(os.path.join(self.image_dir, filename), format=self.image_format)
+        return filename
+
+
+class CheckpointUnpickler(pickle.Unpickler):
+    def __init__(self, file, image_cache: PageImageCache):
+        super().__init__(file)
+        self.image_cache = image_cache
+
+    def persistent_load(self, pid):
+        idx, dpi = pid
+        if idx < 0:
+            return self.image_cache.provider.get_images([idx], dpi)[0]
+        return LazyPageImage(self.image_cache, idx, dpi)
+
+
+def save_document(
+    document: Document,
+    path: str,
+    image_format: str = "PNG",
+    external_images: bool = False,
+    reference_source_images: bool = False,
+):
+    """
+    Save a document to a checkpoint file.  Page images are stored as encoded blobs inside the
+    checkpoint, or as files in a `<path>_images` folder next to it if `external_images` is set.
+
+    Every page image is stored, rendering any that weren't rendered yet, so the checkpoint doesn't need
+    the source file.  Set `reference_source_images` to store pages that were never rendered as references
+    to the source pdf instead, which then has to be present at the same path to render them after loading.
+    """
+    image_dir = None
+    if external_images:
+        image_dir = f"{path}_images"
+        os.makedirs(image_dir, exist_ok=True)
+
+    buffer = io.BytesIO()
+    pickler = CheckpointPickler(buffer, image_format, image_dir, reference_source_images)
+    pickler.dump(document)
+
+    checkpoint = {
+        "images": pickler.images,
+        "source": pickler.source,
+        "image_dir": os.path.basename(image_dir) if image_dir else None,
+        # Images are already compressed, so only the document structure is
+        "document": zlib.compress(buffer.getvalue(), 1),
+    }
+    # The header is plain JSON, so the versions are checked before anything is unpickled
+    header = json.dumps(
+        {"format": CHECKPOINT_VERSION, "marker_version": marker_version()}
+    ).encode()
+    with open(path, "wb") as f:
+        f.write(CHECKPOINT_MAGIC)
+        f.write(struct.pack(">I", len(header)))
+        f.write(header)
+        pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_document(
+    path: str,
+    max_cached_page_images: int | None = None,
+    max_cached_image_mb: int | None = None,
+) -> Document:
+    """
+    Load a document from a checkpoint file.  Page images are decoded lazily, and the original
+    input file is only needed for page images that were not saved in the checkpoint.
+
+    Checkpoints are pickles, and loading one can run arbitrary code, so only load checkpoints you wrote.
+    Checkpoints from other marker versions are refused, since the document classes may have changed.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(CHECKPOINT_MAGIC)) != CHECKPOINT_MAGIC:
+            raise ValueError(f"{path} is not a marker checkpoint")
+        try:
+            (header_size,) = struct.unpack(">I", f.read(4))
+            header = json.loads(f.read(header_size))
+        except (struct.error, ValueError):
+            raise ValueError(f"Unsupported checkpoint format in {path}, expected {CHECKPOINT_VERSION}")
+
+        if header.get("format") != CHECKPOINT_VERSION:
+            raise ValueError(
+                f"Unsupported checkpoint format {header.get('format')}, expected {CHECKPOINT_VERSION}"
+            )
+        if header.get("marker_version") != marker_version():
+            raise ValueError(
+                f"Checkpoint was saved by marker {header.get('marker_version')}, but this is marker {marker_version()}"
+            )
+        checkpoint = pickle.load(f)
+
+    image_dir = None
+    if checkpoint["image_dir"] is not None:
+        image_dir = os.path.join(os.path.dirname(os.path.abspath(path)), checkpoint["image_dir"])
+
+    image_provider = CheckpointImageProvider(
+        checkpoint["images"], image_dir, checkpoint["source"]
+    )
+    max_bytes = None
+    if max_cached_image_mb is not None:
+        max_bytes = max_cached_image_mb * 1024 * 1024
+    image_cache = PageImageCache(image_provider, max_cached_page_images, max_bytes)
+    unpickler = CheckpointUnpickler(
+        io.BytesIO(zlib.decompress(checkpoint["document"])), image_cache
+    )
+    return unpickler.load()
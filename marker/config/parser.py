@@ -104,6 +104,7 @@ class ConfigParser:
                         config.update(json.load(f))
                 case "disable_multiprocessing":
                     config["pdftext_workers"] = 1
+                    config["render_workers"] = 1
                 case "disable_image_extraction":
                     config["extract_images"] = False
                 case _:
@@ -1,5 +1,5 @@
 import inspect
-from typing import Optional, List, Type
+from typing import Optional, List, Tuple, Type
 
 from pydantic import BaseModel
 
@@ -10,10 +10,17 @@ from marker.util import assign_config, download_font
 
 
 class BaseConverter:
+    # The models this converter needs from the artifact dict, or None for all of them
+    required_models: Tuple[str, ...] | None = None
+
     def __init__(self, config: Optional[BaseModel | dict] = None):
         assign_config(self, config)
         self.config = config
         self.llm_service = None
+        # Set by converters that collect metrics, see marker.metrics
+        self.metrics = None
+        # Called with the name of each conversion stage as it starts, and any details about it
+        self.progress_callback = None
 
         # Download render font, needed for some providers
         download_font()
@@ -21,6 +28,17 @@ class BaseConverter:
     def __call__(self, *args, **kwargs):
         raise NotImplementedError
 
+    def close(self):
+        # Stops the llm service's request threads, once the converter is done with it
+        if self.llm_service is not None and callable(
+            getattr(self.llm_service, "close", None)
+        ):
+            self.llm_service.close()
+
+    def report_progress(self, stage: str, **info):
+        if self.progress_callback is not None:
+            self.progress_callback(stage, **info)
+
     def resolve_dependencies(self, cls):
         init_signature = inspect.signature(cls.__init__)
         parameters = init_signature.parameters
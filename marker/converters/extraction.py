@@ -1,5 +1,6 @@
 import json
 import re
+from concurrent.futures import ThreadPoolExecutor
 
 from marker.builders.document import DocumentBuilder
 from marker.builders.line import LineBuilder
@@ -11,6 +12,7 @@ from marker.providers.registry import provider_from_filepath
 
 from marker.renderers.extraction import ExtractionRenderer, ExtractionOutput
 from marker.renderers.markdown import MarkdownRenderer
+from marker.services import request_concurrency
 
 from marker.logger import get_logger
 
@@ -68,10 +70,14 @@ class ExtractionConverter(PdfConverter):
         renderer = self.resolve_dependencies(ExtractionRenderer)
 
         pnums = provider.page_range
-        all_json = {}
-        for page, page_md, pnum in zip(document.pages, output_pages, pnums):
-            extracted_json = extractor(document, page, page_md.strip())
-            all_json[pnum] = extracted_json
+        # Pages are independent, so they all go to the LLM service at once, and its scheduler limits the requests
+        max_workers = request_concurrency(extractor.llm_service, extractor.max_concurrency)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            extracted = executor.map(
+                lambda args: extractor(document, args[0], args[1].strip()),
+                zip(document.pages, output_pages),
+            )
+            all_json = dict(zip(pnums, extracted))
 
         merged = renderer(all_json)
         return merged
@@ -30,14 +30,19 @@ class OCRConverter(PdfConverter):
         document_builder = DocumentBuilder(self.config)
 
         provider = provider_cls(filepath, self.config)
-        document = document_builder(provider, layout_builder, line_builder, ocr_builder)
+        document = document_builder(
+            provider, layout_builder, line_builder, ocr_builder, metrics=self.metrics
+        )
 
-        for processor in self.processor_list:
-            processor(document)
+        self.run_processors(document)
 
         return document
 
     def __call__(self, filepath: str):
+        if self.metrics is not None:
+            self.metrics.reset()
         document = self.build_document(filepath)
         renderer = self.resolve_dependencies(self.renderer)
-        return renderer(document)
+        rendered = renderer(document)
+        self.finish_metrics(rendered)
+        return rendered
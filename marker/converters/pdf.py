@@ -5,13 +5,26 @@ from marker.services import BaseService
 os.environ["TOKENIZERS_PARALLELISM"] = "false"  # disables a tokenizers warning
 
 from collections import defaultdict
-from typing import Annotated, Any, Dict, List, Optional, Type, Tuple, Union
+from typing import Annotated, Any, Dict, Generator, List, Optional, Type, Tuple, Union
 import io
 from contextlib import contextmanager
 import tempfile
 
+import pypdfium2 as pdfium
+from pydantic import BaseModel
+
+from marker.cache import ConversionCache
+from marker.metrics import (
+    ConversionMetrics,
+    InstrumentedModel,
+    InstrumentedService,
+    measure,
+    unwrap,
+)
 from marker.processors import BaseProcessor
 from marker.processors.llm.llm_table_merge import LLMTableMergeProcessor
+from marker.providers import BaseProvider, LazyPageImage
+from marker.providers.pdf import PdfProvider
 from marker.providers.registry import provider_from_filepath
 from marker.builders.document import DocumentBuilder
 from marker.builders.layout import LayoutBuilder
@@ -43,6 +56,7 @@ from marker.processors.llm.llm_equation import LLMEquationProcessor
 from marker.renderers.markdown import MarkdownRenderer
 from marker.schema import BlockTypes
 from marker.schema.blocks import Block
+from marker.schema.document import Document
 from marker.schema.registry import register_block_class
 from marker.util import strings_to_classes
 from marker.processors.llm.llm_handwriting import LLMHandwritingProcessor
@@ -50,6 +64,7 @@ from marker.processors.order import OrderProcessor
 from marker.services.gemini import GoogleGeminiService
 from marker.processors.line_merge import LineMergeProcessor
 from marker.processors.llm.llm_mathblock import LLMMathBlockProcessor
+from marker.processors.llm.llm_meta import LLMSimpleBlockMetaProcessor
 
 
 class PdfConverter(BaseConverter):
@@ -68,6 +83,29 @@ class PdfConverter(BaseConverter):
         bool,
         "Enable higher quality processing with LLMs.",
     ] = False
+    page_window_size: Annotated[
+        int,
+        "The number of pages to convert at once when streaming output with `stream`.",
+    ] = 20
+    cache_dir: Annotated[
+        str,
+        "The directory to cache intermediate and final conversion results in.",
+        "Entries are pickles, so don't share the directory with anyone you don't trust.  Default is None, which disables caching.",
+    ] = None
+    cache_max_size_mb: Annotated[
+        int,
+        "The maximum size of the conversion cache in megabytes.  The least recently used entries are evicted first.",
+    ] = 10240
+    collect_metrics: Annotated[
+        bool,
+        "Record the wall time, CPU time, peak memory and item counts of each builder and processor, along with model",
+        "batch sizes and LLM request latency, under `metrics` in the output metadata.",
+    ] = False
+    metrics_path: Annotated[
+        str,
+        "Write the metrics of each conversion to this path in the Prometheus text format.",
+        "Setting this also enables `collect_metrics`.",
+    ] = None
     default_processors: Tuple[BaseProcessor, ...] = (
         OrderProcessor,
         BlockRelabelProcessor,
@@ -129,6 +167,18 @@ class PdfConverter(BaseConverter):
         elif config.get("use_llm", False):
             llm_service = self.resolve_dependencies(self.default_llm_service)
 
+        if self.collect_metrics or self.metrics_path:
+            # Wrap models and the LLM service in a copy, so the caller's artifact dict is left as it was
+            self.metrics = ConversionMetrics()
+            artifact_dict = {
+                name: InstrumentedModel(name, model, self.metrics)
+                if name.endswith("_model") and model is not None
+                else model
+                for name, model in artifact_dict.items()
+            }
+            if llm_service is not None:
+                llm_service = InstrumentedService(llm_service, self.metrics)
+
         # Inject llm service into artifact_dict so it can be picked up by processors, etc.
         artifact_dict["llm_service"] = llm_service
         self.llm_service = llm_service
@@ -143,6 +193,10 @@ class PdfConverter(BaseConverter):
         if self.use_llm:
             self.layout_builder_class = LLMLayoutBuilder
 
+        self.cache = None
+        if self.cache_dir:
+            self.cache = ConversionCache(self.cache_dir, self.cache_max_size_mb)
+
     @contextmanager
     def filepath_to_str(self, file_input: Union[str, io.BytesIO]):
         temp_file = None
@@ -166,26 +220,209 @@ class PdfConverter(BaseConverter):
             if temp_file is not None and os.path.exists(temp_file.name):
                 os.unlink(temp_file.name)
 
-    def build_document(self, filepath: str):
-        provider_cls = provider_from_filepath(filepath)
+    def build_document_structure(self, provider: BaseProvider) -> Document:
         layout_builder = self.resolve_dependencies(self.layout_builder_class)
         line_builder = self.resolve_dependencies(LineBuilder)
         ocr_builder = self.resolve_dependencies(OcrBuilder)
-        provider = provider_cls(filepath, self.config)
         document = DocumentBuilder(self.config)(
-            provider, layout_builder, line_builder, ocr_builder
+            provider,
+            layout_builder,
+            line_builder,
+            ocr_builder,
+            progress_callback=self.report_progress,
+            metrics=self.metrics,
         )
+        self.report_progress("structure")
         structure_builder_cls = self.resolve_dependencies(StructureBuilder)
-        structure_builder_cls(document)
+        with measure(self.metrics, "StructureBuilder", "builder", len(document.pages)):
+            structure_builder_cls(document)
+        return document
+
+    def build_document(self, filepath: str):
+        provider_cls = provider_from_filepath(filepath)
+        cache_keys = self.cache_keys(filepath, provider_cls)
+
+        document = self.cache_get(cache_keys, "processed", filepath)
+        if document is not None:
+            return document
+
+        document = self.cache_get(cache_keys, "structure", filepath)
+        if document is None:
+            provider = self.cache_get(cache_keys, "provider", filepath)
+            if provider is None:
+                self.report_progress("provider")
+                with measure(self.metrics, provider_cls.__name__, "provider"):
+                    provider = provider_cls(filepath, self.config)
+                self.cache_set(cache_keys, "provider", provider)
+            document = self.build_document_structure(provider)
+            self.cache_set(cache_keys, "structure", document)
+
+        self.run_processors(document)
+        self.cache_set(cache_keys, "processed", document)
+
+        return document
+
+    def run_processors(self, document: Document):
+        for i, processor in enumerate(self.processor_list):
+            self.report_progress(
+                "processors",
+                processor=type(processor).__name__,
+                step=i + 1,
+                total=len(self.processor_list),
+            )
+            if self.metrics is None:
+                processor(document)
+                continue
+
+            items = None
+            if processor.block_types:
+                items = len(document.contained_blocks(processor.block_types))
+            with self.metrics.stage(type(processor).__name__, "processor", items):
+                processor(document)
 
+    def finish_metrics(self, rendered):
+        if self.metrics is None:
+            return
+        metadata = getattr(rendered, "metadata", None)
+        if isinstance(metadata, dict):
+            metadata["metrics"] = self.metrics.to_dict()
+        if self.metrics_path:
+            with open(self.metrics_path, "w", encoding="utf-8") as f:
+                f.write(self.metrics.to_prometheus())
+
+    def cache_keys(self, filepath: str, provider_cls: type) -> Dict[str, str]:
+        # Only PDFs are cached, since other providers render from a temporary PDF that is deleted after conversion
+        if self.cache is None or provider_cls is not PdfProvider:
+            return {}
+
+        processor_classes = []
         for processor in self.processor_list:
-            processor(document)
+            processor_classes.append(type(processor))
+            if isinstance(processor, LLMSimpleBlockMetaProcessor):
+                processor_classes.extend(type(p) for p in processor.processors)
+        if self.llm_service is not None:
+            processor_classes.append(type(unwrap(self.llm_service)))
+
+        # Each stage is keyed by the config of every class that ran up to that point
+        stage_classes = {"provider": [type(self), provider_cls]}
+        stage_classes["structure"] = stage_classes["provider"] + [
+            DocumentBuilder,
+            self.layout_builder_class,
+            LineBuilder,
+            OcrBuilder,
+            StructureBuilder,
+        ]
+        stage_classes["processed"] = stage_classes["structure"] + processor_classes
+        stage_classes["rendered"] = stage_classes["processed"] + [self.renderer]
+
+        return {
+            stage: self.cache.key(stage, filepath, self.config, classes)
+            for stage, classes in stage_classes.items()
+        }
+
+    def cache_get(self, cache_keys: Dict[str, str], stage: str, filepath: str):
+        if stage not in cache_keys:
+            return None
+
+        value = self.cache.get(cache_keys[stage])
+        if value is None:
+            return None
+
+        # The input may have moved since it was cached, so point everything at the current file
+        if isinstance(value, PdfProvider):
+            value.filepath = filepath
+        elif isinstance(value, Document):
+            value.filepath = filepath
+            for page in value.pages:
+                for image in (page.lowres_image, page.highres_image):
+                    if isinstance(image, LazyPageImage):
+                        image.cache.provider.filepath = filepath
+        return value
+
+    def cache_set(self, cache_keys: Dict[str, str], stage: str, value):
+        if stage in cache_keys:
+            self.cache.set(cache_keys[stage], value)
+
+    def merges_tables(self) -> bool:
+        return any(
+            isinstance(processor, LLMTableMergeProcessor)
+            and processor.use_llm
+            and processor.llm_service is not None
+            for processor in self.processor_list
+        )
+
+    def build_window_document(
+        self, filepath: str, window_pages: List[int], is_last_window: bool
+    ) -> Document:
+        window_config = {**(self.config or {}), "page_range": window_pages}
+        provider = PdfProvider(filepath, window_config)
+        document = self.build_document_structure(provider)
+
+        # A table on the last page of a window may continue on the next page.  Hold the page back so it is
+        # converted with the next window, where LLMTableMergeProcessor can see both tables.
+        if not is_last_window and len(document.pages) > 1 and self.merges_tables():
+            last_page = document.pages[-1]
+            if last_page.contained_blocks(document, LLMTableMergeProcessor.block_types):
+                document.pages = document.pages[:-1]
 
+        self.run_processors(document)
         return document
 
+    def stream(self, filepath: str | io.BytesIO) -> Generator[BaseModel, None, None]:
+        """
+        Convert the document in windows of `page_window_size` pages, and yield the rendered output of each window.
+        Only the cross-page state that processors need is carried between windows, so memory stays constant.
+        """
+        with self.filepath_to_str(filepath) as temp_path:
+            if provider_from_filepath(temp_path) is not PdfProvider:
+                # Other providers convert the whole file up front, so there is nothing to gain from windows
+                yield self.resolve_dependencies(self.renderer)(self.build_document(temp_path))
+                return
+
+            page_range = (self.config or {}).get("page_range")
+            if page_range is None:
+                doc = pdfium.PdfDocument(temp_path)
+                page_range = list(range(len(doc)))
+                doc.close()
+
+            for processor in self.processor_list:
+                processor.window_state = {}
+            if self.metrics is not None:
+                self.metrics.reset()
+
+            try:
+                window_start = 0
+                while window_start < len(page_range):
+                    window_pages = page_range[
+                        window_start : window_start + self.page_window_size
+                    ]
+                    is_last_window = window_start + len(window_pages) >= len(page_range)
+                    document = self.build_window_document(
+                        temp_path, window_pages, is_last_window
+                    )
+                    window_start += len(document.pages)
+
+                    renderer = self.resolve_dependencies(self.renderer)
+                    with measure(self.metrics, type(renderer).__name__, "renderer"):
+                        rendered = renderer(document)
+                    self.finish_metrics(rendered)
+                    yield rendered
+            finally:
+                for processor in self.processor_list:
+                    processor.window_state = None
+
     def __call__(self, filepath: str | io.BytesIO):
+        if self.metrics is not None:
+            self.metrics.reset()
         with self.filepath_to_str(filepath) as temp_path:
-            document = self.build_document(temp_path)
-            renderer = self.resolve_dependencies(self.renderer)
-            rendered = renderer(document)
+            cache_keys = self.cache_keys(temp_path, provider_from_filepath(temp_path))
+            rendered = self.cache_get(cache_keys, "rendered", temp_path)
+            if rendered is None:
+                document = self.build_document(temp_path)
+                self.report_progress("render")
+                renderer = self.resolve_dependencies(self.renderer)
+                with measure(self.metrics, type(renderer).__name__, "renderer"):
+                    rendered = renderer(document)
+                self.cache_set(cache_keys, "rendered", rendered)
+        self.finish_metrics(rendered)
         return rendered
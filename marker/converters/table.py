@@ -34,17 +34,22 @@ class TableConverter(PdfConverter):
         document_builder.disable_ocr = True
 
         provider = provider_cls(filepath, self.config)
-        document = document_builder(provider, layout_builder, line_builder, ocr_builder)
+        document = document_builder(
+            provider, layout_builder, line_builder, ocr_builder, metrics=self.metrics
+        )
 
         for page in document.pages:
             page.structure = [p for p in page.structure if p.block_type in self.converter_block_types]
 
-        for processor in self.processor_list:
-            processor(document)
+        self.run_processors(document)
 
         return document
 
     def __call__(self, filepath: str):
+        if self.metrics is not None:
+            self.metrics.reset()
         document = self.build_document(filepath)
         renderer = self.resolve_dependencies(self.renderer)
-        return renderer(document)
\ No newline at end of file
+        rendered = renderer(document)
+        self.finish_metrics(rendered)
+        return rendered
\ No newline at end of file
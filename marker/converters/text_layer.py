@@ -0,0 +1,50 @@
+from typing import Tuple
+
+from marker.builders.document import DocumentBuilder
+from marker.builders.line import LineBuilder
+from marker.builders.structure import StructureBuilder
+from marker.converters.pdf import PdfConverter
+from marker.metrics import measure
+from marker.processors import BaseProcessor
+from marker.processors.equation import EquationProcessor
+from marker.processors.table import TableProcessor, TextLayerTableProcessor
+from marker.providers import BaseProvider
+from marker.schema.document import Document
+
+
+class TextLayerConverter(PdfConverter):
+    """
+    A converter for PDFs with a good embedded text layer.  Text is taken from the PDF as-is, and tables are
+    rebuilt from it, so only the layout model is loaded, and high-resolution page images are never rendered
+    for processing.  They are still rendered to extract images into the output, unless that is disabled.
+    """
+
+    required_models: Tuple[str, ...] = ("layout_model",)
+    default_processors: Tuple[BaseProcessor, ...] = tuple(
+        TextLayerTableProcessor if processor is TableProcessor else processor
+        for processor in PdfConverter.default_processors
+        if processor is not EquationProcessor
+    )
+
+    def build_document_structure(self, provider: BaseProvider) -> Document:
+        layout_builder = self.resolve_dependencies(self.layout_builder_class)
+        line_builder = LineBuilder(
+            detection_model=None, ocr_error_model=None, config=self.config
+        )
+        line_builder.provider_lines_only = True
+        document_builder = DocumentBuilder(self.config)
+        document_builder.disable_ocr = True
+
+        document = document_builder(
+            provider,
+            layout_builder,
+            line_builder,
+            None,
+            progress_callback=self.report_progress,
+            metrics=self.metrics,
+        )
+        self.report_progress("structure")
+        structure_builder_cls = self.resolve_dependencies(StructureBuilder)
+        with measure(self.metrics, "StructureBuilder", "builder", len(document.pages)):
+            structure_builder_cls(document)
+        return document
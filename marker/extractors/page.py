@@ -93,8 +93,9 @@ class PageExtractor(BaseExtractor):
 
     max_concurrency: Annotated[
         int,
-        "The maximum number of concurrent requests to make to the Gemini model.",
-    ] = 3
+        "The maximum number of concurrent requests to make to the LLM service.",
+        "Default is None, which uses the service's `max_concurrency`.  The service also limits requests across all processors.",
+    ] = None
     disable_tqdm: Annotated[
         bool,
         "Whether to disable the tqdm progress bar.",
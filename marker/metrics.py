@@ -0,0 +1,307 @@
+import inspect
+import math
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, List
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss() -> int:
+    # The high-water mark of the process's resident memory, in bytes
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def call_items(args, kwargs) -> int:
+    # Recognition is batched by text line, everything else by image
+    polygons = kwargs.get("polygons") or kwargs.get("bboxes")
+    if polygons is not None:
+        return sum(len(p) for p in polygons if p is not None)
+    items = args[0] if args else kwargs.get("images", kwargs.get("texts"))
+    return len(items) if items is not None else 0
+
+
+def call_batch_size(kwargs) -> int | None:
+    for k, v in kwargs.items():
+        if k.endswith("batch_size") and v is not None:
+            return int(v)
+    return None
+
+
+class ConversionMetrics:
+    """
+    Collects timings, memory use and counts for one conversion: each builder and processor that runs,
+    each call to a model, and each LLM request.  Model and LLM calls are recorded by the `InstrumentedModel`
+    and `InstrumentedService` proxies, which can be called from any thread.
+
+    CPU time covers every thread in the process.  Peak RSS deltas are how much a stage raised the process's
+    memory high-water mark, so stages that stay under an earlier peak report 0.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def reset(self):
+        with self.lock:
+            self.stages: List[Dict[str, Any]] = []
+            self.models: Dict[str, Dict[str, Any]] = {}
+            self.llm: Dict[str, Dict[str, Any]] = {}
+
+    @contextmanager
+    def stage(self, name: str, kind: str, items: int | None = None):
+        start_rss = peak_rss()
+        start_cpu = time.process_time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stage = {
+                "name": name,
+                "kind": kind,
+                "wall_time": time.perf_counter() - start,
+                "cpu_time": time.process_time() - start_cpu,
+                "peak_rss_delta": max(0, peak_rss() - start_rss),
+                "items": items,
+            }
+            with self.lock:
+                self.stages.append(stage)
+
+    def record_model_call(
+        self, name: str, items: int, batch_size: int | None, wall_time: float
+    ):
+        with self.lock:
+            model = self.models.setdefault(
+                name,
+                {"calls": 0, "items": 0, "batches": 0, "batch_slots": 0, "wall_time": 0.0},
+            )
+            model["calls"] += 1
+            model["items"] += items
+            model["wall_time"] += wall_time
+            if batch_size:
+                batches = math.ceil(items / batch_size)
+                model["batches"] += batches
+                model["batch_slots"] += batches * batch_size
+
+    def record_llm_request(self, name: str, latency: float, success: bool):
+        with self.lock:
+            service = self.llm.setdefault(
+                name,
+                {"requests": 0, "failures": 0, "total_latency": 0.0, "max_latency": 0.0},
+            )
+            service["requests"] += 1
+            service["failures"] += 0 if success else 1
+            service["total_latency"] += latency
+            service["max_latency"] = max(service["max_latency"], latency)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            models = {}
+            for name, model in self.models.items():
+                fill = None
+                if model["batch_slots"]:
+                    fill = model["items"] / model["batch_slots"]
+                models[name] = {**model, "batch_fill_ratio": fill}
+
+            llm = {}
+            for name, service in self.llm.items():
+                mean = None
+                if service["requests"]:
+                    mean = service["total_latency"] / service["requests"]
+                llm[name] = {**service, "mean_latency": mean}
+
+            return {
+                "stages": [dict(stage) for stage in self.stages],
+                "models": models,
+                "llm": llm,
+            }
+
+    def to_prometheus(self, prefix: str = "marker") -> str:
+        """
+        The metrics in the Prometheus text exposition format, which OpenMetrics scrapers also accept.
+        """
+        metrics = self.to_dict()
+        lines = []
+
+        def family(name: str, help_text: str, samples: List[tuple]):
+            if not samples:
+                return
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            for labels, value in samples:
+                if value is None:
+                    continue
+                label_text = ",".join(
+                    f'{k}="{escape_label(str(v))}"' for k, v in labels.items()
+                )
+                lines.append(f"{prefix}_{name}{{{label_text}}} {value}")
+
+        # A stage runs once per page window when streaming, so its runs are summed into one series
+        stages: Dict[tuple, Dict[str, Any]] = {}
+        for s in metrics["stages"]:
+            key = (s["name"], s["kind"])
+            if key not in stages:
+                stages[key] = {**s, "runs": 0}
+            else:
+                total = stages[key]
+                for field in ("wall_time", "cpu_time", "peak_rss_delta"):
+                    total[field] += s[field]
+                if s["items"] is not None:
+                    total["items"] = (total["items"] or 0) + s["items"]
+            stages[key]["runs"] += 1
+
+        for field, help_text in (
+            ("runs", "Times the stage ran, once per page window when streaming."),
+            ("wall_time", "Wall time spent in the stage, in seconds."),
+            ("cpu_time", "CPU time used by the process during the stage, in seconds."),
+            ("peak_rss_delta", "How much the stage raised peak resident memory, in bytes."),
+            ("items", "Pages or blocks handled by the stage."),
+        ):
+            unit = "_seconds" if field.endswith("time") else "_bytes" if field.endswith("delta") else ""
+            family(
+                f"stage_{field}{unit}",
+                help_text,
+                [({"stage": s["name"], "kind": s["kind"]}, s[field]) for s in stages.values()],
+            )
+
+        models = metrics["models"]
+        for field, name, help_text in (
+            ("calls", "model_calls", "Calls to the model."),
+            ("items", "model_items", "Images or text lines sent to the model."),
+            ("batches", "model_batches", "Model batches run."),
+            ("batch_fill_ratio", "model_batch_fill_ratio", "Share of batch slots that were filled."),
+            ("wall_time", "model_wall_time_seconds", "Wall time spent in the model, in seconds."),
+        ):
+            family(
+                name,
+                help_text,
+                [({"model": m}, values[field]) for m, values in models.items()],
+            )
+
+        llm = metrics["llm"]
+        for field, name, help_text in (
+            ("requests", "llm_requests", "Requests to the LLM service."),
+            ("failures", "llm_failures", "LLM requests that did not return a response."),
+            ("mean_latency", "llm_mean_latency_seconds", "Mean LLM request latency, in seconds."),
+            ("max_latency", "llm_max_latency_seconds", "Slowest LLM request, in seconds."),
+        ):
+            family(
+                name,
+                help_text,
+                [({"service": s}, values[field]) for s, values in llm.items()],
+            )
+
+        return "\n".join(lines) + "\n"
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def measure(metrics: ConversionMetrics | None, name: str, kind: str, items: int | None = None):
+    if metrics is None:
+        return nullcontext()
+    return metrics.stage(name, kind, items)
+
+
+class InstrumentedModel:
+    """
+    Wraps a model in the artifact dict and records the size, batch fill and wall time of every call.
+    Attributes are read from and set on the wrapped model.
+    """
+
+    def __init__(self, name: str, model, metrics: ConversionMetrics):
+        self.__dict__.update(name=name, model=model, metrics=metrics)
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        result = self.model(*args, **kwargs)
+        self.metrics.record_model_call(
+            self.name,
+            call_items(args, kwargs),
+            call_batch_size(kwargs),
+            time.perf_counter() - start,
+        )
+        return result
+
+    def __getattr__(self, name):
+        if name.startswith("__") or "model" not in self.__dict__:
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.model, name, value)
+
+
+class InstrumentedService:
+    """
+    Wraps an LLM service and records the latency of every request.  Services return an empty response
+    when a request fails after retries, which is counted as a failure.
+
+    `acall` is only exposed when the wrapped service has one, so callers can still tell sync-only services apart.
+    """
+
+    def __init__(self, service, metrics: ConversionMetrics):
+        self.__dict__.update(service=service, metrics=metrics)
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        success = False
+        try:
+            response = self.service(*args, **kwargs)
+            success = bool(response)
+            return response
+        finally:
+            self.metrics.record_llm_request(
+                type(self.service).__name__, time.perf_counter() - start, success
+            )
+
+    async def instrumented_acall(self, *args, **kwargs):
+        start = time.perf_counter()
+        success = False
+        try:
+            response = await self.service.acall(*args, **kwargs)
+            success = bool(response)
+            return response
+        finally:
+            self.metrics.record_llm_request(
+                type(self.service).__name__, time.perf_counter() - start, success
+            )
+
+    def __getattr__(self, name):
+        if name.startswith("__") or "service" not in self.__dict__:
+            raise AttributeError(name)
+        if name == "acall" and inspect.iscoroutinefunction(
+            getattr(self.service, "acall", None)
+        ):
+            return self.instrumented_acall
+        return getattr(self.service, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.service, name, value)
+
+
+def unwrap(obj):
+    if isinstance(obj, InstrumentedModel):
+        return obj.model
+    if isinstance(obj, InstrumentedService):
+        return obj.service
+    return obj
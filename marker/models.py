@@ -1,17 +1,368 @@
 import os
 os.environ["PYTORCH_ENABLE_MPS_FALLBACK"] = "1" # Transformers uses .isin for an op, which is not supported on MPS
 
+import gc
+import threading
+from collections import OrderedDict
+from functools import partial
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import torch
+
 from surya.detection import DetectionPredictor
 from surya.layout import LayoutPredictor
 from surya.ocr_error import OCRErrorPredictor
 from surya.recognition import RecognitionPredictor
 from surya.table_rec import TableRecPredictor
 
-def create_model_dict(device=None, dtype=None) -> dict:
+from marker.metrics import unwrap
+
+# Keyword arguments that hold one item per image, by model.  Calls to these models can be batched across documents.
+BATCHED_MODEL_KWARGS: Dict[str, Tuple[str, ...]] = {
+    "layout_model": ("images",),
+    "detection_model": ("images",),
+    "recognition_model": ("images", "task_names", "bboxes", "polygons", "input_text", "highres_images"),
+}
+
+
+MODEL_CLASSES = {
+    "layout_model": LayoutPredictor,
+    "recognition_model": RecognitionPredictor,
+    "table_rec_model": TableRecPredictor,
+    "detection_model": DetectionPredictor,
+    "ocr_error_model": OCRErrorPredictor,
+}
+
+
+def model_memory_size(predictor) -> int:
+    # Weights and buffers of the underlying torch module, in bytes
+    model = getattr(predictor, "model", None)
+    if model is None or not hasattr(model, "parameters"):
+        return 0
+    tensors = list(model.parameters())
+    if hasattr(model, "buffers"):
+        tensors += list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+class ModelResidency:
+    """
+    Tracks which lazily loaded models are in memory.  When loading a model takes the total over
+    `max_memory` bytes, the least recently used models that are not running are released.
+    Model dicts that share a residency share the budget.
+    """
+
+    def __init__(self, max_memory: int | None = None):
+        self.max_memory = max_memory
+        self.lock = threading.RLock()
+        self.resident: OrderedDict[LazyModel, int] = OrderedDict()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+
+    @property
+    def resident_memory(self) -> int:
+        return sum(self.resident.values())
+
+    def touch(self, model: "LazyModel"):
+        with self.lock:
+            if model in self.resident:
+                self.resident.move_to_end(model)
+
+    def loaded(self, model: "LazyModel", size: int):
+        with self.lock:
+            self.resident[model] = size
+            self.resident.move_to_end(model)
+            evict = []
+            if self.max_memory is not None:
+                total = self.resident_memory
+                for other, other_size in self.resident.items():
+                    if total <= self.max_memory:
+                        break
+                    if other is model or other.active > 0:
+                        continue
+                    evict.append(other)
+                    total -= other_size
+
+        for other in evict:
+            other.release()
+
+    def released(self, model: "LazyModel"):
+        with self.lock:
+            self.resident.pop(model, None)
+
+
+class LazyModel:
+    """
+    Stands in for a predictor in the artifact dict, and only loads it when it is first used.
+    Attributes set on the proxy, like `disable_tqdm`, are kept and applied again if the model is reloaded.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        loader: Callable[[], Any],
+        residency: ModelResidency | None = None,
+    ):
+        self.__dict__.update(
+            name=name,
+            loader=loader,
+            residency=residency if residency is not None else ModelResidency(),
+            predictor=None,
+            active=0,
+            overrides={},
+            lock=threading.RLock(),
+        )
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__["lock"] = threading.RLock()
+
+    def __repr__(self):
+        status = "loaded" if self.is_loaded else "not loaded"
+        return f"LazyModel({self.name}, {status})"
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.predictor is not None
+
+    def load(self):
+        with self.lock:
+            predictor = self.predictor
+            if predictor is None:
+                predictor = self.loader()
+                for name, value in self.overrides.items():
+                    setattr(predictor, name, value)
+                self.__dict__["predictor"] = predictor
+                self.residency.loaded(self, model_memory_size(predictor))
+            else:
+                self.residency.touch(self)
+            return predictor
+
+    def release(self):
+        with self.lock:
+            if self.predictor is None or self.active > 0:
+                return
+            self.__dict__["predictor"] = None
+            self.residency.released(self)
+
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def __call__(self, *args, **kwargs):
+        with self.lock:
+            predictor = self.load()
+            self.__dict__["active"] += 1
+        try:
+            return predictor(*args, **kwargs)
+        finally:
+            with self.lock:
+                self.__dict__["active"] -= 1
+
+    def __getattr__(self, name):
+        # Only called for attributes that are not on the proxy itself
+        if name.startswith("__") or "predictor" not in self.__dict__:
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __setattr__(self, name, value):
+        with self.lock:
+            self.overrides[name] = value
+            if self.predictor is not None:
+                setattr(self.predictor, name, value)
+
+
+def create_model_dict(
+    device=None,
+    dtype=None,
+    models: Sequence[str] | None = None,
+    lazy: bool = True,
+    max_memory: int | None = None,
+    residency: ModelResidency | None = None,
+) -> dict:
+    # Only the named models are included, like the `required_models` of a converter.  Lazy models are
+    # loaded on first use, and kept under `max_memory` bytes, or the budget of a shared `residency`.
+    if models is None:
+        models = MODEL_CLASSES.keys()
+    if not lazy:
+        return {name: MODEL_CLASSES[name](device=device, dtype=dtype) for name in models}
+
+    if residency is None:
+        residency = ModelResidency(max_memory)
+    return {
+        name: LazyModel(
+            name, partial(MODEL_CLASSES[name], device=device, dtype=dtype), residency
+        )
+        for name in models
+    }
+
+
+def create_shared_model_dict(models: Sequence[str] | None = None) -> dict:
+    # Loaded up front and moved to shared memory, so worker processes all use one copy instead of loading their own
+    model_dict = create_model_dict(models=models, lazy=False)
+    for model in model_dict.values():
+        model.model.share_memory()
+    return model_dict
+
+
+def release_models(model_dict: dict):
+    for model in model_dict.values():
+        model = unwrap(model)
+        if isinstance(model, BatchedPredictor):
+            model = model.predictor
+        if isinstance(model, LazyModel):
+            model.release()
+
+
+# Requests are compared by identity, since identical calls from two documents are still separate requests
+@dataclass(eq=False)
+class BatchRequest:
+    key: Tuple
+    kwargs: Dict[str, Any]
+    size: int
+    result: List[Any] | None = None
+    error: Exception | None = None
+    done: bool = False
+
+
+class BatchedPredictor:
+    """
+    Wraps a predictor so calls from documents converting in parallel threads share model batches.
+    Each call waits up to `batch_wait_time` seconds for calls from other documents, then the combined
+    batch is run once and the results are split back out to each caller.
+    """
+
+    def __init__(
+        self,
+        predictor,
+        batch_kwargs: Tuple[str, ...] | None = None,
+        max_batch_images: int = 64,
+        batch_wait_time: float = 0.05,
+    ):
+        self.predictor = predictor
+        self.batch_kwargs = batch_kwargs
+        self.max_batch_images = max_batch_images
+        self.batch_wait_time = batch_wait_time
+
+        self.condition = threading.Condition()
+        self.model_lock = threading.Lock()  # Only one batch runs on the model at a time
+        self.pending: List[BatchRequest] = []
+
+    def __getattr__(self, name):
+        return getattr(self.predictor, name)
+
+    def __call__(self, *args, **kwargs):
+        key = None
+        if self.batch_kwargs is not None:
+            if args:
+                kwargs["images"], args = args[0], args[1:]
+            key = self.batch_key(kwargs)
+
+        if key is None or args:
+            # Models without per-image arguments, like the OCR error model, are only serialized
+            with self.model_lock:
+                return self.predictor(*args, **kwargs)
+
+        request = BatchRequest(key=key, kwargs=kwargs, size=len(kwargs["images"]))
+        with self.condition:
+            self.pending.append(request)
+            self.condition.notify_all()
+            self.condition.wait_for(
+                lambda: request.done or self.pending_size(key) >= self.max_batch_images,
+                timeout=self.batch_wait_time,
+            )
+
+        while True:
+            with self.condition:
+                if request.done:
+                    break
+                if request not in self.pending:
+                    # Another caller is running the batch this request is in
+                    self.condition.wait_for(lambda: request.done)
+                    continue
+                batch = self.take_batch(request)
+            self.run_batch(batch)
+
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def batch_key(self, kwargs: Dict[str, Any]) -> Tuple | None:
+        # Calls can only share a batch if all of their other arguments match
+        key = tuple(
+            (k, v is None) if k in self.batch_kwargs else (k, v)
+            for k, v in sorted(kwargs.items())
+        )
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def pending_size(self, key: Tuple) -> int:
+        return sum(r.size for r in self.pending if r.key == key)
+
+    def take_batch(self, request: BatchRequest) -> List[BatchRequest]:
+        batch = [request]
+        batch_size = request.size
+        for other in self.pending:
+            if other is request or other.key != request.key:
+                continue
+            if batch_size + other.size > self.max_batch_images:
+                break
+            batch.append(other)
+            batch_size += other.size
+
+        taken = {id(r) for r in batch}
+        self.pending = [r for r in self.pending if id(r) not in taken]
+        return batch
+
+    def run_batch(self, batch: List[BatchRequest]):
+        merged_kwargs = dict(batch[0].kwargs)
+        for k in self.batch_kwargs:
+            if merged_kwargs.get(k) is not None:
+                merged_kwargs[k] = [item for r in batch for item in r.kwargs[k]]
+
+        try:
+            with self.model_lock:
+                results = self.predictor(**merged_kwargs)
+
+            start = 0
+            for r in batch:
+                r.result = results[start : start + r.size]
+                start += r.size
+        except Exception as e:
+            for r in batch:
+                r.error = e
+
+        with self.condition:
+            for r in batch:
+                r.done = True
+            self.condition.notify_all()
+
+
+def create_batched_model_dict(
+    model_dict: dict, max_batch_images: int = 64, batch_wait_time: float = 0.05
+) -> dict:
     return {
-        "layout_model": LayoutPredictor(device=device, dtype=dtype),
-        "recognition_model": RecognitionPredictor(device=device, dtype=dtype),
-        "table_rec_model": TableRecPredictor(device=device, dtype=dtype),
-        "detection_model": DetectionPredictor(device=device, dtype=dtype),
-        "ocr_error_model": OCRErrorPredictor(device=device, dtype=dtype)
-    }
\ No newline at end of file
+        k: BatchedPredictor(
+            v,
+            batch_kwargs=BATCHED_MODEL_KWARGS.get(k),
+            max_batch_images=max_batch_images,
+            batch_wait_time=batch_wait_time,
+        )
+        for k, v in model_dict.items()
+    }
@@ -1,4 +1,4 @@
-from typing import Optional, Tuple
+from typing import Any, Dict, Optional, Tuple
 
 from pydantic import BaseModel
 
@@ -9,6 +9,7 @@ from marker.util import assign_config
 
 class BaseProcessor:
     block_types: Tuple[BlockTypes] | None = None  # What block types this processor is responsible for
+    window_state: Dict[str, Any] | None = None  # State carried across page windows when streaming, None otherwise
 
     def __init__(self, config: Optional[BaseModel | dict] = None):
         assign_config(self, config)
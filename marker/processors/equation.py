@@ -60,13 +60,17 @@ class EquationProcessor(BaseProcessor):
         total_equation_blocks = 0
 
         for page in document.pages:
+            equation_blocks = page.contained_blocks(document, self.block_types)
+            # Skip pages without equations, so we don't render their images
+            if len(equation_blocks) == 0:
+                continue
+
             page_image = page.get_image(highres=True)
             page_size = page.polygon.width, page.polygon.height
             image_size = page_image.size
 
             page_equation_boxes = []
             page_equation_block_ids = []
-            equation_blocks = page.contained_blocks(document, self.block_types)
             for block in equation_blocks:
                 page_equation_boxes.append(
                     block.polygon.rescale(page_size, image_size).bbox
@@ -59,8 +59,8 @@ class IgnoreTextProcessor(BaseProcessor):
             if last_block is not None:
                 last_blocks.append(last_block)
 
-        self.filter_common_elements(document, first_blocks)
-        self.filter_common_elements(document, last_blocks)
+        self.filter_common_elements(document, first_blocks, "first_blocks")
+        self.filter_common_elements(document, last_blocks, "last_blocks")
 
     @staticmethod
     def clean_text(text):
@@ -69,21 +69,27 @@ class IgnoreTextProcessor(BaseProcessor):
         text = re.sub(r"\s*\d+$", "", text)  # remove numbers at the end of the line
         return text
 
-    def filter_common_elements(self, document, blocks: List[Block]):
+    def filter_common_elements(self, document, blocks: List[Block], state_key: str | None = None):
+        text = [self.clean_text(b.raw_text(document)) for b in blocks]
+
+        # When streaming, count the text of blocks from earlier page windows too
+        all_text = text
+        if self.window_state is not None and state_key is not None:
+            all_text = self.window_state.get(state_key, []) + text
+            self.window_state[state_key] = all_text
+
         # We can't filter if we don't have enough pages to find common elements
-        if len(blocks) < self.common_element_min_blocks:
+        if len(all_text) < self.common_element_min_blocks:
             return
 
-        text = [self.clean_text(b.raw_text(document)) for b in blocks]
-
         streaks = {}
-        for key, group in groupby(text):
+        for key, group in groupby(all_text):
             streaks[key] = max(streaks.get(key, 0), len(list(group)))
 
-        counter = Counter(text)
+        counter = Counter(all_text)
         common = [
             k for k, v in counter.items()
-            if (v >= len(blocks) * self.common_element_threshold or streaks[k] >= self.max_streak)
+            if (v >= len(all_text) * self.common_element_threshold or streaks[k] >= self.max_streak)
             and v > self.common_element_min_blocks
         ]
         if len(common) == 0:
@@ -5,7 +5,7 @@ from marker.schema import BlockTypes
 from marker.schema.blocks import Block
 from marker.schema.document import Document
 from marker.schema.text import Line
-from marker.util import matrix_intersection_area
+from marker.util import SpatialIndex
 
 
 class LineMergeProcessor(BaseProcessor):
@@ -44,27 +44,26 @@ class LineMergeProcessor(BaseProcessor):
     def merge_lines(self, lines: List[Line], block: Block):
         lines = [l for l in lines if l.polygon.width * 5 > l.polygon.height]  # Skip vertical lines
         line_bboxes = [l.polygon.expand(self.block_expand_threshold, 0).bbox for l in lines]  # Expand horizontally
-        intersections = matrix_intersection_area(line_bboxes, line_bboxes)
+        line_index = SpatialIndex(line_bboxes)
 
         merges = []
         merge = []
         for i in range(len(line_bboxes)):
-            intersection_row = intersections[i]
-            intersection_row[i] = 0  # Zero out the current idx
-
-            if i < len(line_bboxes) - 1:
-                intersection_row[i+1] = 0 # Zero out the next idx, so we only evaluate merge from the left
+            intersection_idxs, intersection_areas = line_index.intersection_areas(line_bboxes[i])
+            intersection_row = dict(zip(intersection_idxs.tolist(), intersection_areas))
+            intersection_row.pop(i, None)  # Zero out the current idx
+            intersection_row.pop(i + 1, None)  # Zero out the next idx, so we only evaluate merge from the left
 
             if len(merge) == 0:
                 merge.append(i)
                 continue
 
             # Zero out previous merge segments
-            merge_intersection = sum([intersection_row[m] for m in merge])
+            merge_intersection = sum([intersection_row.get(m, 0) for m in merge])
             line_area = lines[i].polygon.area
             intersection_pct = merge_intersection / max(1, line_area)
 
-            total_intersection = max(1, sum(intersection_row))
+            total_intersection = max(1, sum(intersection_row.values()))
 
             line_start = lines[merge[0]].polygon.y_start
             line_end = lines[merge[0]].polygon.y_end
@@ -11,7 +11,7 @@ from marker.schema import BlockTypes
 from marker.schema.blocks import Block
 from marker.schema.document import Document
 from marker.schema.groups import PageGroup
-from marker.services import BaseService
+from marker.services import BaseService, request_concurrency
 from marker.util import assign_config
 from marker.logger import get_logger
 
@@ -39,8 +39,9 @@ class BaseLLMProcessor(BaseProcessor):
 
     max_concurrency: Annotated[
         int,
-        "The maximum number of concurrent requests to make to the Gemini model.",
-    ] = 3
+        "The maximum number of concurrent requests to make to the LLM service.",
+        "Default is None, which uses the service's `max_concurrency`.  The service also limits requests across all processors.",
+    ] = None
     image_expansion_ratio: Annotated[
         float,
         "The ratio to expand the image by when cropping.",
@@ -107,7 +108,9 @@ class BaseLLMComplexBlockProcessor(BaseLLMProcessor):
         pbar = tqdm(
             desc=f"{self.__class__.__name__} running", disable=self.disable_tqdm
         )
-        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+        with ThreadPoolExecutor(
+            max_workers=request_concurrency(self.llm_service, self.max_concurrency)
+        ) as executor:
             for future in as_completed(
                 [
                     executor.submit(self.process_rewriting, document, page, block)
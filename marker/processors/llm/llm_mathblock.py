@@ -11,6 +11,7 @@ from marker.schema import BlockTypes
 from marker.schema.blocks import Block, InlineMath
 from marker.schema.document import Document
 from marker.schema.groups import PageGroup
+from marker.services import request_concurrency
 
 
 class LLMMathBlockProcessor(BaseLLMComplexBlockProcessor):
@@ -144,7 +145,9 @@ Adversarial training <i>(AT)</i> <a href='#page-9-1'>[23]</a>, which aims to min
         pbar = tqdm(
             desc=f"{self.__class__.__name__} running", disable=self.disable_tqdm
         )
-        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+        with ThreadPoolExecutor(
+            max_workers=request_concurrency(self.llm_service, self.max_concurrency)
+        ) as executor:
             for future in as_completed(
                 [
                     executor.submit(self.process_rewriting, document, b[0], b[1])
@@ -1,21 +1,57 @@
-from concurrent.futures import ThreadPoolExecutor
-from typing import List, Dict, Any
+import asyncio
+import inspect
+from typing import Annotated, List, Dict, Any
+
+from pydantic import BaseModel, ValidationError, create_model
 
 from marker.logger import get_logger
 from tqdm import tqdm
 
 from marker.processors.llm import BaseLLMSimpleBlockProcessor, BaseLLMProcessor
+from marker.schema.blocks import Block
 from marker.schema.document import Document
-from marker.services import BaseService
+from marker.services import BaseService, request_concurrency
+from marker.util import run_async
 
 logger = get_logger()
 
 
+class PackedBlocks:
+    """
+    Stands in for the block of a request that packs several blocks.  Metadata the service records, like
+    tokens and request counts, is spread across the packed blocks, so totals over the document still add up.
+    """
+
+    def __init__(self, blocks: List[Block]):
+        self.blocks = blocks
+
+    def update_metadata(self, **kwargs):
+        for i, block in enumerate(self.blocks):
+            share = {}
+            for key, value in kwargs.items():
+                base, extra = divmod(value, len(self.blocks))
+                share[key] = base + (1 if i < extra else 0)
+            block.update_metadata(**share)
+
+
 class LLMSimpleBlockMetaProcessor(BaseLLMProcessor):
     """
     A wrapper for simple LLM processors, so they can all run in parallel.
     """
 
+    max_blocks_per_request: Annotated[
+        int,
+        "Pack up to this many blocks from the same processor and page into one LLM request, with one image per block.",
+        "Blocks whose part of the response doesn't parse are sent again on their own.  Default is 1, for one request per block.",
+    ] = 1
+    batch_prompt: Annotated[
+        str,
+        "The prompt that wraps the tasks of blocks packed into one request.",
+    ] = """You will receive {count} images, and one task for each image below.  Complete each task on its own, using only the image with the same number.
+Respond with a list of exactly {count} results, in the same order as the tasks.
+
+{tasks}"""
+
     def __init__(
         self,
         processor_lst: List[BaseLLMSimpleBlockProcessor],
@@ -39,30 +75,139 @@ class LLMSimpleBlockMetaProcessor(BaseLLMProcessor):
         all_prompts = [
             processor.block_prompts(document) for processor in self.processors
         ]
+        run_async(self.run_prompts(all_prompts, document, pbar))
+
+        pbar.close()
+
+    async def run_prompts(
+        self, all_prompts: List[List[Dict[str, Any]]], document: Document, pbar: tqdm
+    ):
+        # Every request is in flight at once, and the service's scheduler decides when each one is sent
+        semaphore = asyncio.Semaphore(
+            request_concurrency(self.llm_service, self.max_concurrency)
+        )
         pending = []
-        futures_map = {}
-        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
-            for i, prompt_lst in enumerate(all_prompts):
-                for prompt in prompt_lst:
-                    future = executor.submit(self.get_response, prompt)
-                    pending.append(future)
-                    futures_map[future] = {"processor_idx": i, "prompt_data": prompt}
-
-            for future in pending:
+        for i, prompt_lst in enumerate(all_prompts):
+            for group in self.group_prompts(prompt_lst):
+                if len(group) == 1:
+                    task = self.get_response_async(group[0], semaphore)
+                else:
+                    task = self.get_batch_responses_async(group, semaphore)
+                pending.append((asyncio.ensure_future(task), i, group))
+
+        # Responses are applied in order, on this thread
+        for task, processor_idx, group in pending:
+            try:
+                results = await task
+                if len(group) == 1:
+                    results = [results]
+            except Exception as e:
+                logger.warning(f"Error processing LLM response: {e}")
+                pbar.update(len(group))
+                continue
+
+            processor: BaseLLMSimpleBlockProcessor = self.processors[processor_idx]
+            for result, prompt_data in zip(results, group):
                 try:
-                    result = future.result()
-                    future_data = futures_map.pop(future)
-                    processor: BaseLLMSimpleBlockProcessor = self.processors[
-                        future_data["processor_idx"]
-                    ]
                     # finalize the result
-                    processor(result, future_data["prompt_data"], document)
+                    processor(result, prompt_data, document)
                 except Exception as e:
                     logger.warning(f"Error processing LLM response: {e}")
 
                 pbar.update(1)
 
-        pbar.close()
+    def group_prompts(self, prompt_lst: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        # Runs of blocks on the same page, so the order that responses are applied in doesn't change
+        groups = []
+        for prompt_data in prompt_lst:
+            last = groups[-1] if groups else None
+            if (
+                last is not None
+                and len(last) < self.max_blocks_per_request
+                and self.can_batch(prompt_data)
+                and self.can_batch(last[0])
+                and prompt_data["schema"] is last[0]["schema"]
+                and self.prompt_page(prompt_data) == self.prompt_page(last[0])
+            ):
+                last.append(prompt_data)
+            else:
+                groups.append([prompt_data])
+        return groups
+
+    @staticmethod
+    def can_batch(prompt_data: Dict[str, Any]) -> bool:
+        return (
+            prompt_data.get("image") is not None
+            and not isinstance(prompt_data["image"], list)
+            and isinstance(prompt_data.get("schema"), type)
+            and issubclass(prompt_data["schema"], BaseModel)
+        )
+
+    @staticmethod
+    def prompt_page(prompt_data: Dict[str, Any]):
+        page = prompt_data.get("page")
+        return page.page_id if page is not None else None
+
+    @staticmethod
+    def batch_schema(schema: type[BaseModel]) -> type[BaseModel]:
+        return create_model(f"{schema.__name__}Batch", results=(List[schema], ...))
+
+    async def get_batch_responses_async(
+        self, group: List[Dict[str, Any]], semaphore: asyncio.Semaphore
+    ) -> List[dict]:
+        schema = group[0]["schema"]
+        blocks = [prompt_data["block"] for prompt_data in group if prompt_data["block"] is not None]
+        tasks = "\n\n".join(
+            f"Task {i + 1} (image {i + 1}):\n{prompt_data['prompt']}"
+            for i, prompt_data in enumerate(group)
+        )
+        batch_prompt_data = {
+            "prompt": self.batch_prompt.replace("{count}", str(len(group))).replace(
+                "{tasks}", tasks
+            ),
+            "image": [prompt_data["image"] for prompt_data in group],
+            "block": PackedBlocks(blocks) if blocks else None,
+            "schema": self.batch_schema(schema),
+        }
+        response = await self.get_response_async(batch_prompt_data, semaphore)
+
+        results = []
+        if response and isinstance(response.get("results"), list):
+            results = response["results"]
+        if len(results) != len(group):
+            results = [None] * len(group)
+
+        retries = {}
+        for i, result in enumerate(results):
+            try:
+                results[i] = schema.model_validate(result).model_dump()
+            except ValidationError:
+                retries[i] = asyncio.ensure_future(
+                    self.get_response_async(group[i], semaphore)
+                )
+
+        if retries:
+            logger.debug(
+                f"Sending {len(retries)} of {len(group)} batched blocks again on their own"
+            )
+        for i, task in retries.items():
+            results[i] = await task
+        return results
+
+    async def get_response_async(
+        self, prompt_data: Dict[str, Any], semaphore: asyncio.Semaphore
+    ):
+        if inspect.iscoroutinefunction(getattr(self.llm_service, "acall", None)):
+            return await self.llm_service.acall(
+                prompt_data["prompt"],
+                prompt_data["image"],
+                prompt_data["block"],
+                prompt_data["schema"],
+            )
+
+        # Services without an async interface block a thread for each request
+        async with semaphore:
+            return await asyncio.to_thread(self.get_response, prompt_data)
 
     def get_response(self, prompt_data: Dict[str, Any]):
         return self.llm_service(
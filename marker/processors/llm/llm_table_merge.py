@@ -10,6 +10,7 @@ from marker.processors.llm import BaseLLMComplexBlockProcessor
 from marker.schema import BlockTypes
 from marker.schema.blocks import Block, TableCell
 from marker.schema.document import Document
+from marker.services import request_concurrency
 
 
 class LLMTableMergeProcessor(BaseLLMComplexBlockProcessor):
@@ -210,7 +211,9 @@ Table 2
         if table_run:
             table_runs.append(table_run)
 
-        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+        with ThreadPoolExecutor(
+            max_workers=request_concurrency(self.llm_service, self.max_concurrency)
+        ) as executor:
             for future in as_completed([
                 executor.submit(self.process_rewriting, document, blocks)
                 for blocks in table_runs
@@ -49,6 +49,11 @@ class SectionHeaderProcessor(BaseProcessor):
                     block.ignore_for_output = True  # Don't output an empty section header
 
         flat_line_heights = list(line_heights.values())
+        if self.window_state is not None:
+            # Bucket headings using the heights seen in earlier page windows too
+            flat_line_heights = self.window_state.get("line_heights", []) + flat_line_heights
+            self.window_state["line_heights"] = flat_line_heights
+
         heading_ranges = self.bucket_headings(flat_line_heights)
 
         for page in document.pages:
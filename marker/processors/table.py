@@ -12,12 +12,13 @@ from surya.table_rec.schema import TableResult, TableCell as SuryaTableCell
 from pdftext.extraction import table_output
 
 from marker.processors import BaseProcessor
+from marker.providers.pdf import PDFIUM_LOCK
 from marker.schema import BlockTypes
 from marker.schema.blocks.tablecell import TableCell
 from marker.schema.document import Document
 from marker.schema.polygon import PolygonBox
 from marker.settings import settings
-from marker.util import matrix_intersection_area
+from marker.util import SpatialIndex
 from marker.logger import get_logger
 
 logger = get_logger()
@@ -90,9 +91,10 @@ class TableProcessor(BaseProcessor):
         for page in document.pages:
             for block in page.contained_blocks(document, self.block_types):
                 image = block.get_image(document, highres=True)
+                page_image_size = page.get_image(highres=True).size
                 image_poly = block.polygon.rescale(
                     (page.polygon.width, page.polygon.height),
-                    page.get_image(highres=True).size,
+                    page_image_size,
                 )
 
                 table_data.append(
@@ -101,7 +103,7 @@ class TableProcessor(BaseProcessor):
                         "page_id": page.page_id,
                         "table_image": image,
                         "table_bbox": image_poly.bbox,
-                        "img_size": page.get_image(highres=True).size,
+                        "img_size": page_image_size,
                         "ocr_block": any(
                             [
                                 page.text_extraction_method in ["surya", "hybrid"],
@@ -141,10 +143,11 @@ class TableProcessor(BaseProcessor):
             for block in page.contained_blocks(document, self.block_types):
                 block.structure = []  # Remove any existing lines, spans, etc.
                 cells: List[SuryaTableCell] = tables[table_idx].cells
+                page_image_size = page.get_image(highres=True).size
                 for cell in cells:
                     # Rescale the cell polygon to the page size
                     cell_polygon = PolygonBox(polygon=cell.polygon).rescale(
-                        page.get_image(highres=True).size, page.polygon.size
+                        page_image_size, page.polygon.size
                     )
 
                     # Rescale cell polygon to be relative to the page instead of the table
@@ -166,21 +169,21 @@ class TableProcessor(BaseProcessor):
                     block.add_structure(cell_block)
                 table_idx += 1
 
+        self.remove_contained_blocks(document)
+
+    def remove_contained_blocks(self, document: Document):
         # Clean out other blocks inside the table
         # This can happen with stray text blocks inside the table post-merging
         for page in document.pages:
             child_contained_blocks = page.contained_blocks(
                 document, self.contained_block_types
             )
+            child_index = SpatialIndex([c.polygon.bbox for c in child_contained_blocks])
             for block in page.contained_blocks(document, self.block_types):
-                intersections = matrix_intersection_area(
-                    [c.polygon.bbox for c in child_contained_blocks],
-                    [block.polygon.bbox],
-                )
-                for child, intersection in zip(child_contained_blocks, intersections):
-                    # Adjust this to percentage of the child block that is enclosed by the table
-                    intersection_pct = intersection / max(child.polygon.area, 1)
-                    if intersection_pct > 0.95 and child.id in page.structure:
+                # Children with more than 95% of their area enclosed by the table
+                for child_idx in child_index.contained(block.polygon.bbox, 0.95):
+                    child = child_contained_blocks[child_idx]
+                    if child.id in page.structure:
                         page.structure.remove(child.id)
 
     def finalize_cell_text(self, cell: SuryaTableCell):
@@ -406,20 +409,14 @@ class TableProcessor(BaseProcessor):
         for table_result, table_page_data in zip(tables, table_data):
             table_text_lines = table_page_data["table_text_lines"]
             table_cells: List[SuryaTableCell] = table_result.cells
-            text_line_bboxes = [t["bbox"] for t in table_text_lines]
-            table_cell_bboxes = [c.bbox for c in table_cells]
-
-            intersection_matrix = matrix_intersection_area(
-                text_line_bboxes, table_cell_bboxes
-            )
+            cell_index = SpatialIndex([c.bbox for c in table_cells])
 
             cell_text = defaultdict(list)
-            for text_line_idx, table_text_line in enumerate(table_text_lines):
-                intersections = intersection_matrix[text_line_idx]
-                if intersections.sum() == 0:
+            for table_text_line in table_text_lines:
+                max_intersection, _ = cell_index.max_intersection(table_text_line["bbox"])
+                if max_intersection is None:
                     continue
 
-                max_intersection = intersections.argmax()
                 cell_text[max_intersection].append(table_text_line)
 
             for k in cell_text:
@@ -444,12 +441,13 @@ class TableProcessor(BaseProcessor):
                     img_size = block["img_size"]
 
             table_inputs.append({"tables": tables, "img_size": img_size})
-        cell_text = table_output(
-            filepath,
-            table_inputs,
-            page_range=unique_pages,
-            workers=self.pdftext_workers,
-        )
+        with PDFIUM_LOCK:
+            cell_text = table_output(
+                filepath,
+                table_inputs,
+                page_range=unique_pages,
+                workers=self.pdftext_workers,
+            )
         assert len(cell_text) == len(unique_pages), (
             "Number of pages and table inputs must match"
         )
@@ -515,3 +513,181 @@ class TableProcessor(BaseProcessor):
         elif settings.TORCH_DEVICE_MODEL == "cuda":
             return 32
         return 32
+
+
+class TextLayerTableProcessor(TableProcessor):
+    """
+    A processor for recognizing tables from the PDF text layer alone, without any models or page images.
+    Rows are built from text that overlaps vertically, and columns from the horizontal gaps that are
+    shared by every row.
+    """
+
+    row_overlap_threshold: Annotated[
+        float,
+        "The fraction of the shorter text's height that two pieces of text must overlap vertically to be in the same row.",
+    ] = 0.5
+
+    def __init__(self, config=None):
+        BaseProcessor.__init__(self, config)
+
+        self.detection_model = None
+        self.recognition_model = None
+        self.table_rec_model = None
+
+    def __call__(self, document: Document):
+        table_data = []
+        for page in document.pages:
+            for block in page.contained_blocks(document, self.block_types):
+                table_data.append(
+                    {
+                        "block": block,
+                        "page_id": page.page_id,
+                        # Text is extracted in page coordinates, so no image is needed
+                        "table_bbox": block.polygon.bbox,
+                        "img_size": page.polygon.size,
+                    }
+                )
+
+        self.assign_pdftext_lines(table_data, document.filepath)
+
+        for table_item in table_data:
+            block = table_item["block"]
+            page = document.get_page(block.page_id)
+            block.structure = []  # Remove any existing lines, spans, etc.
+
+            for cell in self.build_cells(table_item.get("table_text_lines", [])):
+                # Cell bboxes are relative to the table
+                cell_bbox = cell["bbox"]
+                cell_block = TableCell(
+                    polygon=PolygonBox.from_bbox(
+                        [
+                            cell_bbox[0] + block.polygon.bbox[0],
+                            cell_bbox[1] + block.polygon.bbox[1],
+                            cell_bbox[2] + block.polygon.bbox[0],
+                            cell_bbox[3] + block.polygon.bbox[1],
+                        ]
+                    ),
+                    text_lines=cell["text_lines"],
+                    rowspan=1,
+                    colspan=cell["colspan"],
+                    row_id=cell["row_id"],
+                    col_id=cell["col_id"],
+                    is_header=cell["row_id"] == 0,
+                    page_id=page.page_id,
+                )
+                page.add_full_block(cell_block)
+                block.add_structure(cell_block)
+
+        self.remove_contained_blocks(document)
+
+    def build_rows(self, text_lines: List[dict]) -> List[List[dict]]:
+        rows = []
+        row_bounds = []
+        for text_line in sorted(text_lines, key=lambda t: (t["bbox"][1], t["bbox"][0])):
+            y_start, y_end = text_line["bbox"][1], text_line["bbox"][3]
+            if row_bounds:
+                row_start, row_end = row_bounds[-1]
+                overlap = min(row_end, y_end) - max(row_start, y_start)
+                min_height = max(min(row_end - row_start, y_end - y_start), 1)
+                if overlap / min_height >= self.row_overlap_threshold:
+                    rows[-1].append(text_line)
+                    row_bounds[-1] = (min(row_start, y_start), max(row_end, y_end))
+                    continue
+            rows.append([text_line])
+            row_bounds.append((y_start, y_end))
+
+        return [sorted(row, key=lambda t: t["bbox"][0]) for row in rows]
+
+    @staticmethod
+    def build_columns(rows: List[List[dict]]) -> List[List[float]]:
+        # Rows with a single piece of text are usually titles that span the table, so they don't split columns
+        column_rows = [row for row in rows if len(row) > 1] or rows
+        intervals = sorted(
+            [t["bbox"][0], t["bbox"][2]] for row in column_rows for t in row
+        )
+
+        columns = []
+        for x_start, x_end in intervals:
+            if columns and x_start <= columns[-1][1]:
+                columns[-1][1] = max(columns[-1][1], x_end)
+            else:
+                columns.append([x_start, x_end])
+        return columns
+
+    def build_cells(self, text_lines: List[dict]) -> List[dict]:
+        text_lines = [t for t in text_lines if t["text"].strip()]
+        if len(text_lines) == 0:
+            return []
+
+        rows = self.build_rows(text_lines)
+        columns = self.build_columns(rows)
+
+        cells = []
+        for row_id, row in enumerate(rows):
+            row_start = min(t["bbox"][1] for t in row)
+            row_end = max(t["bbox"][3] for t in row)
+
+            # Each piece of text starts in the column it overlaps first, and spans every column it overlaps
+            row_cells = {}
+            for text_line in row:
+                x_start, x_end = text_line["bbox"][0], text_line["bbox"][2]
+                overlapping = [
+                    i
+                    for i, (col_start, col_end) in enumerate(columns)
+                    if min(col_end, x_end) > max(col_start, x_start)
+                ]
+                if not overlapping:
+                    center = (x_start + x_end) / 2
+                    overlapping = [
+                        min(
+                            range(len(columns)),
+                            key=lambda i: abs((columns[i][0] + columns[i][1]) / 2 - center),
+                        )
+                    ]
+
+                col_id = overlapping[0]
+                if col_id in row_cells:
+                    row_cells[col_id]["text_lines"].append(text_line["text"].strip())
+                    row_cells[col_id]["colspan"] = max(
+                        row_cells[col_id]["colspan"], overlapping[-1] - col_id + 1
+                    )
+                else:
+                    row_cells[col_id] = {
+                        "text_lines": [text_line["text"].strip()],
+                        "colspan": overlapping[-1] - col_id + 1,
+                    }
+
+            # Fill in empty cells, so every row covers every column
+            col_id = 0
+            while col_id < len(columns):
+                cell = row_cells.get(col_id, {"text_lines": [], "colspan": 1})
+                text = list(cell["text_lines"])
+                colspan = min(cell["colspan"], len(columns) - col_id)
+
+                # Text that starts inside a spanning cell is part of it
+                covered_id = col_id + 1
+                while covered_id < col_id + colspan:
+                    if covered_id in row_cells:
+                        text += row_cells[covered_id]["text_lines"]
+                        colspan = min(
+                            max(colspan, covered_id + row_cells[covered_id]["colspan"] - col_id),
+                            len(columns) - col_id,
+                        )
+                    covered_id += 1
+                cells.append(
+                    {
+                        "bbox": [
+                            columns[col_id][0],
+                            row_start,
+                            columns[col_id + colspan - 1][1],
+                            row_end,
+                        ],
+                        "text_lines": [self.normalize_spaces(fix_text(t)) for t in text],
+                        "row_id": row_id,
+                        "col_id": col_id,
+                        "colspan": colspan,
+                    }
+                )
+                col_id += colspan
+
+        return cells
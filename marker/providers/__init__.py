@@ -1,5 +1,7 @@
-from copy import deepcopy
-from typing import List, Optional, Dict
+import threading
+from collections import OrderedDict
+from enum import Enum
+from typing import Callable, Hashable, List, Optional, Dict, Tuple
 
 from PIL import Image
 from pydantic import BaseModel
@@ -30,24 +32,198 @@ class ProviderOutput(BaseModel):
         return hash(tuple(self.line.polygon.bbox))
 
     def merge(self, other: "ProviderOutput"):
-        new_output = deepcopy(self)
-        other_copy = deepcopy(other)
+        # The merged output takes over the spans and chars, so the outputs being merged shouldn't be used afterwards
+        chars = None
+        if self.chars is not None and other.chars is not None:
+            chars = self.chars + other.chars
+        elif self.chars is not None or other.chars is not None:
+            chars = list(self.chars if self.chars is not None else other.chars)
 
-        new_output.spans.extend(other_copy.spans)
-        if new_output.chars is not None and other_copy.chars is not None:
-            new_output.chars.extend(other_copy.chars)
-        elif other_copy.chars is not None:
-            new_output.chars = other_copy.chars
-
-        new_output.line.polygon = new_output.line.polygon.merge(
-            [other_copy.line.polygon]
+        line = self.line.clone(polygon=self.line.polygon.merge([other.line.polygon]))
+        return ProviderOutput.model_construct(
+            line=line, spans=self.spans + other.spans, chars=chars
         )
-        return new_output
 
 
 ProviderPageLines = Dict[int, List[ProviderOutput]]
 
 
+class PagePlan(str, Enum):
+    """
+    How much work a page needs to get its text, decided by the provider before any models run.
+    """
+
+    text = "text"  # The text layer looks good, and only needs the usual layout checks
+    detection = "detection"  # The text layer needs to be checked with the OCR error and detection models
+    ocr = "ocr"  # There is no usable text layer, so the page will be OCRed
+
+
+class PageImageCache:
+    """
+    An LRU cache of rendered page images, keyed by page index and DPI.
+    Pages are only rendered by the provider the first time they are requested.
+
+    Images derived from a page image, like RGB conversions, masked copies and block crops, are cached
+    alongside it, and dropped when the page image is evicted.  `max_bytes` covers page images and their
+    derived images together, so the least recently used pages are evicted along with everything made from them.
+    """
+
+    max_derived_images: int = 256  # Per page image
+
+    def __init__(
+        self,
+        provider: "BaseProvider",
+        max_images: int | None = None,
+        max_bytes: int | None = None,
+    ):
+        self.provider = provider
+        self.max_images = max_images
+        self.max_bytes = max_bytes
+        self.images: OrderedDict[Tuple[int, int], Image.Image] = OrderedDict()
+        self.derived: Dict[Tuple[int, int], OrderedDict[Hashable, Image.Image]] = {}
+        self.page_bytes: Dict[Tuple[int, int], int] = {}  # Each page image plus its derived images
+        self.total_bytes = 0
+        # Rendering is not thread-safe (pdfium), and LLM processors access images from threads
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def image_bytes(image: Image.Image) -> int:
+        return image.width * image.height * len(image.getbands())
+
+    def add_bytes(self, key: Tuple[int, int], size: int):
+        self.page_bytes[key] = self.page_bytes.get(key, 0) + size
+        self.total_bytes += size
+
+    def drop_page(self, key: Tuple[int, int]):
+        self.images.pop(key, None)
+        self.derived.pop(key, None)
+        self.total_bytes -= self.page_bytes.pop(key, 0)
+
+    def evict_over_budget(self):
+        # The most recently used page is always kept
+        while len(self.images) > 1 and (
+            (self.max_images is not None and len(self.images) > self.max_images)
+            or (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+        ):
+            self.drop_page(next(iter(self.images)))
+
+    def get(self, idx: int, dpi: int) -> Image.Image:
+        key = (idx, dpi)
+        with self.lock:
+            if key in self.images:
+                self.images.move_to_end(key)
+                return self.images[key]
+
+            image = self.provider.get_images([idx], dpi)[0]
+            self.images[key] = image
+            self.add_bytes(key, self.image_bytes(image))
+            self.evict_over_budget()
+            return image
+
+    def peek(self, idx: int, dpi: int) -> Image.Image | None:
+        # The cached image, without rendering it
+        with self.lock:
+            return self.images.get((idx, dpi))
+
+    def prefetch(self, idxs: List[int], dpis: List[int]):
+        """
+        Render the given pages at each DPI in one provider call, so providers can render them in
+        parallel and load each page once.  Only as many images as the cache holds are rendered.
+        """
+        with self.lock:
+            missing = [
+                idx for idx in idxs if any((idx, dpi) not in self.images for dpi in dpis)
+            ]
+        if self.max_images is not None:
+            missing = missing[: self.max_images // len(dpis)]
+        if len(missing) == 0:
+            return
+
+        images = self.provider.get_images_for_dpis(missing, dpis)
+        with self.lock:
+            for dpi, dpi_images in images.items():
+                for idx, image in zip(missing, dpi_images):
+                    if (idx, dpi) not in self.images:
+                        self.images[(idx, dpi)] = image
+                        self.add_bytes((idx, dpi), self.image_bytes(image))
+            self.evict_over_budget()
+
+    def get_derived(
+        self,
+        idx: int,
+        dpi: int,
+        key: Hashable,
+        build: Callable[[Image.Image], Image.Image],
+    ) -> Image.Image:
+        page_key = (idx, dpi)
+        with self.lock:
+            derived = self.derived.get(page_key)
+            if derived is not None and key in derived:
+                derived.move_to_end(key)
+                self.images.move_to_end(page_key)
+                return derived[key]
+
+        # Built outside the lock, since building can request other page images
+        image = build(self.get(idx, dpi))
+        with self.lock:
+            if page_key in self.images:
+                derived = self.derived.setdefault(page_key, OrderedDict())
+                if key not in derived:
+                    self.add_bytes(page_key, self.image_bytes(image))
+                derived[key] = image
+                while len(derived) > self.max_derived_images:
+                    _, dropped = derived.popitem(last=False)
+                    self.add_bytes(page_key, -self.image_bytes(dropped))
+                self.images.move_to_end(page_key)
+                self.evict_over_budget()
+        return image
+
+    def evict(self, idx: int | None = None):
+        with self.lock:
+            if idx is None:
+                self.images.clear()
+                self.derived.clear()
+                self.page_bytes.clear()
+                self.total_bytes = 0
+                return
+
+            for key in [k for k in self.images if k[0] == idx]:
+                self.drop_page(key)
+
+    def __getstate__(self):
+        # Rendered images are not serialized, they are rendered again after loading
+        return {
+            "provider": self.provider,
+            "max_images": self.max_images,
+            "max_bytes": self.max_bytes,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(state["provider"], state["max_images"], state.get("max_bytes"))
+
+
+class LazyPageImage:
+    """
+    A handle to a page image that is rendered on first access.
+    """
+
+    def __init__(self, cache: PageImageCache, idx: int, dpi: int):
+        self.cache = cache
+        self.idx = idx
+        self.dpi = dpi
+
+    def get(self) -> Image.Image:
+        return self.cache.get(self.idx, self.dpi)
+
+    def get_derived(
+        self, key: Hashable, build: Callable[[Image.Image], Image.Image]
+    ) -> Image.Image:
+        return self.cache.get_derived(self.idx, self.dpi, key, build)
+
+    def __repr__(self):
+        return f"LazyPageImage(idx={self.idx}, dpi={self.dpi})"
+
+
 class BaseProvider:
     def __init__(self, filepath: str, config: Optional[BaseModel | dict] = None):
         assign_config(self, config)
@@ -59,6 +235,11 @@ class BaseProvider:
     def get_images(self, idxs: List[int], dpi: int) -> List[Image.Image]:
         pass
 
+    def get_images_for_dpis(
+        self, idxs: List[int], dpis: List[int]
+    ) -> Dict[int, List[Image.Image]]:
+        return {dpi: self.get_images(idxs, dpi) for dpi in dpis}
+
     def get_page_bbox(self, idx: int) -> PolygonBox | None:
         pass
 
@@ -68,6 +249,11 @@ class BaseProvider:
     def get_page_refs(self, idx: int) -> List[Reference]:
         pass
 
+    def get_page_plan(self, idx: int) -> PagePlan:
+        if self.get_page_lines(idx):
+            return PagePlan.detection
+        return PagePlan.ocr
+
     def __enter__(self):
         return self
 
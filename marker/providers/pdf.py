@@ -1,8 +1,12 @@
 import contextlib
 import ctypes
 import logging
-import re
-from typing import Annotated, Dict, List, Optional, Set
+import math
+import multiprocessing as mp
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Annotated, Dict, List, Optional, Set, Sequence, Tuple
 
 import pypdfium2 as pdfium
 import pypdfium2.raw as pdfium_c
@@ -14,8 +18,8 @@ from pdftext.pdf.utils import flatten as flatten_pdf_page
 from PIL import Image
 from pypdfium2 import PdfiumError, PdfDocument
 
-from marker.providers import BaseProvider, ProviderOutput, Char, ProviderPageLines
-from marker.providers.utils import alphanum_ratio
+from marker.providers import BaseProvider, PagePlan, ProviderOutput, Char, ProviderPageLines
+from marker.providers.utils import text_stats
 from marker.schema import BlockTypes
 from marker.schema.polygon import PolygonBox
 from marker.schema.registry import get_block_class
@@ -25,6 +29,21 @@ from marker.schema.text.span import Span
 # Ignore pypdfium2 warning about form flattening
 logging.getLogger("pypdfium2").setLevel(logging.ERROR)
 
+# pdfium is not thread-safe, even across separate documents, so all access in a process is serialized
+PDFIUM_LOCK = threading.RLock()
+
+# Characters that ftfy treats as line breaks, which would change how many lines a batch of spans has
+FIX_TEXT_LINE_BREAKS = ("\n", "\r", "\x85", "\u2028", "\u2029")
+SPACE_CHARS = str.maketrans(
+    {
+        "\u2003": " ",  # em space
+        "\u2002": " ",  # en space
+        "\u00a0": " ",  # non-breaking space
+        "\u200b": " ",  # zero-width space
+        "\u3000": " ",  # ideographic space
+    }
+)
+
 
 class PdfProvider(BaseProvider):
     """
@@ -80,11 +99,31 @@ class PdfProvider(BaseProvider):
         bool,
         "Whether to keep character-level information in the output.",
     ] = False
+    render_workers: Annotated[
+        int,
+        "The number of processes to render page images with.",
+    ] = 1
+    render_worker_page_threshold: Annotated[
+        int,
+        "The minimum number of pages to give each render process, since starting a process has a cost.",
+    ] = 4
+    downsample_images: Annotated[
+        bool,
+        "Render each page once at the highest DPI requested, and downsample it for lower DPIs.",
+        "This is faster, but the images differ slightly from rendering at each DPI.",
+    ] = False
+    text_layer_min_density: Annotated[
+        float,
+        "The minimum number of characters per 1000 square points for a page's text layer to be planned as good.",
+        "Sparser pages, and pages mostly covered by an image, have their text layer checked by the models.",
+    ] = 1.0
 
     def __init__(self, filepath: str, config=None):
         super().__init__(filepath, config)
 
         self.filepath = filepath
+        # Spans share a handful of fonts, so their formats are only worked out once per font
+        self.font_formats: Dict[Tuple[Optional[int], str | None], Set[str]] = {}
 
         with self.get_doc() as doc:
             self.page_count = len(doc)
@@ -92,6 +131,9 @@ class PdfProvider(BaseProvider):
             self.page_refs: Dict[int, List[Reference]] = {
                 i: [] for i in range(len(doc))
             }
+            # Object statistics from check_page, and the plan for each page with a good text layer
+            self.page_stats: Dict[int, Dict[str, float]] = {}
+            self.page_plans: Dict[int, PagePlan] = {}
 
             if self.page_range is None:
                 self.page_range = range(len(doc))
@@ -109,6 +151,7 @@ class PdfProvider(BaseProvider):
     @contextlib.contextmanager
     def get_doc(self):
         doc = None
+        PDFIUM_LOCK.acquire()
         try:
             doc = pdfium.PdfDocument(self.filepath)
 
@@ -120,6 +163,7 @@ class PdfProvider(BaseProvider):
         finally:
             if doc:
                 doc.close()
+            PDFIUM_LOCK.release()
 
     def __len__(self) -> int:
         return self.page_count
@@ -186,18 +230,46 @@ class PdfProvider(BaseProvider):
             formats.add("italic")
         return formats
 
+    def get_font_formats(self, flags: Optional[int], font_name: str | None) -> Set[str]:
+        key = (flags, font_name)
+        if key not in self.font_formats:
+            self.font_formats[key] = self.font_flags_to_format(flags).union(
+                self.font_names_to_format(font_name)
+            )
+        return self.font_formats[key]
+
     @staticmethod
     def normalize_spaces(text):
-        space_chars = [
-            "\u2003",  # em space
-            "\u2002",  # en space
-            "\u00a0",  # non-breaking space
-            "\u200b",  # zero-width space
-            "\u3000",  # ideographic space
-        ]
-        for space in space_chars:
-            text = text.replace(space, " ")
-        return text
+        return text.translate(SPACE_CHARS)
+
+    def fix_span_texts(self, texts: List[str]) -> List[str]:
+        """
+        Fix and normalize the text of all the spans on a page.  ftfy fixes text one line at a time,
+        so spans are fixed together with one span per line.  Plain ASCII spans are left as they are,
+        since ftfy would not change them.
+        """
+        fixed = list(texts)
+        batch_idxs = []
+        for i, text in enumerate(texts):
+            if text.isascii() and text.isprintable() and "&" not in text:
+                continue
+            if "<" in text or any(c in text for c in FIX_TEXT_LINE_BREAKS):
+                # "<" turns off HTML unescaping for the rest of the text, and line breaks would split the span
+                fixed[i] = self.normalize_spaces(fix_text(text))
+            else:
+                batch_idxs.append(i)
+
+        if batch_idxs:
+            batch = fix_text("\n".join(texts[i] for i in batch_idxs))
+            batch_texts = self.normalize_spaces(batch).split("\n")
+            if len(batch_texts) != len(batch_idxs):
+                # Should not happen, but fix each span on its own rather than misalign them
+                batch_texts = [
+                    self.normalize_spaces(fix_text(texts[i])) for i in batch_idxs
+                ]
+            for i, text in zip(batch_idxs, batch_texts):
+                fixed[i] = text
+        return fixed
 
     def pdftext_extraction(self, doc: PdfDocument) -> ProviderPageLines:
         page_lines: ProviderPageLines = {}
@@ -225,6 +297,17 @@ class PdfProvider(BaseProvider):
             if not self.check_page(page_id, doc):
                 continue
 
+            span_texts = iter(
+                self.fix_span_texts(
+                    [
+                        span["text"]
+                        for block in page["blocks"]
+                        for line in block["lines"]
+                        for span in line["spans"]
+                        if span["text"]
+                    ]
+                )
+            )
             for block in page["blocks"]:
                 for line in block["lines"]:
                     spans: List[Span] = []
@@ -232,9 +315,9 @@ class PdfProvider(BaseProvider):
                     for span in line["spans"]:
                         if not span["text"]:
                             continue
-                        font_formats = self.font_flags_to_format(
-                            span["font"]["flags"]
-                        ).union(self.font_names_to_format(span["font"]["name"]))
+                        font_formats = self.get_font_formats(
+                            span["font"]["flags"], span["font"]["name"]
+                        )
                         font_name = span["font"]["name"] or "Unknown"
                         font_weight = span["font"]["weight"] or 0
                         font_size = span["font"]["size"] or 0
@@ -243,7 +326,7 @@ class PdfProvider(BaseProvider):
                         )
                         superscript = span.get("superscript", False)
                         subscript = span.get("subscript", False)
-                        text = self.normalize_spaces(fix_text(span["text"]))
+                        text = next(span_texts)
                         if superscript or superscript:
                             text = text.strip()
 
@@ -296,6 +379,7 @@ class PdfProvider(BaseProvider):
                     )
             if self.check_line_spans(lines):
                 page_lines[page_id] = lines
+                self.page_plans[page_id] = self.plan_page(page_id, lines)
 
             self.page_refs[page_id] = []
             if page_refs := page.get("refs", None):
@@ -308,16 +392,26 @@ class PdfProvider(BaseProvider):
         if len(page_spans) == 0:
             return False
 
-        text = ""
-        for span in page_spans:
-            text = text + " " + span.text
-            text = text + "\n"
+        text = "".join(f" {span.text}\n" for span in page_spans)
         if len(text.strip()) == 0:
             return False
         if self.detect_bad_ocr(text):
             return False
         return True
 
+    def plan_page(self, page_id: int, lines: List[ProviderOutput]) -> PagePlan:
+        stats = self.page_stats.get(page_id)
+        if stats is None or stats["image_coverage"] >= self.image_threshold:
+            # Likely a scan with a text layer on top
+            return PagePlan.detection
+
+        x0, y0, x1, y1 = self.page_bboxes[page_id]
+        page_area = max((x1 - x0) * (y1 - y0), 1)
+        chars = sum(len(span.text) for line in lines for span in line.spans)
+        if chars * 1000 / page_area < self.text_layer_min_density:
+            return PagePlan.detection
+        return PagePlan.text
+
     def check_page(self, page_id: int, doc: PdfDocument) -> bool:
         page = doc.get_page(page_id)
         page_bbox = PolygonBox.from_bbox(page.get_bbox())
@@ -331,8 +425,24 @@ class PdfProvider(BaseProvider):
             # Happens when pdfium fails to get the number of page objects
             return False
 
+        text_objects = sum(obj.type == pdfium_c.FPDF_PAGEOBJ_TEXT for obj in page_objs)
+        image_coverage = 0
+        for img_obj in filter(
+            lambda obj: obj.type == pdfium_c.FPDF_PAGEOBJ_IMAGE, page_objs
+        ):
+            try:
+                img_bbox = PolygonBox.from_bbox(img_obj.get_pos())
+            except PdfiumError:
+                continue
+            image_coverage = max(image_coverage, page_bbox.intersection_pct(img_bbox))
+        self.page_stats[page_id] = {
+            "text_objects": text_objects,
+            "image_objects": len(page_objs) - text_objects,
+            "image_coverage": image_coverage,
+        }
+
         # if we do not see any text objects in the pdf, we can skip this page
-        if not any([obj.type == pdfium_c.FPDF_PAGEOBJ_TEXT for obj in page_objs]):
+        if text_objects == 0:
             return False
 
         if self.strip_existing_ocr:
@@ -367,12 +477,8 @@ class PdfProvider(BaseProvider):
                 return False
 
             # if we see very large images covering most of the page, we can skip this page
-            for img_obj in filter(
-                lambda obj: obj.type == pdfium_c.FPDF_PAGEOBJ_IMAGE, page_objs
-            ):
-                img_bbox = PolygonBox.from_bbox(img_obj.get_pos())
-                if page_bbox.intersection_pct(img_bbox) >= self.image_threshold:
-                    return False
+            if image_coverage >= self.image_threshold:
+                return False
 
         return True
 
@@ -381,21 +487,22 @@ class PdfProvider(BaseProvider):
             # Assume OCR failed if we have no text
             return True
 
-        spaces = len(re.findall(r"\s+", text))
-        alpha_chars = len(re.sub(r"\s+", "", text))
-        if spaces / (alpha_chars + spaces) > self.ocr_space_threshold:
+        stats = text_stats(text, self.ocr_invalid_chars)
+        spaces = stats.whitespace_runs
+        if spaces / (stats.non_whitespace + spaces) > self.ocr_space_threshold:
             return True
 
-        newlines = len(re.findall(r"\n+", text))
-        non_newlines = len(re.sub(r"\n+", "", text))
-        if newlines / (newlines + non_newlines) > self.ocr_newline_threshold:
+        newlines = stats.newline_runs
+        if newlines / (newlines + stats.non_newlines) > self.ocr_newline_threshold:
             return True
 
-        if alphanum_ratio(text) < self.ocr_alphanum_threshold:  # Garbled text
+        alphanum_ratio = 1
+        if stats.non_space_newline > 0:
+            alphanum_ratio = stats.alphanumeric / stats.non_space_newline
+        if alphanum_ratio < self.ocr_alphanum_threshold:  # Garbled text
             return True
 
-        invalid_chars = len([c for c in text if c in self.ocr_invalid_chars])
-        if invalid_chars > max(6.0, len(text) * 0.03):
+        if stats.invalid_chars > max(6.0, len(text) * 0.03):
             return True
 
         return False
@@ -404,20 +511,110 @@ class PdfProvider(BaseProvider):
     def _render_image(
         pdf: pdfium.PdfDocument, idx: int, dpi: int, flatten_page: bool
     ) -> Image.Image:
+        return PdfProvider._render_page_images(pdf, idx, [dpi], flatten_page)[dpi]
+
+    @staticmethod
+    def _render_page_images(
+        pdf: pdfium.PdfDocument,
+        idx: int,
+        dpis: Sequence[int],
+        flatten_page: bool,
+        downsample: bool = False,
+    ) -> Dict[int, Image.Image]:
+        # The page is only loaded and flattened once for all DPIs
         page = pdf[idx]
         if flatten_page:
             flatten_pdf_page(page)
             page = pdf[idx]
-        image = page.render(scale=dpi / 72, draw_annots=False).to_pil()
-        image = image.convert("RGB")
-        return image
+
+        images = {}
+        max_dpi = max(dpis)
+        for dpi in sorted(set(dpis), reverse=True):
+            if downsample and dpi != max_dpi:
+                # Match the size pdfium would render at this DPI
+                largest = images[max_dpi]
+                width, height = page.get_size()
+                size = (math.ceil(width * dpi / 72), math.ceil(height * dpi / 72))
+                if (largest.width > largest.height) != (size[0] > size[1]):
+                    size = size[::-1]
+                images[dpi] = largest.resize(size, Image.Resampling.BOX)
+                continue
+
+            image = page.render(scale=dpi / 72, draw_annots=False).to_pil()
+            images[dpi] = image.convert("RGB")
+        return images
 
     def get_images(self, idxs: List[int], dpi: int) -> List[Image.Image]:
-        with self.get_doc() as doc:
-            images = [
-                self._render_image(doc, idx, dpi, self.flatten_pdf) for idx in idxs
+        return self.get_images_for_dpis(idxs, [dpi])[dpi]
+
+    def get_images_for_dpis(
+        self, idxs: List[int], dpis: Sequence[int]
+    ) -> Dict[int, List[Image.Image]]:
+        workers = min(self.render_workers, len(idxs) // self.render_worker_page_threshold)
+        if mp.current_process().daemon:
+            # Daemonic processes, like convert_cli's pool workers, can't start render processes
+            workers = 1
+        if workers <= 1:
+            with self.get_doc() as doc:
+                page_images = [
+                    self._render_page_images(
+                        doc, idx, dpis, self.flatten_pdf, self.downsample_images
+                    )
+                    for idx in idxs
+                ]
+        else:
+            pages_per_worker = math.ceil(len(idxs) / workers)
+            idx_chunks = [
+                idxs[i : i + pages_per_worker]
+                for i in range(0, len(idxs), pages_per_worker)
             ]
-        return images
+            # Spawned rather than forked, since this process may have model threads, or another thread inside pdfium
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=mp.get_context("spawn"),
+                initializer=_render_worker_init,
+                initargs=(self.filepath, self.flatten_pdf),
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        _render_worker_pages,
+                        chunk,
+                        dpis,
+                        self.flatten_pdf,
+                        self.downsample_images,
+                    )
+                    for chunk in idx_chunks
+                ]
+                # Every chunk is drained before anything is read, so the blocks of the other chunks are
+                # still unlinked if one of them fails
+                chunks, error = [], None
+                for future in futures:
+                    try:
+                        chunks.append(future.result())
+                    except BaseException as e:
+                        error = error or e
+
+                unread = {
+                    shared[0]
+                    for chunk in chunks
+                    for page in chunk
+                    for shared in page.values()
+                }
+                try:
+                    if error is not None:
+                        raise error
+                    page_images = []
+                    for chunk in chunks:
+                        for page in chunk:
+                            page_images.append(
+                                {dpi: _read_shared_image(*shared) for dpi, shared in page.items()}
+                            )
+                            unread.difference_update(shared[0] for shared in page.values())
+                finally:
+                    for name in unread:
+                        _unlink_shared_image(name)
+
+        return {dpi: [images[dpi] for images in page_images] for dpi in dpis}
 
     def get_page_bbox(self, idx: int) -> PolygonBox | None:
         bbox = self.page_bboxes.get(idx)
@@ -430,6 +627,14 @@ class PdfProvider(BaseProvider):
     def get_page_refs(self, idx: int) -> List[Reference]:
         return self.page_refs[idx]
 
+    def get_page_plan(self, idx: int) -> PagePlan:
+        if idx in self.page_plans:
+            return self.page_plans[idx]
+        # Pages that were skipped, or whose lines were set without a plan
+        if self.page_lines.get(idx):
+            return PagePlan.detection
+        return PagePlan.ocr
+
     @staticmethod
     def _get_fontname(font) -> str:
         font_name = ""
@@ -450,3 +655,63 @@ class PdfProvider(BaseProvider):
             pass
 
         return font_name
+
+
+def _render_worker_init(filepath: str, flatten_pdf: bool):
+    global render_doc
+
+    render_doc = pdfium.PdfDocument(filepath)
+    if flatten_pdf:
+        render_doc.init_forms()
+
+
+def _render_worker_pages(
+    idxs: List[int], dpis: Sequence[int], flatten_pdf: bool, downsample: bool
+) -> List[Dict[int, Tuple[str, str, Tuple[int, int]]]]:
+    # Pixels are passed back through shared memory, since pickling them through a pipe costs more than rendering
+    pages = []
+    try:
+        for idx in idxs:
+            images = PdfProvider._render_page_images(
+                render_doc, idx, dpis, flatten_pdf, downsample
+            )
+            page = {}
+            pages.append(page)
+            for dpi, image in images.items():
+                page[dpi] = _write_shared_image(image)
+    except BaseException:
+        # Nothing is returned, so the parent never learns these names
+        for page in pages:
+            for name, _, _ in page.values():
+                _unlink_shared_image(name)
+        raise
+    return pages
+
+
+def _write_shared_image(image: Image.Image) -> Tuple[str, str, Tuple[int, int]]:
+    data = image.tobytes()
+    shm = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+    shm.buf[: len(data)] = data
+    shm.close()
+    # The parent process unlinks the block once it has read it.  Spawned workers share the parent's resource
+    # tracker, so blocks that are never unlinked are still cleaned up when the parent exits.
+    return shm.name, image.mode, image.size
+
+
+def _read_shared_image(name: str, mode: str, size: Tuple[int, int]) -> Image.Image:
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        image = Image.frombuffer(mode, size, shm.buf, "raw", mode, 0, 1).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+    return image
+
+
+def _unlink_shared_image(name: str):
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
@@ -1,3 +1,67 @@
+from typing import NamedTuple, Sequence
+
+import numpy as np
+
+# U+3000 (ideographic space) is the highest code point that str.isspace() and the \s regex match
+WHITESPACE_TABLE = np.array([chr(c).isspace() for c in range(0x3001)], dtype=bool)
+
+
+class TextStats(NamedTuple):
+    length: int
+    whitespace_runs: int  # Same as len(re.findall(r"\s+", text))
+    non_whitespace: int
+    newline_runs: int  # Same as len(re.findall(r"\n+", text))
+    non_newlines: int
+    alphanumeric: int  # Counted without spaces and newlines, like alphanum_ratio
+    non_space_newline: int
+    invalid_chars: int
+
+
+def count_runs(mask: np.ndarray) -> int:
+    if len(mask) == 0:
+        return 0
+    return int(mask[0]) + int(np.count_nonzero(mask[1:] & ~mask[:-1]))
+
+
+def text_stats(text: str, invalid_chars: Sequence[str] = ()) -> TextStats:
+    """
+    Character statistics for the bad text heuristics, computed in one pass over the code points.
+    """
+    codes = np.frombuffer(
+        text.encode("utf-32-le", errors="surrogatepass"), dtype=np.uint32
+    )
+
+    whitespace = np.zeros(len(codes), dtype=bool)
+    in_table = codes < len(WHITESPACE_TABLE)
+    whitespace[in_table] = WHITESPACE_TABLE[codes[in_table]]
+    newlines = codes == ord("\n")
+
+    # Per-character checks only run once for each distinct character
+    unique_codes, counts = np.unique(codes, return_counts=True)
+    invalid_codes = {ord(c) for c in invalid_chars if len(c) == 1}
+    alphanumeric = 0
+    invalid = 0
+    for code, count in zip(unique_codes.tolist(), counts.tolist()):
+        if chr(code).isalnum():
+            alphanumeric += count
+        if code in invalid_codes:
+            invalid += count
+
+    whitespace_count = int(np.count_nonzero(whitespace))
+    newline_count = int(np.count_nonzero(newlines))
+    space_count = int(np.count_nonzero(codes == ord(" ")))
+    return TextStats(
+        length=len(codes),
+        whitespace_runs=count_runs(whitespace),
+        non_whitespace=len(codes) - whitespace_count,
+        newline_runs=count_runs(newlines),
+        non_newlines=len(codes) - newline_count,
+        alphanumeric=alphanumeric,
+        non_space_newline=len(codes) - space_count - newline_count,
+        invalid_chars=invalid,
+    )
+
+
 def alphanum_ratio(text):
     text = text.replace(" ", "")
     text = text.replace("\n", "")
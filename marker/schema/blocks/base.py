@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from bisect import bisect_left
 from typing import TYPE_CHECKING, Dict, List, Literal, Optional, Sequence, Tuple
 
 from pydantic import BaseModel, ConfigDict, field_validator
@@ -13,10 +14,143 @@ if TYPE_CHECKING:
     from marker.schema.groups.page import PageGroup
 
 
+class StructureWatch:
+    """
+    Shared by the blocks and structures a cached traversal was built from.  Changing any of them marks the
+    watch stale, so a change only invalidates the traversals that include the changed block.
+    """
+    __slots__ = ("stale",)
+
+    def __init__(self):
+        self.stale = False
+
+
+def live_watches(watches: List[StructureWatch], watch: StructureWatch) -> List[StructureWatch]:
+    return [w for w in watches if not w.stale] + [watch]
+
+
+class StructureList(list):
+    """
+    A block structure that marks the traversals watching it stale when it is changed in place.
+    """
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.watches: List[StructureWatch] = []
+
+    def __reduce__(self):
+        # Watches belong to traversals in this process, so copies and pickles start without them
+        return StructureList, (list(self),)
+
+    def add_watch(self, watch: StructureWatch):
+        self.watches = live_watches(self.watches, watch)
+
+    def changed(self):
+        for watch in self.watches:
+            watch.stale = True
+
+    def append(self, item):
+        super().append(item)
+        self.changed()
+
+    def extend(self, items):
+        super().extend(items)
+        self.changed()
+
+    def insert(self, idx, item):
+        super().insert(idx, item)
+        self.changed()
+
+    def remove(self, item):
+        super().remove(item)
+        self.changed()
+
+    def pop(self, *args):
+        item = super().pop(*args)
+        self.changed()
+        return item
+
+    def clear(self):
+        super().clear()
+        self.changed()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self.changed()
+
+    def reverse(self):
+        super().reverse()
+        self.changed()
+
+    def __setitem__(self, idx, item):
+        super().__setitem__(idx, item)
+        self.changed()
+
+    def __delitem__(self, idx):
+        super().__delitem__(idx)
+        self.changed()
+
+    def __iadd__(self, items):
+        result = super().__iadd__(items)
+        self.changed()
+        return result
+
+
+class ContainedBlockIndex:
+    """
+    The non-removed blocks under a page in traversal order, with the span of each block's descendants
+    and the positions of each block type, so contained_blocks is a lookup instead of a tree walk.
+    """
+
+    def __init__(self, page: Block, document: Document):
+        self.watch = StructureWatch()
+        self.document_id = id(document)
+        self.blocks: List[Block] = []
+        self.ranges: Dict[int, Tuple[int, int]] = {}  # Keyed by object id, which is cheaper to hash than BlockId
+        self.type_positions: Dict[BlockTypes, List[int]] = {}
+
+        page.add_structure_watch(self.watch)
+        self.add_children(page, document)
+        for position, block in enumerate(self.blocks):
+            self.type_positions.setdefault(block.block_type, []).append(position)
+
+    def add_children(self, block: Block, document: Document):
+        for block_id in block.structure or []:
+            child = document.get_block(block_id)
+            # Removed blocks are watched too, in case they are restored
+            child.add_structure_watch(self.watch)
+            if child.removed:
+                continue
+            self.blocks.append(child)
+            start = len(self.blocks)
+            self.add_children(child, document)
+            self.ranges.setdefault(id(child), (start, len(self.blocks)))
+
+    def is_valid(self, document: Document) -> bool:
+        return not self.watch.stale and self.document_id == id(document)
+
+    def get_blocks(self, start: int, end: int, block_types: Sequence[BlockTypes] | None) -> List[Block]:
+        if block_types is None:
+            return self.blocks[start:end]
+
+        positions = []
+        for block_type in set(block_types):
+            type_positions = self.type_positions.get(block_type, [])
+            lo = bisect_left(type_positions, start)
+            hi = bisect_left(type_positions, end, lo)
+            positions.extend(type_positions[lo:hi])
+
+        if len(block_types) > 1:
+            positions.sort()
+        return [self.blocks[p] for p in positions]
+
+
 class BlockMetadata(BaseModel):
     llm_request_count: int = 0
     llm_error_count: int = 0
     llm_tokens_used: int = 0
+    llm_cache_hits: int = 0
+    llm_cache_misses: int = 0
 
     def merge(self, model2):
         return self.__class__(**{
@@ -89,6 +223,29 @@ class Block(BaseModel):
 
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
+    @field_validator("structure")
+    @classmethod
+    def track_structure(cls, v):
+        if v is None or isinstance(v, StructureList):
+            return v
+        return StructureList(v)
+
+    def __setattr__(self, name, value):
+        if name == "structure" and value is not None and not isinstance(value, StructureList):
+            value = StructureList(value)
+        super().__setattr__(name, value)
+        if name in ("structure", "removed"):
+            for watch in self.__dict__.get("_structure_watches", []):
+                watch.stale = True
+
+    def __getstate__(self):
+        # Cached traversals are only valid within this process
+        state = super().__getstate__()
+        state["__dict__"] = {
+            k: v for k, v in state["__dict__"].items() if k not in ("_contained_index", "_structure_watches")
+        }
+        return state
+
     @property
     def id(self) -> BlockId:
         return BlockId(
@@ -97,23 +254,59 @@ class Block(BaseModel):
             block_type=self.block_type
         )
 
+    def clone(self, **updates) -> Block:
+        """
+        A shallow copy of the block, which is much cheaper than a deepcopy.  Lists, dicts and metadata are copied,
+        while objects that are replaced rather than changed in place, like the polygon, are shared.
+        """
+        block = self.model_copy()
+        for key in ("_structure_index", "_contained_index", "_structure_watches"):
+            block.__dict__.pop(key, None)
+        for key, value in block.__dict__.items():
+            if isinstance(value, StructureList):
+                # A clone is not in the document yet, so its structure starts unwatched
+                block.__dict__[key] = StructureList(value)
+            elif isinstance(value, (list, dict)):
+                block.__dict__[key] = value.copy()
+        if block.metadata is not None:
+            block.metadata = block.metadata.model_copy()
+        for key, value in updates.items():
+            setattr(block, key, value)
+        return block
+
     @classmethod
     def from_block(cls, block: Block) -> Block:
         block_attrs = block.model_dump(exclude=["id", "block_id", "block_type"])
         return cls(**block_attrs)
 
     def get_image(self, document: Document, highres: bool = False, expansion: Tuple[float, float] | None = None, remove_blocks: Sequence[BlockTypes] | None = None) -> Image.Image | None:
+        from marker.providers import LazyPageImage
+
         image = self.highres_image if highres else self.lowres_image
         if image is None:
             page = document.get_page(self.page_id)
-            page_image = page.get_image(highres=highres, remove_blocks=remove_blocks)
-
-            # Scale to the image size
-            bbox = self.polygon.rescale((page.polygon.width, page.polygon.height), page_image.size)
-            if expansion:
-                bbox = bbox.expand(*expansion)
-            bbox = bbox.bbox
-            image = page_image.crop(bbox)
+
+            def crop(_) -> Image.Image:
+                page_image = page.get_image(highres=highres, remove_blocks=remove_blocks)
+
+                # Scale to the image size
+                bbox = self.polygon.rescale((page.polygon.width, page.polygon.height), page_image.size)
+                if expansion:
+                    bbox = bbox.expand(*expansion)
+                return page_image.crop(bbox.bbox)
+
+            lazy_page_image = page.highres_image if highres else page.lowres_image
+            if not isinstance(lazy_page_image, LazyPageImage):
+                return crop(None)
+
+            # Crops are cached with the page image, keyed by the region and the masking of the page
+            crop_key = (
+                "crop",
+                page.image_cache_key(page.get_masked_blocks(remove_blocks)),
+                tuple(tuple(p) for p in self.polygon.polygon),
+                tuple(expansion) if expansion else None,
+            )
+            image = lazy_page_image.get_derived(crop_key, crop)
         return image
 
 
@@ -126,7 +319,7 @@ class Block(BaseModel):
         if ignored_block_types is None:
             ignored_block_types = []
 
-        structure_idx = self.structure.index(block.id)
+        structure_idx = self.structure_position(block.id)
         if structure_idx == 0:
             return None
 
@@ -140,7 +333,7 @@ class Block(BaseModel):
 
         structure_idx = 0
         if block is not None:
-            structure_idx = self.structure.index(block.id) + 1
+            structure_idx = self.structure_position(block.id) + 1
 
         for next_block_id in self.structure[structure_idx:]:
             if next_block_id.block_type not in ignored_block_types:
@@ -148,21 +341,70 @@ class Block(BaseModel):
 
         return None  # No valid next block found
 
+    def structure_index(self) -> Dict[BlockId, int] | None:
+        # Maps each block id to its first position in the structure.  It is kept in __dict__ rather than as a
+        # field or private attribute so it is not part of equality or serialization.
+        indexed_structure, positions = self.__dict__.get("_structure_index", (None, None))
+        if indexed_structure is not self.structure:
+            return None
+        return positions
+
+    def structure_position(self, block_id: BlockId) -> int:
+        """
+        Find the position of a block id in the structure.  Raises a ValueError if it is missing, like `list.index`.
+        The structure is also changed directly in places, so the index is checked and rebuilt if it is stale.
+        """
+        positions = self.structure_index()
+        if positions is not None:
+            idx = positions.get(block_id)
+            if idx is not None and idx < len(self.structure) and self.structure[idx] == block_id:
+                return idx
+
+        positions = {}
+        for i, item in enumerate(self.structure or []):
+            positions.setdefault(item, i)
+        self.__dict__["_structure_index"] = (self.structure, positions)
+
+        if block_id not in positions:
+            raise ValueError(f"{block_id} is not in the structure of {self.id}")
+        return positions[block_id]
+
     def add_structure(self, block: Block):
         if self.structure is None:
             self.structure = [block.id]
         else:
             self.structure.append(block.id)
+            positions = self.structure_index()
+            if positions is not None:
+                positions.setdefault(block.id, len(self.structure) - 1)
 
     def update_structure_item(self, old_id: BlockId, new_id: BlockId):
-        if self.structure is not None:
+        if self.structure is None:
+            return
+
+        positions = self.structure_index()
+        if positions is None:
+            # Not worth building an index for a single replacement
             for i, item in enumerate(self.structure):
                 if item == old_id:
                     self.structure[i] = new_id
                     break
+            return
+
+        try:
+            i = self.structure_position(old_id)
+        except ValueError:
+            return
+        self.structure[i] = new_id
+
+        positions = self.structure_index()
+        positions.pop(old_id, None)
+        if positions.get(new_id, i) >= i:
+            positions[new_id] = i
 
     def remove_structure_items(self, block_ids: List[BlockId]):
         if self.structure is not None:
+            block_ids = set(block_ids)
             self.structure = [item for item in self.structure if item not in block_ids]
 
     def raw_text(self, document: Document) -> str:
@@ -208,10 +450,41 @@ class Block(BaseModel):
 
         return section_hierarchy
 
+    def add_structure_watch(self, watch: StructureWatch):
+        self.__dict__["_structure_watches"] = live_watches(self.__dict__.get("_structure_watches", []), watch)
+        if self.structure is not None:
+            self.structure.add_watch(watch)
+
+    def contained_block_index(self, document: Document) -> ContainedBlockIndex:
+        index = self.__dict__.get("_contained_index")
+        if index is None or not index.is_valid(document):
+            index = ContainedBlockIndex(self, document)
+            self.__dict__["_contained_index"] = index
+        return index
+
     def contained_blocks(self, document: Document, block_types: Sequence[BlockTypes] = None) -> List[Block]:
         if self.structure is None:
             return []
 
+        page = document.get_page(self.page_id)
+        if page is self:
+            index = page.contained_block_index(document)
+            return index.get_blocks(0, len(index.blocks), block_types)
+
+        # Blocks use their page's index if it is still valid, but never rebuild it, since a page-wide
+        # rebuild between structure changes would cost more than walking this block's own children
+        index = page.__dict__.get("_contained_index") if page is not None else None
+        if index is not None and index.is_valid(document):
+            block_range = index.ranges.get(id(self))
+            if block_range is not None and index.blocks[block_range[0] - 1] is self:
+                return index.get_blocks(*block_range, block_types)
+
+        return self.walk_contained_blocks(document, block_types)
+
+    def walk_contained_blocks(self, document: Document, block_types: Sequence[BlockTypes] = None) -> List[Block]:
+        if self.structure is None:
+            return []
+
         blocks = []
         for block_id in self.structure:
             block = document.get_block(block_id)
@@ -219,15 +492,11 @@ class Block(BaseModel):
                 continue
             if (block_types is None or block.block_type in block_types) and not block.removed:
                 blocks.append(block)
-            blocks += block.contained_blocks(document, block_types)
+            blocks += block.walk_contained_blocks(document, block_types)
         return blocks
 
     def replace_block(self, block: Block, new_block: Block):
-        if self.structure is not None:
-            for i, item in enumerate(self.structure):
-                if item == block.id:
-                    self.structure[i] = new_block.id
-                    break
+        self.update_structure_item(block.id, new_block.id)
 
     def render(self, document: Document, parent_structure: Optional[List[str]] = None, section_hierarchy: dict | None = None):
         child_content = []
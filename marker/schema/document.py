@@ -36,11 +36,32 @@ class Document(BaseModel):
             return block
         return None
 
+    def page_position(self, page_id) -> int | None:
+        # Maps page ids to positions in pages.  Kept in __dict__ so it is not part of equality or serialization,
+        # and rebuilt whenever pages is reassigned or reordered.
+        indexed_pages, positions = self.__dict__.get("_page_index", (None, None))
+        if indexed_pages is self.pages:
+            idx = positions.get(page_id)
+            if idx is not None and idx < len(self.pages) and self.pages[idx].page_id == page_id:
+                return idx
+
+        positions = {}
+        for i, page in enumerate(self.pages):
+            positions.setdefault(page.page_id, i)
+        self.__dict__["_page_index"] = (self.pages, positions)
+        return positions.get(page_id)
+
     def get_page(self, page_id):
-        for page in self.pages:
-            if page.page_id == page_id:
-                return page
-        return None
+        page_idx = self.page_position(page_id)
+        if page_idx is None:
+            return None
+        return self.pages[page_idx]
+
+    def page_index(self, page: PageGroup) -> int:
+        page_idx = self.page_position(page.page_id)
+        if page_idx is not None and self.pages[page_idx] is page:
+            return page_idx
+        return self.pages.index(page)
 
     def get_next_block(self, block: Block, ignored_block_types: List[BlockTypes] = None):
         if ignored_block_types is None:
@@ -54,14 +75,14 @@ class Document(BaseModel):
             return next_block
 
         # If no block found, search subsequent pages
-        for page in self.pages[self.pages.index(page) + 1:]:
+        for page in self.pages[self.page_index(page) + 1:]:
             next_block = page.get_next_block(None, ignored_block_types)
             if next_block:
                 return next_block
         return None
 
     def get_next_page(self, page: PageGroup):
-        page_idx = self.pages.index(page)
+        page_idx = self.page_index(page)
         if page_idx + 1 < len(self.pages):
             return self.pages[page_idx + 1]
         return None
@@ -77,7 +98,7 @@ class Document(BaseModel):
         return prev_page.get_block(prev_page.structure[-1])
     
     def get_prev_page(self, page: PageGroup):
-        page_idx = self.pages.index(page)
+        page_idx = self.page_index(page)
         if page_idx > 0:
             return self.pages[page_idx - 1]
         return None
@@ -6,22 +6,22 @@ from PIL import Image, ImageDraw
 from pdftext.schema import Reference
 from pydantic import computed_field
 
-from marker.providers import ProviderOutput
+from marker.providers import LazyPageImage, ProviderOutput
 from marker.schema import BlockTypes
 from marker.schema.blocks import Block, BlockId, Text
 from marker.schema.blocks.base import BlockMetadata
 from marker.schema.groups.base import Group
 from marker.schema.polygon import PolygonBox
-from marker.util import matrix_intersection_area, sort_text_lines
+from marker.util import SpatialIndex, sort_text_lines
 
 LINE_MAPPING_TYPE = List[Tuple[int, ProviderOutput]]
 
 
 class PageGroup(Group):
     block_type: BlockTypes = BlockTypes.Page
-    # This is bytes if it is serialized
-    lowres_image: Image.Image | None | bytes = None
-    highres_image: Image.Image | None | bytes = None
+    # This is bytes if it is serialized, and a LazyPageImage until it is rendered
+    lowres_image: Image.Image | LazyPageImage | None | bytes = None
+    highres_image: Image.Image | LazyPageImage | None | bytes = None
     children: List[Union[Any, Block]] | None = None
     layout_sliced: bool = (
         False  # Whether the layout model had to slice the image (order may be wrong)
@@ -55,21 +55,42 @@ class PageGroup(Group):
         **kwargs,
     ):
         image = self.highres_image if highres else self.lowres_image
+        masked_blocks = self.get_masked_blocks(remove_blocks)
+        if isinstance(image, LazyPageImage):
+            # Images are shared between callers, so they should never be modified in place
+            return image.get_derived(
+                self.image_cache_key(masked_blocks),
+                lambda page_image: self.prepare_image(page_image, masked_blocks),
+            )
+        return self.prepare_image(image, masked_blocks)
+
+    def get_masked_blocks(
+        self, remove_blocks: Sequence[BlockTypes] | None = None
+    ) -> List[Block]:
+        if not remove_blocks:
+            return []
+        return [
+            block for block in self.current_children if block.block_type in remove_blocks
+        ]
+
+    @staticmethod
+    def image_cache_key(masked_blocks: List[Block]) -> Tuple:
+        # Masked images are keyed by what is masked, so they are rebuilt when blocks move or are removed
+        return "page", tuple(
+            (str(block.id), tuple(tuple(p) for p in block.polygon.polygon))
+            for block in masked_blocks
+        )
 
+    def prepare_image(self, image: Image.Image, masked_blocks: List[Block]):
         # Check if RGB, convert if needed
         if isinstance(image, Image.Image) and image.mode != "RGB":
             image = image.convert("RGB")
 
         # Avoid double OCR for certain elements
-        if remove_blocks:
+        if masked_blocks:
             image = image.copy()
             draw = ImageDraw.Draw(image)
-            bad_blocks = [
-                block
-                for block in self.current_children
-                if block.block_type in remove_blocks
-            ]
-            for bad_block in bad_blocks:
+            for bad_block in masked_blocks:
                 poly = bad_block.polygon.rescale(self.polygon.size, image.size).polygon
                 poly = [(int(p[0]), int(p[1])) for p in poly]
                 draw.polygon(poly, fill="white")
@@ -91,7 +112,7 @@ class PageGroup(Group):
 
         structure_idx = 0
         if block is not None:
-            structure_idx = self.structure.index(block.id) + 1
+            structure_idx = self.structure_position(block.id) + 1
 
         # Iterate over blocks following the given block
         for next_block_id in self.structure[structure_idx:]:
@@ -101,7 +122,7 @@ class PageGroup(Group):
         return None  # No valid next block found
 
     def get_prev_block(self, block: Block):
-        block_idx = self.structure.index(block.id)
+        block_idx = self.structure_position(block.id)
         if block_idx > 0:
             return self.get_block(self.structure[block_idx - 1])
         return None
@@ -138,21 +159,17 @@ class PageGroup(Group):
     ):
         max_intersections = {}
 
-        block_bboxes = [block.polygon.bbox for block in blocks]
-        line_bboxes = [
-            provider_output.line.polygon.bbox for provider_output in provider_outputs
-        ]
-
-        intersection_matrix = matrix_intersection_area(line_bboxes, block_bboxes)
+        block_index = SpatialIndex([block.polygon.bbox for block in blocks])
 
-        for line_idx, line in enumerate(provider_outputs):
-            intersection_line = intersection_matrix[line_idx]
-            if intersection_line.sum() == 0:
+        for line_idx, provider_output in enumerate(provider_outputs):
+            max_intersection, intersection_area = block_index.max_intersection(
+                provider_output.line.polygon.bbox
+            )
+            if max_intersection is None:
                 continue
 
-            max_intersection = intersection_line.argmax()
             max_intersections[line_idx] = (
-                intersection_matrix[line_idx, max_intersection],
+                intersection_area,
                 blocks[max_intersection].id,
             )
         return max_intersections
@@ -236,7 +253,7 @@ class PageGroup(Group):
                     min_dist_idx = existing_block.id
 
             if min_dist_idx is not None:
-                existing_idx = self.structure.index(min_dist_idx)
+                existing_idx = self.structure_position(min_dist_idx)
                 self.structure.insert(existing_idx + 1, block.id)
             else:
                 self.structure.append(block.id)
@@ -1,5 +1,4 @@
 from __future__ import annotations
-import copy
 from typing import List
 
 import numpy as np
@@ -19,15 +18,14 @@ class PolygonBox(BaseModel):
             if len(corner) != 2:
                 raise ValueError('corner must have 2 elements')
 
-        min_x = min([corner[0] for corner in v])
-        min_y = min([corner[1] for corner in v])
+        min_x = min(v[0][0], v[1][0], v[2][0], v[3][0])
+        min_y = min(v[0][1], v[1][1], v[2][1], v[3][1])
 
-        # Ensure corners are clockwise from top left
-        corner_error = f" .Corners are {v}"
-        assert v[2][1] >= min_y, f'bottom right corner should have a greater y value than top right corner' + corner_error
-        assert v[3][1] >= min_y, 'bottom left corner should have a greater y value than top left corner' + corner_error
-        assert v[1][0] >= min_x, 'top right corner should have a greater x value than top left corner' + corner_error
-        assert v[2][0] >= min_x, 'bottom right corner should have a greater x value than bottom left corner' + corner_error
+        # Ensure corners are clockwise from top left.  Messages are only formatted when a check fails.
+        assert v[2][1] >= min_y, f'bottom right corner should have a greater y value than top right corner .Corners are {v}'
+        assert v[3][1] >= min_y, f'bottom left corner should have a greater y value than top left corner .Corners are {v}'
+        assert v[1][0] >= min_x, f'top right corner should have a greater x value than top left corner .Corners are {v}'
+        assert v[2][0] >= min_x, f'bottom right corner should have a greater x value than bottom left corner .Corners are {v}'
         return v
 
     @property
@@ -69,11 +67,8 @@ class PolygonBox(BaseModel):
     @computed_field
     @property
     def bbox(self) -> List[float]:
-        min_x = min([corner[0] for corner in self.polygon])
-        min_y = min([corner[1] for corner in self.polygon])
-        max_x = max([corner[0] for corner in self.polygon])
-        max_y = max([corner[1] for corner in self.polygon])
-        return [min_x, min_y, max_x, max_y]
+        (x0, y0), (x1, y1), (x2, y2), (x3, y3) = self.polygon
+        return [min(x0, x1, x2, x3), min(y0, y1, y2, y3), max(x0, x1, x2, x3), max(y0, y1, y2, y3)]
 
     def expand(self, x_margin: float, y_margin: float) -> PolygonBox:
         new_polygon = []
@@ -88,7 +83,7 @@ class PolygonBox(BaseModel):
                 new_polygon.append([poly[0] + x_margin, poly[1] + y_margin])
             elif idx == 3:
                 new_polygon.append([poly[0] - x_margin, poly[1] + y_margin])
-        return PolygonBox(polygon=new_polygon)
+        return PolygonBox.from_valid_polygon(new_polygon)
 
     def expand_y2(self, y_margin: float) -> PolygonBox:
         new_polygon = []
@@ -100,7 +95,7 @@ class PolygonBox(BaseModel):
                 new_polygon.append([poly[0], poly[1] + y_margin])
             else:
                 new_polygon.append(poly)
-        return PolygonBox(polygon=new_polygon)
+        return PolygonBox.from_valid_polygon(new_polygon)
 
     def expand_y1(self, y_margin: float) -> PolygonBox:
         new_polygon = []
@@ -112,7 +107,7 @@ class PolygonBox(BaseModel):
                 new_polygon.append([poly[0], poly[1] - y_margin])
             else:
                 new_polygon.append(poly)
-        return PolygonBox(polygon=new_polygon)
+        return PolygonBox.from_valid_polygon(new_polygon)
 
     def minimum_gap(self, other: PolygonBox):
         if self.intersection_pct(other) > 0:
@@ -161,18 +156,18 @@ class PolygonBox(BaseModel):
         width_scaler = img_width / page_width
         height_scaler = img_height / page_height
 
-        new_corners = copy.deepcopy(self.polygon)
-        for corner in new_corners:
-            corner[0] = corner[0] * width_scaler
-            corner[1] = corner[1] * height_scaler
-        return PolygonBox(polygon=new_corners)
+        # Scaling and clamping keep the corner order, so the new boxes skip validation
+        return PolygonBox.from_valid_polygon(
+            [[float(x * width_scaler), float(y * height_scaler)] for x, y in self.polygon]
+        )
 
     def fit_to_bounds(self, bounds):
-        new_corners = copy.deepcopy(self.polygon)
-        for corner in new_corners:
-            corner[0] = max(min(corner[0], bounds[2]), bounds[0])
-            corner[1] = max(min(corner[1], bounds[3]), bounds[1])
-        return PolygonBox(polygon=new_corners)
+        return PolygonBox.from_valid_polygon(
+            [
+                [float(max(min(x, bounds[2]), bounds[0])), float(max(min(y, bounds[3]), bounds[1]))]
+                for x, y in self.polygon
+            ]
+        )
 
     def overlap_x(self, other: PolygonBox):
         return max(0, min(self.bbox[2], other.bbox[2]) - max(self.bbox[0], other.bbox[0]))
@@ -208,12 +203,25 @@ class PolygonBox(BaseModel):
                 corners.append([max_x, max_y])
             elif i == 3:
                 corners.append([min_x, max_y])
-        return PolygonBox(polygon=corners)
+        return PolygonBox.from_valid_polygon(corners)
+
+    @classmethod
+    def from_valid_polygon(cls, polygon: List[List[float]]) -> PolygonBox:
+        """
+        Build a box from four float corners without running validation.  Only for polygons built internally,
+        where validation is the main cost of creating the many boxes for spans, chars and lines.
+        """
+        box = cls.__new__(cls)
+        object.__setattr__(box, "__dict__", {"polygon": polygon})
+        object.__setattr__(box, "__pydantic_fields_set__", {"polygon"})
+        object.__setattr__(box, "__pydantic_extra__", None)
+        object.__setattr__(box, "__pydantic_private__", None)
+        return box
 
     @classmethod
     def from_bbox(cls, bbox: List[float], ensure_nonzero_area=False):
+        x0, y0, x1, y1 = float(bbox[0]), float(bbox[1]), float(bbox[2]), float(bbox[3])
         if ensure_nonzero_area:
-            bbox = list(bbox)
-            bbox[2] = max(bbox[2], bbox[0] + 1)
-            bbox[3] = max(bbox[3], bbox[1] + 1)
-        return cls(polygon=[[bbox[0], bbox[1]], [bbox[2], bbox[1]], [bbox[2], bbox[3]], [bbox[0], bbox[3]]])
+            x1 = max(x1, x0 + 1)
+            y1 = max(y1, y0 + 1)
+        return cls.from_valid_polygon([[x0, y0], [x1, y0], [x1, y1], [x0, y1]])
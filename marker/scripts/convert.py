@@ -10,6 +10,7 @@ os.environ["IN_STREAMLIT"] = "true"  # Avoid multiprocessing inside surya
 
 import math
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 import click
 import torch.multiprocessing as mp
@@ -19,7 +20,7 @@ import gc
 from marker.config.parser import ConfigParser
 from marker.config.printer import CustomClickPrinter
 from marker.logger import configure_logging, get_logger
-from marker.models import create_model_dict
+from marker.models import create_batched_model_dict, create_model_dict, create_shared_model_dict
 from marker.output import output_exists, save_output
 from marker.settings import settings
 
@@ -27,9 +28,13 @@ configure_logging()
 logger = get_logger()
 
 
-def worker_init(model_dict):
+def worker_init(model_dict, documents_per_worker=1, required_models=None):
     if model_dict is None:
-        model_dict = create_model_dict()
+        model_dict = create_model_dict(models=required_models)
+
+    if documents_per_worker > 1:
+        # Documents converting in parallel threads share model batches
+        model_dict = create_batched_model_dict(model_dict)
 
     global model_refs
     model_refs = model_dict
@@ -59,6 +64,7 @@ def process_single_pdf(args):
     config_dict = config_parser.generate_config_dict()
     config_dict["disable_tqdm"] = True
 
+    converter = None
     try:
         if cli_options.get("debug_print"):
             logger.debug(f"Converting {fpath}")
@@ -75,14 +81,24 @@ def process_single_pdf(args):
         if cli_options.get("debug_print"):
             logger.debug(f"Converted {fpath}")
         del rendered
-        del converter
     except Exception as e:
         logger.error(f"Error converting {fpath}: {e}")
         traceback.print_exc()
     finally:
+        # Each document gets its own llm service, so stop its request threads
+        if converter is not None:
+            converter.close()
+        del converter
         gc.collect()
 
 
+def process_pdf_group(args):
+    fpaths, cli_options = args
+    with ThreadPoolExecutor(max_workers=len(fpaths)) as executor:
+        list(executor.map(process_single_pdf, [(f, cli_options) for f in fpaths]))
+    return len(fpaths)
+
+
 @click.command(cls=CustomClickPrinter)
 @click.argument("in_folder", type=str)
 @click.option("--chunk_idx", type=int, default=0, help="Chunk index to convert")
@@ -113,6 +129,12 @@ def process_single_pdf(args):
     default=10,
     help="Maximum number of tasks per worker process.",
 )
+@click.option(
+    "--documents_per_worker",
+    type=int,
+    default=1,
+    help="Number of documents each worker converts at once. Model calls are batched across these documents.",
+)
 @ConfigParser.common_options
 def convert_cli(in_folder: str, **kwargs):
     in_folder = os.path.abspath(in_folder)
@@ -133,7 +155,13 @@ def convert_cli(in_folder: str, **kwargs):
     # Disable nested multiprocessing
     kwargs["disable_multiprocessing"] = True
 
-    total_processes = min(len(files_to_convert), kwargs["workers"])
+    # Each task is a group of documents that a worker converts at once
+    documents_per_worker = max(1, kwargs["documents_per_worker"])
+    task_args = [
+        (files_to_convert[i : i + documents_per_worker], kwargs)
+        for i in range(0, len(files_to_convert), documents_per_worker)
+    ]
+    total_processes = min(len(task_args), kwargs["workers"])
 
     try:
         mp.set_start_method("spawn")  # Required for CUDA, forkserver doesn't work
@@ -142,27 +170,25 @@ def convert_cli(in_folder: str, **kwargs):
             "Set start method to spawn twice. This may be a temporary issue with the script. Please try running it again."
         )
 
+    required_models = ConfigParser(kwargs).get_converter_cls().required_models
     if settings.TORCH_DEVICE == "mps" or settings.TORCH_DEVICE_MODEL == "mps":
         model_dict = None
     else:
-        model_dict = create_model_dict()
-        for k, v in model_dict.items():
-            v.model.share_memory()
+        model_dict = create_shared_model_dict(models=required_models)
 
     logger.info(
         f"Converting {len(files_to_convert)} pdfs in chunk {kwargs['chunk_idx'] + 1}/{kwargs['num_chunks']} with {total_processes} processes and saving to {kwargs['output_dir']}"
     )
-    task_args = [(f, kwargs) for f in files_to_convert]
 
     with mp.Pool(
         processes=total_processes,
         initializer=worker_init,
-        initargs=(model_dict,),
+        initargs=(model_dict, documents_per_worker, required_models),
         maxtasksperchild=kwargs["max_tasks_per_worker"],
     ) as pool:
-        pbar = tqdm(total=len(task_args), desc="Processing PDFs", unit="pdf")
-        for _ in pool.imap_unordered(process_single_pdf, task_args):
-            pbar.update(1)
+        pbar = tqdm(total=len(files_to_convert), desc="Processing PDFs", unit="pdf")
+        for converted in pool.imap_unordered(process_pdf_group, task_args):
+            pbar.update(converted)
         pbar.close()
 
     # Delete all CUDA tensors
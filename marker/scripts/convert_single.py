@@ -23,11 +23,11 @@ logger = get_logger()
 @click.argument("fpath", type=str)
 @ConfigParser.common_options
 def convert_single_cli(fpath: str, **kwargs):
-    models = create_model_dict()
-    start = time.time()
     config_parser = ConfigParser(kwargs)
-
     converter_cls = config_parser.get_converter_cls()
+    models = create_model_dict(models=converter_cls.required_models)
+    start = time.time()
+
     converter = converter_cls(
         config=config_parser.generate_config_dict(),
         artifact_dict=models,
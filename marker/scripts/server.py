@@ -1,4 +1,11 @@
+import asyncio
+import json
+import threading
+import time
 import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import click
 import os
@@ -11,27 +18,229 @@ from marker.output import text_from_rendered
 
 import base64
 from contextlib import asynccontextmanager
-from typing import Optional, Annotated
+from typing import Any, Dict, List, Optional, Annotated
 import io
 
-from fastapi import FastAPI, Form, File, UploadFile
+from fastapi import FastAPI, Form, File, HTTPException, UploadFile
 from marker.converters.pdf import PdfConverter
-from marker.models import create_model_dict
+from marker.models import LazyModel, create_batched_model_dict, create_model_dict
 from marker.settings import settings
 
 app_data = {}
+# Set from the command line before the server starts
+server_config = {
+    "workers": 1,
+    "max_queue_depth": 32,
+    "max_finished_jobs": 1000,
+    "pdftext_workers": 1,
+}
+# Models are loaded on first use, and the least recently used are released to stay under this many GB
+model_config = {"max_memory_gb": None}
 
 
 UPLOAD_DIRECTORY = "./uploads"
 os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
 
 
+class QueueFullError(Exception):
+    pass
+
+
+class ConversionJob:
+    def __init__(self, params: "CommonParams", cleanup_path: str | None = None):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.cleanup_path = cleanup_path
+        self.status = "queued"
+        self.stage = None
+        self.stage_info: Dict[str, Any] = {}
+        self.stages: List[Dict[str, Any]] = []
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.future: Future | None = None
+
+    def update_progress(self, stage: str, **info):
+        now = time.time()
+        if self.stages and self.stages[-1]["stage"] == stage:
+            # Processors report once per processor, only keep the latest step
+            self.stages[-1].update(info)
+        else:
+            if self.stages:
+                self.stages[-1]["finished_at"] = now
+            self.stages.append({"stage": stage, "started_at": now, **info})
+        self.stage = stage
+        self.stage_info = info
+
+    def summary(self, include_result: bool = False) -> Dict[str, Any]:
+        summary = {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            # Copies, since the worker thread keeps updating these
+            "progress": dict(self.stage_info),
+            "stages": [dict(stage) for stage in self.stages],
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if include_result and self.result is not None:
+            summary["result"] = self.result
+        return summary
+
+
+class JobQueue:
+    """
+    Runs conversions on a bounded pool of worker threads that share one set of models.  New jobs are
+    rejected once `max_queue_depth` jobs are waiting, and only the last `max_finished_jobs` results are kept.
+    """
+
+    def __init__(
+        self,
+        models: dict,
+        workers: int = 1,
+        max_queue_depth: int = 32,
+        max_finished_jobs: int = 1000,
+        pdftext_workers: int = 1,
+    ):
+        if workers > 1:
+            # Lets converters in different threads share the models safely, and batches their calls
+            models = create_batched_model_dict(models)
+        self.models = models
+        self.max_queue_depth = max_queue_depth
+        self.max_finished_jobs = max_finished_jobs
+        self.pdftext_workers = pdftext_workers
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="marker-worker"
+        )
+        self.jobs: OrderedDict[str, ConversionJob] = OrderedDict()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def queued_jobs(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.status == "queued")
+
+    def submit(self, params: "CommonParams", cleanup_path: str | None = None) -> ConversionJob:
+        job = ConversionJob(params, cleanup_path)
+        with self.lock:
+            if self.queued_jobs() >= self.max_queue_depth:
+                raise QueueFullError(
+                    f"The queue is full ({self.max_queue_depth} jobs waiting), try again later"
+                )
+            self.jobs[job.id] = job
+            self.evict_finished_jobs()
+            job.future = self.executor.submit(self.run_job, job)
+        return job
+
+    def evict_finished_jobs(self):
+        finished = [
+            job_id
+            for job_id, job in self.jobs.items()
+            if job.status in ("completed", "failed")
+        ]
+        for job_id in finished[: max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id: str) -> ConversionJob | None:
+        return self.jobs.get(job_id)
+
+    def get_converter(self, config_dict: dict, config_parser: ConfigParser) -> PdfConverter:
+        # Converters are reused by each worker thread, since requests tend to repeat the same options
+        converters = getattr(self.local, "converters", None)
+        if converters is None:
+            converters = self.local.converters = OrderedDict()
+
+        key = json.dumps(config_dict, sort_keys=True, default=repr)
+        if key not in converters:
+            converters[key] = PdfConverter(
+                config=config_dict,
+                # Converters add their llm service to the artifact dict, so each one gets its own copy
+                artifact_dict=dict(self.models),
+                processor_list=config_parser.get_processors(),
+                renderer=config_parser.get_renderer(),
+                llm_service=config_parser.get_llm_service(),
+            )
+            while len(converters) > 8:
+                _, evicted = converters.popitem(last=False)
+                evicted.close()
+        converters.move_to_end(key)
+        return converters[key]
+
+    def run_job(self, job: ConversionJob):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = self.convert(job)
+            job.status = "completed" if job.result["success"] else "failed"
+        except Exception as e:
+            # Anything outside the conversion itself, like encoding the output images, still has to finish the job
+            traceback.print_exc()
+            job.result = {"success": False, "error": str(e)}
+            job.status = "failed"
+        finally:
+            if job.stages:
+                job.stages[-1]["finished_at"] = time.time()
+            job.finished_at = time.time()
+            if job.cleanup_path is not None and os.path.exists(job.cleanup_path):
+                os.remove(job.cleanup_path)
+        return job.result
+
+    def convert(self, job: ConversionJob) -> Dict[str, Any]:
+        params = job.params
+        try:
+            assert params.output_format in ["markdown", "json", "html"], "Invalid output format"
+            options = params.model_dump()
+            config_parser = ConfigParser(options)
+            config_dict = config_parser.generate_config_dict()
+            config_dict["pdftext_workers"] = self.pdftext_workers
+            converter = self.get_converter(config_dict, config_parser)
+            converter.progress_callback = job.update_progress
+            try:
+                rendered = converter(params.filepath)
+            finally:
+                converter.progress_callback = None
+            text, _, images = text_from_rendered(rendered)
+            metadata = rendered.metadata
+        except Exception as e:
+            traceback.print_exc()
+            return {
+                "success": False,
+                "error": str(e),
+            }
+
+        encoded = {}
+        for k, v in images.items():
+            byte_stream = io.BytesIO()
+            v.save(byte_stream, format=settings.OUTPUT_IMAGE_FORMAT)
+            encoded[k] = base64.b64encode(byte_stream.getvalue()).decode(
+                settings.OUTPUT_ENCODING
+            )
+
+        return {
+            "format": params.output_format,
+            "output": text,
+            "images": encoded,
+            "metadata": metadata,
+            "success": True,
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    app_data["models"] = create_model_dict()
+    max_memory_gb = model_config["max_memory_gb"]
+    app_data["models"] = create_model_dict(
+        max_memory=int(max_memory_gb * 1024**3) if max_memory_gb else None
+    )
+    app_data["queue"] = JobQueue(app_data["models"], **server_config)
 
     yield
 
+    app_data["queue"].shutdown()
+    del app_data["queue"]
     if "models" in app_data:
         del app_data["models"]
 
@@ -47,11 +256,27 @@ async def root():
 <ul>
     <li><a href="/docs">API Documentation</a></li>
     <li><a href="/marker">Run marker (post request only)</a></li>
+    <li><a href="/jobs">Submit a conversion job (post request only)</a></li>
 </ul>
 """
     )
 
 
+@app.get("/health")
+async def health():
+    queue: JobQueue = app_data["queue"]
+    return {
+        "status": "ok",
+        "queued_jobs": queue.queued_jobs(),
+        "max_queue_depth": queue.max_queue_depth,
+        "loaded_models": [
+            name
+            for name, model in app_data["models"].items()
+            if not isinstance(model, LazyModel) or model.is_loaded
+        ],
+    }
+
+
 class CommonParams(BaseModel):
     filepath: Annotated[
         Optional[str], Field(description="The path to the PDF file to convert.")
@@ -83,51 +308,30 @@ class CommonParams(BaseModel):
     ] = "markdown"
 
 
-async def _convert_pdf(params: CommonParams):
-    assert params.output_format in ["markdown", "json", "html"], "Invalid output format"
+def submit_job(params: CommonParams, cleanup_path: str | None = None) -> ConversionJob:
     try:
-        options = params.model_dump()
-        config_parser = ConfigParser(options)
-        config_dict = config_parser.generate_config_dict()
-        config_dict["pdftext_workers"] = 1
-        converter_cls = PdfConverter
-        converter = converter_cls(
-            config=config_dict,
-            artifact_dict=app_data["models"],
-            processor_list=config_parser.get_processors(),
-            renderer=config_parser.get_renderer(),
-            llm_service=config_parser.get_llm_service(),
-        )
-        rendered = converter(params.filepath)
-        text, _, images = text_from_rendered(rendered)
-        metadata = rendered.metadata
-    except Exception as e:
-        traceback.print_exc()
-        return {
-            "success": False,
-            "error": str(e),
-        }
+        return app_data["queue"].submit(params, cleanup_path)
+    except QueueFullError as e:
+        if cleanup_path is not None and os.path.exists(cleanup_path):
+            os.remove(cleanup_path)
+        raise HTTPException(status_code=429, detail=str(e))
 
-    encoded = {}
-    for k, v in images.items():
-        byte_stream = io.BytesIO()
-        v.save(byte_stream, format=settings.OUTPUT_IMAGE_FORMAT)
-        encoded[k] = base64.b64encode(byte_stream.getvalue()).decode(
-            settings.OUTPUT_ENCODING
-        )
 
-    return {
-        "format": params.output_format,
-        "output": text,
-        "images": encoded,
-        "metadata": metadata,
-        "success": True,
-    }
+async def save_upload(file: UploadFile) -> str:
+    # Prefix with a unique id, so concurrent uploads with the same name don't overwrite each other
+    upload_path = os.path.join(
+        UPLOAD_DIRECTORY, f"{uuid.uuid4().hex}_{os.path.basename(file.filename)}"
+    )
+    with open(upload_path, "wb+") as upload_file:
+        file_contents = await file.read()
+        upload_file.write(file_contents)
+    return upload_path
 
 
 @app.post("/marker")
 async def convert_pdf(params: CommonParams):
-    return await _convert_pdf(params)
+    job = submit_job(params)
+    return await asyncio.wrap_future(job.future)
 
 
 @app.post("/marker/upload")
@@ -140,11 +344,34 @@ async def convert_pdf_upload(
         ..., description="The PDF file to convert.", media_type="application/pdf"
     ),
 ):
-    upload_path = os.path.join(UPLOAD_DIRECTORY, file.filename)
-    with open(upload_path, "wb+") as upload_file:
-        file_contents = await file.read()
-        upload_file.write(file_contents)
+    upload_path = await save_upload(file)
+    params = CommonParams(
+        filepath=upload_path,
+        page_range=page_range,
+        force_ocr=force_ocr,
+        paginate_output=paginate_output,
+        output_format=output_format,
+    )
+    job = submit_job(params, cleanup_path=upload_path)
+    return await asyncio.wrap_future(job.future)
 
+
+@app.post("/jobs", status_code=202)
+async def create_job(params: CommonParams):
+    return submit_job(params).summary()
+
+
+@app.post("/jobs/upload", status_code=202)
+async def create_upload_job(
+    page_range: Optional[str] = Form(default=None),
+    force_ocr: Optional[bool] = Form(default=False),
+    paginate_output: Optional[bool] = Form(default=False),
+    output_format: Optional[str] = Form(default="markdown"),
+    file: UploadFile = File(
+        ..., description="The PDF file to convert.", media_type="application/pdf"
+    ),
+):
+    upload_path = await save_upload(file)
     params = CommonParams(
         filepath=upload_path,
         page_range=page_range,
@@ -152,17 +379,64 @@ async def convert_pdf_upload(
         paginate_output=paginate_output,
         output_format=output_format,
     )
-    results = await _convert_pdf(params)
-    os.remove(upload_path)
-    return results
+    return submit_job(params, cleanup_path=upload_path).summary()
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = app_data["queue"].get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.summary(include_result=True)
 
 
 @click.command()
 @click.option("--port", type=int, default=8000, help="Port to run the server on")
 @click.option("--host", type=str, default="127.0.0.1", help="Host to run the server on")
-def server_cli(port: int, host: str):
+@click.option("--workers", type=int, default=1, help="Number of conversions to run at once")
+@click.option(
+    "--max_queue_depth",
+    type=int,
+    default=32,
+    help="Maximum number of jobs waiting to run before new jobs are rejected",
+)
+@click.option(
+    "--max_finished_jobs",
+    type=int,
+    default=1000,
+    help="Number of finished jobs to keep results for",
+)
+@click.option(
+    "--pdftext_workers",
+    type=int,
+    default=1,
+    help="Number of pdftext workers each conversion uses",
+)
+@click.option(
+    "--max_model_memory_gb",
+    type=float,
+    default=None,
+    help="Release the least recently used models when loaded models use more than this many GB",
+)
+def server_cli(
+    port: int,
+    host: str,
+    workers: int,
+    max_queue_depth: int,
+    max_finished_jobs: int,
+    pdftext_workers: int,
+    max_model_memory_gb: float | None,
+):
     import uvicorn
 
+    server_config.update(
+        workers=workers,
+        max_queue_depth=max_queue_depth,
+        max_finished_jobs=max_finished_jobs,
+        pdftext_workers=pdftext_workers,
+    )
+    model_config["max_memory_gb"] = max_model_memory_gb
+
     # Run the server
     uvicorn.run(
         app,
@@ -1,9 +1,18 @@
-from typing import Optional, List, Annotated
+import asyncio
+import base64
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, List, Annotated, Tuple
 
 import PIL
 from pydantic import BaseModel
 
+from marker.cache import LLMResponseCache
 from marker.schema.blocks import Block
+from marker.services.images import ImageEncoder
+from marker.services.scheduler import LLMScheduler
 from marker.util import assign_config, verify_config_keys
 
 
@@ -12,7 +21,53 @@ class BaseService:
     max_retries: Annotated[
         int, "The maximum number of retries to use for the service."
     ] = 2
-    retry_wait_time: Annotated[int, "The wait time between retries."] = 3
+    retry_wait_time: Annotated[
+        int,
+        "The base wait time between retries.  It doubles with each retry, with some jitter.",
+    ] = 3
+    max_concurrency: Annotated[
+        int,
+        "The maximum number of requests in flight to the service at once, across all LLM processors.",
+        "Requests start at a lower concurrency that grows while the service keeps up, and halves when it rate limits.",
+    ] = 16
+    requests_per_minute: Annotated[
+        int,
+        "The maximum number of requests to send to the service a minute.  Default is None, for no limit.",
+    ] = None
+    tokens_per_minute: Annotated[
+        int,
+        "The maximum number of tokens to use a minute.  Default is None, for no limit.",
+    ] = None
+    image_token_estimate: Annotated[
+        int,
+        "The number of tokens to budget for each image before a request is sent, for `tokens_per_minute`.",
+    ] = 258
+    llm_cache_dir: Annotated[
+        str,
+        "The directory to cache LLM responses in, so reconverting a document does not send the same requests again.",
+        "Default is None, which disables the cache.",
+    ] = None
+    llm_cache_ttl_days: Annotated[
+        float,
+        "The number of days to keep cached LLM responses.  Default is None, which keeps them until they are evicted for space.",
+    ] = None
+    llm_cache_max_size_mb: Annotated[
+        int,
+        "The maximum size of the LLM response cache in megabytes.  The least recently used responses are evicted first.",
+    ] = 1024
+    image_format: Annotated[
+        str,
+        "The format to encode images in before sending them to the service.",
+    ] = "WEBP"
+    image_max_pixels: Annotated[
+        int,
+        "Downscale images with more pixels than this before sending them, keeping their aspect ratio.",
+        "Default is None, which sends images at full size.",
+    ] = None
+    image_quality: Annotated[
+        int,
+        "The quality to encode lossy images at.  Default is None, for the encoder's default.",
+    ] = None
 
     def __init__(self, config: Optional[BaseModel | dict] = None):
         assign_config(self, config)
@@ -20,6 +75,53 @@ class BaseService:
         # Ensure we have all necessary fields filled out (API keys, etc.)
         verify_config_keys(self)
 
+        # Every caller shares one scheduler, so concurrency and rate limits hold across processors
+        self.scheduler_lock = threading.Lock()
+        self.scheduler = None
+
+        # Clients are kept for the life of the service, so requests reuse pooled connections
+        self.client_lock = threading.Lock()
+        self.clients: Dict[Any, Any] = {}
+
+        # Anything with get(key) and set(key, value) can be swapped in
+        self.response_cache = None
+        if self.llm_cache_dir:
+            self.response_cache = LLMResponseCache(
+                self.llm_cache_dir, self.llm_cache_ttl_days, self.llm_cache_max_size_mb
+            )
+
+        # Encoded images are kept, so retries and repeated crops aren't encoded again
+        self.image_encoder = ImageEncoder(
+            self.image_format, self.image_max_pixels, self.image_quality
+        )
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """
+        Stop the scheduler's threads, and close pooled clients and the response cache.
+        The service shouldn't be used after it is closed.
+        """
+        with self.scheduler_lock:
+            scheduler, self.scheduler = self.scheduler, None
+        if scheduler is not None:
+            scheduler.close()
+
+        with self.client_lock:
+            clients, self.clients = list(self.clients.values()), {}
+        for client in clients:
+            if callable(getattr(client, "close", None)):
+                client.close()
+
+        if self.response_cache is not None and callable(
+            getattr(self.response_cache, "close", None)
+        ):
+            self.response_cache.close()
+
     def __call__(
         self,
         prompt: str,
@@ -29,4 +131,161 @@ class BaseService:
         max_retries: int | None = None,
         timeout: int | None = None,
     ):
+        return self.submit(
+            prompt, image, block, response_schema, max_retries, timeout
+        ).result()
+
+    async def acall(
+        self,
+        prompt: str,
+        image: PIL.Image.Image | List[PIL.Image.Image],
+        block: Block,
+        response_schema: type[BaseModel],
+        max_retries: int | None = None,
+        timeout: int | None = None,
+    ):
+        """
+        The same as calling the service, but awaits the response instead of blocking a thread.
+        """
+        return await asyncio.wrap_future(
+            self.submit(prompt, image, block, response_schema, max_retries, timeout)
+        )
+
+    def submit(
+        self,
+        prompt: str,
+        image: PIL.Image.Image | List[PIL.Image.Image],
+        block: Block,
+        response_schema: type[BaseModel],
+        max_retries: int | None = None,
+        timeout: int | None = None,
+    ) -> Future:
+        """
+        Queue a request with the service's scheduler, and return a future for the response.
+        The response is an empty dict if the request fails.
+        """
+        if max_retries is None:
+            max_retries = self.max_retries
+
+        if timeout is None:
+            timeout = self.timeout
+
+        if not isinstance(image, list):
+            image = [image]
+
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = self.cache_key(prompt, image, response_schema)
+            response = self.response_cache.get(cache_key)
+            if block is not None:
+                block.update_metadata(
+                    llm_cache_hits=int(response is not None),
+                    llm_cache_misses=int(response is None),
+                )
+            if response is not None:
+                future = Future()
+                future.set_result(response)
+                return future
+
+        future = self.get_scheduler().submit(
+            self.request,
+            prompt,
+            image,
+            block,
+            response_schema,
+            timeout,
+            max_retries=max_retries,
+            estimated_tokens=self.estimate_tokens(prompt, image),
+            default={},
+        )
+        if cache_key is not None:
+            future.add_done_callback(
+                lambda f: self.cache_response(cache_key, f.result())
+            )
+        return future
+
+    def request(
+        self,
+        prompt: str,
+        images: List[PIL.Image.Image],
+        block: Block,
+        response_schema: type[BaseModel],
+        timeout: int,
+    ) -> Tuple[dict, int | None]:
+        """
+        Make a single attempt at a request, and return the response with the number of tokens used.
+        Raise `RetryableError` if the attempt was rate limited or timed out.
+        """
         raise NotImplementedError
+
+    def estimate_tokens(self, prompt: str, images: List[PIL.Image.Image]) -> int:
+        # Roughly 4 characters a token.  Responses are not counted until they come back.
+        images = [img for img in images if img is not None]
+        return len(prompt) // 4 + self.image_token_estimate * len(images)
+
+    def encode_image(self, img: PIL.Image.Image) -> bytes:
+        return self.image_encoder.encode(img)
+
+    def encode_image_base64(self, img: PIL.Image.Image) -> str:
+        return base64.b64encode(self.encode_image(img)).decode("utf-8")
+
+    def image_mime_type(self) -> str:
+        return self.image_encoder.mime_type
+
+    def pooled_client(self, key: Any, create: Callable[[], Any]):
+        with self.client_lock:
+            if key not in self.clients:
+                self.clients[key] = create()
+            return self.clients[key]
+
+    def model_name(self) -> str | None:
+        # The model requests go to, so cached responses are not shared between models
+        return None
+
+    def cache_key(
+        self,
+        prompt: str,
+        images: List[PIL.Image.Image],
+        response_schema: type[BaseModel],
+    ) -> str:
+        image_hashes = [
+            None if img is None else self.image_encoder.digest(img) for img in images
+        ]
+
+        key_data = {
+            "service": f"{type(self).__module__}.{type(self).__name__}",
+            "model": self.model_name(),
+            "prompt": prompt,
+            "images": image_hashes,
+            # Images are downscaled and encoded before they are sent, so the service sees different images
+            "image_encoding": self.image_encoder.settings,
+            "schema": response_schema.model_json_schema(),
+        }
+        key_str = json.dumps(key_data, sort_keys=True, default=repr)
+        return hashlib.sha256(key_str.encode()).hexdigest()
+
+    def cache_response(self, cache_key: str, response):
+        # Failed requests come back empty, and should be tried again next time
+        if response:
+            self.response_cache.set(cache_key, response)
+
+    def get_scheduler(self) -> LLMScheduler:
+        with self.scheduler_lock:
+            if self.scheduler is None:
+                self.scheduler = LLMScheduler(
+                    max_concurrency=self.max_concurrency,
+                    requests_per_minute=self.requests_per_minute,
+                    tokens_per_minute=self.tokens_per_minute,
+                    retry_wait_time=self.retry_wait_time,
+                )
+            return self.scheduler
+
+
+def request_concurrency(llm_service, max_concurrency: int | None = None) -> int:
+    # The service's scheduler limits requests, so callers only need a thread for each request it can run at once
+    if max_concurrency is not None:
+        return max_concurrency
+    service_concurrency = getattr(llm_service, "max_concurrency", None)
+    if isinstance(service_concurrency, int) and service_concurrency > 0:
+        return service_concurrency
+    return BaseService.max_concurrency
@@ -1,7 +1,4 @@
-import base64
 import json
-import time
-from io import BytesIO
 from typing import List, Annotated, Union, T
 
 import PIL
@@ -13,6 +10,7 @@ from pydantic import BaseModel
 
 from marker.schema.blocks import Block
 from marker.services import BaseService
+from marker.services.scheduler import RetryableError
 
 logger = get_logger()
 
@@ -25,11 +23,17 @@ class ClaudeService(BaseService):
     max_claude_tokens: Annotated[
         int, "The maximum number of tokens to use for a single Claude request."
     ] = 8192
+    # Claude downscales anything over about 1.15 megapixels itself
+    image_max_pixels: Annotated[
+        int,
+        "Downscale images with more pixels than this before sending them, keeping their aspect ratio.",
+    ] = 1_150_000
+
+    def model_name(self) -> str:
+        return self.claude_model_name
 
     def img_to_base64(self, img: PIL.Image.Image):
-        image_bytes = BytesIO()
-        img.save(image_bytes, format="WEBP")
-        return base64.b64encode(image_bytes.getvalue()).decode("utf-8")
+        return self.encode_image_base64(img)
 
     def prepare_images(
         self, images: Union[Image.Image, List[Image.Image]]
@@ -42,7 +46,7 @@ class ClaudeService(BaseService):
                 "type": "image",
                 "source": {
                     "type": "base64",
-                    "media_type": "image/webp",
+                    "media_type": self.image_mime_type(),
                     "data": self.img_to_base64(img),
                 },
             }
@@ -75,24 +79,14 @@ class ClaudeService(BaseService):
             api_key=self.claude_api_key,
         )
 
-    def __call__(
+    def request(
         self,
         prompt: str,
-        image: PIL.Image.Image | List[PIL.Image.Image],
+        images: List[PIL.Image.Image],
         block: Block,
         response_schema: type[BaseModel],
-        max_retries: int | None = None,
-        timeout: int | None = None,
+        timeout: int,
     ):
-        if max_retries is None:
-            max_retries = self.max_retries
-
-        if timeout is None:
-            timeout = self.timeout
-
-        if not isinstance(image, list):
-            image = [image]
-
         schema_example = response_schema.model_json_schema()
         system_prompt = f"""
 Follow the instructions given by the user prompt.  You must provide your response in JSON format matching this schema:
@@ -102,8 +96,8 @@ Follow the instructions given by the user prompt.  You must provide your respons
 Respond only with the JSON schema, nothing else.  Do not include ```json, ```,  or any other formatting.
 """.strip()
 
-        client = self.get_client()
-        image_data = self.prepare_images(image)
+        client = self.pooled_client("client", self.get_client)
+        image_data = self.prepare_images(images)
 
         messages = [
             {
@@ -115,29 +109,23 @@ Respond only with the JSON schema, nothing else.  Do not include ```json, ```,
             }
         ]
 
-        tries = 0
-        while tries < max_retries:
-            try:
-                response = client.messages.create(
-                    system=system_prompt,
-                    model=self.claude_model_name,
-                    max_tokens=self.max_claude_tokens,
-                    messages=messages,
-                    timeout=timeout,
-                )
-                # Extract and validate response
-                response_text = response.content[0].text
-                return self.validate_response(response_text, response_schema)
-            except (RateLimitError, APITimeoutError) as e:
-                # Rate limit exceeded
-                tries += 1
-                wait_time = tries * self.retry_wait_time
-                logger.warning(
-                    f"Rate limit error: {e}. Retrying in {wait_time} seconds... (Attempt {tries}/{max_retries})"
-                )
-                time.sleep(wait_time)
-            except Exception as e:
-                logger.error(f"Error during Claude API call: {e}")
-                break
-
-        return {}
+        try:
+            response = client.messages.create(
+                system=system_prompt,
+                model=self.claude_model_name,
+                max_tokens=self.max_claude_tokens,
+                messages=messages,
+                timeout=timeout,
+            )
+            # Extract and validate response
+            response_text = response.content[0].text
+            total_tokens = response.usage.input_tokens + response.usage.output_tokens
+            return self.validate_response(response_text, response_schema), total_tokens
+        except RateLimitError as e:
+            raise RetryableError(f"Rate limit error: {e}")
+        except APITimeoutError as e:
+            raise RetryableError(f"Timeout error: {e}", rate_limited=False)
+        except Exception as e:
+            logger.error(f"Error during Claude API call: {e}")
+
+        return {}, None
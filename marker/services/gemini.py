@@ -1,6 +1,4 @@
 import json
-import time
-from io import BytesIO
 from typing import List, Annotated
 
 import PIL
@@ -12,6 +10,7 @@ from pydantic import BaseModel
 
 from marker.schema.blocks import Block
 from marker.services import BaseService
+from marker.services.scheduler import RetryableError
 
 logger = get_logger()
 
@@ -21,74 +20,59 @@ class BaseGeminiService(BaseService):
         str, "The name of the Google model to use for the service."
     ] = "gemini-2.0-flash"
 
+    def model_name(self) -> str:
+        return self.gemini_model_name
+
     def img_to_bytes(self, img: PIL.Image.Image):
-        image_bytes = BytesIO()
-        img.save(image_bytes, format="WEBP")
-        return image_bytes.getvalue()
+        return self.encode_image(img)
 
     def get_google_client(self, timeout: int):
         raise NotImplementedError
 
-    def __call__(
+    def request(
         self,
         prompt: str,
-        image: PIL.Image.Image | List[PIL.Image.Image],
+        images: List[PIL.Image.Image],
         block: Block,
         response_schema: type[BaseModel],
-        max_retries: int | None = None,
-        timeout: int | None = None,
+        timeout: int,
     ):
-        if max_retries is None:
-            max_retries = self.max_retries
-
-        if timeout is None:
-            timeout = self.timeout
-
-        if not isinstance(image, list):
-            image = [image]
-
-        client = self.get_google_client(timeout=timeout)
+        client = self.pooled_client(
+            timeout, lambda: self.get_google_client(timeout=timeout)
+        )
         image_parts = [
-            types.Part.from_bytes(data=self.img_to_bytes(img), mime_type="image/webp")
-            for img in image
+            types.Part.from_bytes(
+                data=self.img_to_bytes(img), mime_type=self.image_mime_type()
+            )
+            for img in images
         ]
 
-        tries = 0
-        while tries < max_retries:
-            try:
-                responses = client.models.generate_content(
-                    model=self.gemini_model_name,
-                    contents=image_parts
-                    + [
-                        prompt
-                    ],  # According to gemini docs, it performs better if the image is the first element
-                    config={
-                        "temperature": 0,
-                        "response_schema": response_schema,
-                        "response_mime_type": "application/json",
-                    },
-                )
-                output = responses.candidates[0].content.parts[0].text
-                total_tokens = responses.usage_metadata.total_token_count
-                block.update_metadata(llm_tokens_used=total_tokens, llm_request_count=1)
-                return json.loads(output)
-            except APIError as e:
-                if e.code in [429, 443, 503]:
-                    # Rate limit exceeded
-                    tries += 1
-                    wait_time = tries * self.retry_wait_time
-                    logger.warning(
-                        f"APIError: {e}. Retrying in {wait_time} seconds... (Attempt {tries}/{max_retries})"
-                    )
-                    time.sleep(wait_time)
-                else:
-                    logger.error(f"APIError: {e}")
-                    break
-            except Exception as e:
-                logger.error(f"Exception: {e}")
-                break
-
-        return {}
+        try:
+            responses = client.models.generate_content(
+                model=self.gemini_model_name,
+                contents=image_parts
+                + [
+                    prompt
+                ],  # According to gemini docs, it performs better if the image is the first element
+                config={
+                    "temperature": 0,
+                    "response_schema": response_schema,
+                    "response_mime_type": "application/json",
+                },
+            )
+            output = responses.candidates[0].content.parts[0].text
+            total_tokens = responses.usage_metadata.total_token_count
+            block.update_metadata(llm_tokens_used=total_tokens, llm_request_count=1)
+            return json.loads(output), total_tokens
+        except APIError as e:
+            if e.code in [429, 443, 503]:
+                # Rate limit exceeded, or the service is overloaded
+                raise RetryableError(f"APIError: {e}", rate_limited=e.code == 429)
+            logger.error(f"APIError: {e}")
+        except Exception as e:
+            logger.error(f"Exception: {e}")
+
+        return {}, None
 
 
 class GoogleGeminiService(BaseGeminiService):
@@ -0,0 +1,107 @@
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+from io import BytesIO
+from typing import Dict, Tuple
+
+from PIL import Image
+
+MIME_TYPES = {"WEBP": "image/webp", "PNG": "image/png", "JPEG": "image/jpeg"}
+
+
+def image_digest(img: Image.Image) -> str:
+    digest = hashlib.sha256(f"{img.mode}:{img.size}:".encode())
+    digest.update(img.tobytes())
+    return digest.hexdigest()
+
+
+class ImageEncoder:
+    """
+    Prepares images for an LLM service.  Images over `max_pixels` are downscaled, keeping their aspect ratio,
+    and encoded in `image_format`.  Encoded bytes are kept by image content, up to `max_cache_bytes`, so
+    retries and identical crops sent by different processors are only encoded once.
+
+    Each image object is only hashed once, for the response cache key and for encoding.  Images shouldn't be
+    changed in place after they are sent, which holds for the crops and page images marker sends.
+    """
+
+    def __init__(
+        self,
+        image_format: str = "WEBP",
+        max_pixels: int | None = None,
+        quality: int | None = None,
+        max_cache_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.image_format = image_format.upper()
+        self.max_pixels = max_pixels
+        self.quality = quality
+        self.max_cache_bytes = max_cache_bytes
+
+        self.lock = threading.Lock()
+        self.encoded: OrderedDict[str, bytes] = OrderedDict()
+        self.cache_bytes = 0
+        self.digests: Dict[int, Tuple[weakref.ref, str]] = {}
+
+    @property
+    def mime_type(self) -> str:
+        return MIME_TYPES.get(self.image_format, f"image/{self.image_format.lower()}")
+
+    @property
+    def settings(self) -> Dict[str, object]:
+        return {
+            "format": self.image_format,
+            "max_pixels": self.max_pixels,
+            "quality": self.quality,
+        }
+
+    def digest(self, img: Image.Image) -> str:
+        key = id(img)
+        entry = self.digests.get(key)
+        if entry is not None and entry[0]() is img:
+            return entry[1]
+
+        digest = image_digest(img)
+        ref = weakref.ref(img, lambda ref: self.forget_digest(key, ref))
+        self.digests[key] = (ref, digest)
+        return digest
+
+    def forget_digest(self, key: int, ref: weakref.ref):
+        # Only drop the entry if its id wasn't reused by a newer image
+        entry = self.digests.get(key)
+        if entry is not None and entry[0] is ref:
+            self.digests.pop(key, None)
+
+    def resize(self, img: Image.Image) -> Image.Image:
+        width, height = img.size
+        if self.max_pixels is None or width * height <= self.max_pixels:
+            return img
+        scale = (self.max_pixels / (width * height)) ** 0.5
+        new_size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        return img.resize(new_size, Image.Resampling.LANCZOS)
+
+    def encode(self, img: Image.Image) -> bytes:
+        key = self.digest(img)
+        with self.lock:
+            if key in self.encoded:
+                self.encoded.move_to_end(key)
+                return self.encoded[key]
+
+        img = self.resize(img)
+        if self.image_format == "JPEG" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        save_kwargs = {}
+        if self.quality is not None:
+            save_kwargs["quality"] = self.quality
+        image_bytes = BytesIO()
+        img.save(image_bytes, format=self.image_format, **save_kwargs)
+        data = image_bytes.getvalue()
+
+        with self.lock:
+            if key not in self.encoded:
+                self.encoded[key] = data
+                self.cache_bytes += len(data)
+            while self.cache_bytes > self.max_cache_bytes and len(self.encoded) > 1:
+                _, evicted = self.encoded.popitem(last=False)
+                self.cache_bytes -= len(evicted)
+        return data
@@ -1,10 +1,9 @@
-import base64
 import json
-from io import BytesIO
 from typing import Annotated, List
 
 import PIL
 import requests
+from requests.adapters import HTTPAdapter
 from marker.logger import get_logger
 from pydantic import BaseModel
 
@@ -21,20 +20,35 @@ class OllamaService(BaseService):
     ollama_model: Annotated[str, "The model name to use for ollama."] = (
         "llama3.2-vision"
     )
+    # Ollama only reads PNG and JPEG images
+    image_format: Annotated[
+        str,
+        "The format to encode images in before sending them to the service.",
+    ] = "PNG"
+
+    def model_name(self) -> str:
+        return self.ollama_model
+
+    def get_session(self) -> requests.Session:
+        # Enough pooled connections for every request the scheduler runs at once
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.max_concurrency
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
 
     def image_to_base64(self, image: PIL.Image.Image):
-        image_bytes = BytesIO()
-        image.save(image_bytes, format="PNG")
-        return base64.b64encode(image_bytes.getvalue()).decode("utf-8")
+        return self.encode_image_base64(image)
 
-    def __call__(
+    def request(
         self,
         prompt: str,
-        image: PIL.Image.Image | List[PIL.Image.Image],
+        images: List[PIL.Image.Image],
         block: Block,
         response_schema: type[BaseModel],
-        max_retries: int | None = None,
-        timeout: int | None = None,
+        timeout: int,
     ):
         url = f"{self.ollama_base_url}/api/generate"
         headers = {"Content-Type": "application/json"}
@@ -46,10 +60,7 @@ class OllamaService(BaseService):
             "required": schema["required"],
         }
 
-        if not isinstance(image, list):
-            image = [image]
-
-        image_bytes = [self.image_to_base64(img) for img in image]
+        image_bytes = [self.image_to_base64(img) for img in images]
 
         payload = {
             "model": self.ollama_model,
@@ -60,7 +71,8 @@ class OllamaService(BaseService):
         }
 
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            session = self.pooled_client("session", self.get_session)
+            response = session.post(url, json=payload, headers=headers)
             response.raise_for_status()
             response_data = response.json()
 
@@ -70,8 +82,8 @@ class OllamaService(BaseService):
             block.update_metadata(llm_request_count=1, llm_tokens_used=total_tokens)
 
             data = response_data["response"]
-            return json.loads(data)
+            return json.loads(data), total_tokens
         except Exception as e:
             logger.warning(f"Ollama inference failed: {e}")
 
-        return {}
+        return {}, None
@@ -1,7 +1,4 @@
-import base64
 import json
-import time
-from io import BytesIO
 from typing import Annotated, List, Union
 
 import openai
@@ -13,6 +10,7 @@ from pydantic import BaseModel
 
 from marker.schema.blocks import Block
 from marker.services import BaseService
+from marker.services.scheduler import RetryableError
 
 logger = get_logger()
 
@@ -28,10 +26,11 @@ class OpenAIService(BaseService):
         str, "The API key to use for the OpenAI-like service."
     ] = None
 
+    def model_name(self) -> str:
+        return self.openai_model
+
     def image_to_base64(self, image: PIL.Image.Image):
-        image_bytes = BytesIO()
-        image.save(image_bytes, format="WEBP")
-        return base64.b64encode(image_bytes.getvalue()).decode("utf-8")
+        return self.encode_image_base64(image)
 
     def prepare_images(
         self, images: Union[Image.Image, List[Image.Image]]
@@ -43,34 +42,24 @@ class OpenAIService(BaseService):
             {
                 "type": "image_url",
                 "image_url": {
-                    "url": "data:image/webp;base64,{}".format(
-                        self.image_to_base64(img)
+                    "url": "data:{};base64,{}".format(
+                        self.image_mime_type(), self.image_to_base64(img)
                     ),
                 },
             }
             for img in images
         ]
 
-    def __call__(
+    def request(
         self,
         prompt: str,
-        image: PIL.Image.Image | List[PIL.Image.Image],
+        images: List[PIL.Image.Image],
         block: Block,
         response_schema: type[BaseModel],
-        max_retries: int | None = None,
-        timeout: int | None = None,
+        timeout: int,
     ):
-        if max_retries is None:
-            max_retries = self.max_retries
-
-        if timeout is None:
-            timeout = self.timeout
-
-        if not isinstance(image, list):
-            image = [image]
-
-        client = self.get_client()
-        image_data = self.prepare_images(image)
+        client = self.pooled_client("client", self.get_client)
+        image_data = self.prepare_images(images)
 
         messages = [
             {
@@ -82,36 +71,29 @@ class OpenAIService(BaseService):
             }
         ]
 
-        tries = 0
-        while tries < max_retries:
-            try:
-                response = client.beta.chat.completions.parse(
-                    extra_headers={
-                        "X-Title": "Marker",
-                        "HTTP-Referer": "https://github.com/VikParuchuri/marker",
-                    },
-                    model=self.openai_model,
-                    messages=messages,
-                    timeout=timeout,
-                    response_format=response_schema,
-                )
-                response_text = response.choices[0].message.content
-                total_tokens = response.usage.total_tokens
-                block.update_metadata(llm_tokens_used=total_tokens, llm_request_count=1)
-                return json.loads(response_text)
-            except (APITimeoutError, RateLimitError) as e:
-                # Rate limit exceeded
-                tries += 1
-                wait_time = tries * self.retry_wait_time
-                logger.warning(
-                    f"Rate limit error: {e}. Retrying in {wait_time} seconds... (Attempt {tries}/{max_retries})"
-                )
-                time.sleep(wait_time)
-            except Exception as e:
-                logger.error(f"OpenAI inference failed: {e}")
-                break
-
-        return {}
+        try:
+            response = client.beta.chat.completions.parse(
+                extra_headers={
+                    "X-Title": "Marker",
+                    "HTTP-Referer": "https://github.com/VikParuchuri/marker",
+                },
+                model=self.openai_model,
+                messages=messages,
+                timeout=timeout,
+                response_format=response_schema,
+            )
+            response_text = response.choices[0].message.content
+            total_tokens = response.usage.total_tokens
+            block.update_metadata(llm_tokens_used=total_tokens, llm_request_count=1)
+            return json.loads(response_text), total_tokens
+        except RateLimitError as e:
+            raise RetryableError(f"Rate limit error: {e}")
+        except APITimeoutError as e:
+            raise RetryableError(f"Timeout error: {e}", rate_limited=False)
+        except Exception as e:
+            logger.error(f"OpenAI inference failed: {e}")
+
+        return {}, None
 
     def get_client(self) -> openai.OpenAI:
         return openai.OpenAI(api_key=self.openai_api_key, base_url=self.openai_base_url)
@@ -0,0 +1,257 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Tuple
+
+from marker.logger import get_logger
+
+logger = get_logger()
+
+
+class RetryableError(Exception):
+    """
+    Raised by a single request attempt that hit a rate limit or timed out, and can be tried again.
+    """
+
+    def __init__(
+        self, message: str, rate_limited: bool = True, retry_after: float | None = None
+    ):
+        super().__init__(message)
+        self.rate_limited = rate_limited
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Allows `per_minute` units a minute, refilled continuously.  Usage that turns out higher than
+    estimated can take the bucket below zero, which delays later requests until it refills.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60
+        self.available = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.available = min(
+            self.capacity, self.available + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self.refill(now)
+        # Requests bigger than the whole bucket only wait for a full bucket
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.rate
+
+    def take(self, amount: float):
+        self.available -= amount
+
+
+@dataclass(order=True)
+class ScheduledRequest:
+    ready_time: float
+    seq: int
+    fn: Callable = field(compare=False)
+    args: Tuple = field(compare=False)
+    kwargs: dict = field(compare=False)
+    future: Future = field(compare=False)
+    max_retries: int = field(compare=False)
+    estimated_tokens: int = field(compare=False)
+    default: Any = field(compare=False)
+    tries: int = field(default=0, compare=False)
+
+
+class LLMScheduler:
+    """
+    Runs the requests of one LLM service, from any number of callers, on a shared pool of workers.
+
+    Requests start once there is room under the requests-per-minute and tokens-per-minute budgets, and
+    under the concurrency limit.  The limit starts at `initial_concurrency`, grows by one after each run
+    of successful requests as long as the limit, up to `max_concurrency`, and halves when the service
+    rate limits.  Retries wait out a jittered exponential backoff in the queue, so no worker sleeps.
+
+    Request functions return `(response, tokens_used)`, and raise `RetryableError` for attempts that can
+    be tried again.  Requests that run out of retries, or raise anything else, resolve to their default.
+    `close` stops the dispatcher and the workers, and resolves anything still queued to its default.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        initial_concurrency: int = 3,
+        requests_per_minute: int | None = None,
+        tokens_per_minute: int | None = None,
+        retry_wait_time: float = 3,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.concurrency = max(1, min(initial_concurrency, self.max_concurrency))
+        self.retry_wait_time = retry_wait_time
+        self.request_bucket = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+        self.condition = threading.Condition()
+        self.queue: List[ScheduledRequest] = []
+        self.seq = itertools.count()
+        self.in_flight = 0
+        self.successes = 0
+        self.last_backoff = 0.0
+        self.executor = None
+        self.dispatcher = None
+        self.closed = False
+
+    def submit(
+        self,
+        fn: Callable,
+        *args,
+        max_retries: int = 2,
+        estimated_tokens: int = 0,
+        default: Any = None,
+        **kwargs,
+    ) -> Future:
+        future = Future()
+        request = ScheduledRequest(
+            ready_time=time.monotonic(),
+            seq=next(self.seq),
+            fn=fn,
+            args=args,
+            kwargs=kwargs,
+            future=future,
+            max_retries=max_retries,
+            estimated_tokens=estimated_tokens,
+            default=default,
+        )
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("The LLM scheduler has been closed")
+            if self.dispatcher is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency, thread_name_prefix="llm"
+                )
+                self.dispatcher = threading.Thread(target=self.dispatch, daemon=True)
+                self.dispatcher.start()
+            heapq.heappush(self.queue, request)
+            self.condition.notify_all()
+        return future
+
+    def dispatch(self):
+        while True:
+            with self.condition:
+                request = None
+                while request is None:
+                    if self.closed:
+                        return
+                    wait = self.next_wait()
+                    if wait == 0:
+                        request = heapq.heappop(self.queue)
+                    else:
+                        self.condition.wait(timeout=wait)
+
+                self.in_flight += 1
+                if self.request_bucket is not None:
+                    self.request_bucket.take(1)
+                if self.token_bucket is not None:
+                    self.token_bucket.take(request.estimated_tokens)
+            try:
+                self.executor.submit(self.run, request)
+            except RuntimeError:
+                # Closed while this request was being taken off the queue
+                request.future.set_result(request.default)
+                return
+
+    def close(self):
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            queued, self.queue = self.queue, []
+            self.condition.notify_all()
+
+        for request in queued:
+            request.future.set_result(request.default)
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+    def next_wait(self) -> float | None:
+        # Seconds until the first queued request can start, or None to wait for a change
+        if not self.queue or self.in_flight >= self.concurrency:
+            return None
+
+        now = time.monotonic()
+        request = self.queue[0]
+        wait = max(0.0, request.ready_time - now)
+        if self.request_bucket is not None:
+            wait = max(wait, self.request_bucket.wait_time(1, now))
+        if self.token_bucket is not None:
+            wait = max(
+                wait, self.token_bucket.wait_time(request.estimated_tokens, now)
+            )
+        return wait
+
+    def run(self, request: ScheduledRequest):
+        retry = None
+        try:
+            response, tokens_used = request.fn(*request.args, **request.kwargs)
+            self.finished(request, tokens_used, success=True)
+            request.future.set_result(response)
+        except RetryableError as e:
+            retry = e
+        except Exception as e:
+            logger.error(f"LLM request failed: {e}")
+            self.finished(request, None, success=False)
+            request.future.set_result(request.default)
+
+        if retry is not None:
+            self.retry(request, retry)
+
+    def finished(
+        self, request: ScheduledRequest, tokens_used: int | None, success: bool
+    ):
+        with self.condition:
+            self.in_flight -= 1
+            if self.token_bucket is not None and tokens_used is not None:
+                self.token_bucket.take(tokens_used - request.estimated_tokens)
+
+            self.successes += 1 if success else 0
+            if self.successes >= self.concurrency:
+                self.successes = 0
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+            self.condition.notify_all()
+
+    def retry(self, request: ScheduledRequest, error: RetryableError):
+        with self.condition:
+            self.in_flight -= 1
+            self.successes = 0
+            now = time.monotonic()
+            # Requests that were already in flight when the limit was hit shouldn't halve it again
+            if error.rate_limited and now - self.last_backoff > self.retry_wait_time:
+                self.concurrency = max(1, self.concurrency // 2)
+                self.last_backoff = now
+
+            request.tries += 1
+            if self.closed or request.tries >= request.max_retries:
+                logger.error(f"LLM request failed after {request.tries} attempts: {error}")
+                self.condition.notify_all()
+                request.future.set_result(request.default)
+                return
+
+            wait_time = error.retry_after
+            if wait_time is None:
+                wait_time = self.retry_wait_time * 2 ** (request.tries - 1)
+                wait_time *= random.uniform(0.5, 1.5)
+            logger.warning(
+                f"{error}. Retrying in {wait_time:.1f} seconds... (Attempt {request.tries}/{request.max_retries})"
+            )
+            request.ready_time = now + wait_time
+            request.seq = next(self.seq)
+            heapq.heappush(self.queue, request)
+            self.condition.notify_all()
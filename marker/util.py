@@ -1,11 +1,19 @@
+import asyncio
 import inspect
 import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from importlib import import_module
-from typing import List, Annotated
+from importlib.metadata import PackageNotFoundError, version
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Annotated, Sequence, Tuple
 import re
 
 import numpy as np
 import requests
+from tqdm import tqdm
 from pydantic import BaseModel
 
 from marker.schema.polygon import PolygonBox
@@ -113,6 +121,169 @@ def matrix_intersection_area(boxes1: List[List[float]], boxes2: List[List[float]
     return width * height  # Shape: (N, M)
 
 
+class SpatialIndex:
+    """
+    A uniform grid over a set of bboxes, so that intersection, containment and nearest-neighbor
+    queries only look at nearby boxes instead of every box on the page.  Results match the
+    dense `matrix_intersection_area` and `PolygonBox.minimum_gap` computations, and ties are
+    broken by the lowest index.
+    """
+
+    max_cells_per_axis = 256
+
+    def __init__(
+        self,
+        bboxes: List[List[float]],
+        cell_size: Tuple[float, float] | None = None,
+    ):
+        self.bboxes = np.array(bboxes, dtype=np.float64).reshape(-1, 4)
+        self.cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+
+        if cell_size is None:
+            cell_size = self.default_cell_size(self.bboxes)
+        self.cell_width, self.cell_height = cell_size
+
+        for idx in range(len(self.bboxes)):
+            self.add(idx)
+
+    def __len__(self):
+        return len(self.bboxes)
+
+    @classmethod
+    def default_cell_size(cls, bboxes: np.ndarray) -> Tuple[float, float]:
+        if len(bboxes) == 0:
+            return 1.0, 1.0
+
+        # Cells roughly the size of a typical box, without letting a few huge boxes create a huge grid
+        widths = bboxes[:, 2] - bboxes[:, 0]
+        heights = bboxes[:, 3] - bboxes[:, 1]
+        extent_width = bboxes[:, 2].max() - bboxes[:, 0].min()
+        extent_height = bboxes[:, 3].max() - bboxes[:, 1].min()
+        cell_width = max(float(np.median(widths)), extent_width / cls.max_cells_per_axis, 1.0)
+        cell_height = max(float(np.median(heights)), extent_height / cls.max_cells_per_axis, 1.0)
+        return cell_width, cell_height
+
+    def cell_range(self, bbox) -> Tuple[int, int, int, int]:
+        return (
+            int(np.floor(bbox[0] / self.cell_width)),
+            int(np.floor(bbox[1] / self.cell_height)),
+            int(np.floor(bbox[2] / self.cell_width)),
+            int(np.floor(bbox[3] / self.cell_height)),
+        )
+
+    def add(self, idx: int):
+        x_start, y_start, x_end, y_end = self.cell_range(self.bboxes[idx])
+        for x in range(x_start, x_end + 1):
+            for y in range(y_start, y_end + 1):
+                self.cells[(x, y)].append(idx)
+
+    def remove(self, idx: int):
+        x_start, y_start, x_end, y_end = self.cell_range(self.bboxes[idx])
+        for x in range(x_start, x_end + 1):
+            for y in range(y_start, y_end + 1):
+                self.cells[(x, y)].remove(idx)
+
+    def update(self, idx: int, bbox: List[float]):
+        self.remove(idx)
+        self.bboxes[idx] = bbox
+        self.add(idx)
+
+    def candidates(self, bbox: List[float]) -> np.ndarray:
+        x_start, y_start, x_end, y_end = self.cell_range(bbox)
+        if (x_end - x_start + 1) * (y_end - y_start + 1) > len(self.cells):
+            # Cheaper to visit the occupied cells than every cell the query covers
+            found = set()
+            for (x, y), idxs in self.cells.items():
+                if x_start <= x <= x_end and y_start <= y <= y_end:
+                    found.update(idxs)
+        else:
+            found = set()
+            for x in range(x_start, x_end + 1):
+                for y in range(y_start, y_end + 1):
+                    idxs = self.cells.get((x, y))
+                    if idxs:
+                        found.update(idxs)
+        return np.array(sorted(found), dtype=np.int64)
+
+    def intersection_areas(self, bbox: List[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the indices of the boxes that intersect `bbox`, in ascending order, and the
+        intersection areas.
+        """
+        idxs = self.candidates(bbox)
+        if len(idxs) == 0:
+            return idxs, np.zeros(0)
+
+        boxes = self.bboxes[idxs]
+        width = np.maximum(0, np.minimum(bbox[2], boxes[:, 2]) - np.maximum(bbox[0], boxes[:, 0]))
+        height = np.maximum(0, np.minimum(bbox[3], boxes[:, 3]) - np.maximum(bbox[1], boxes[:, 1]))
+        areas = width * height
+
+        mask = areas > 0
+        return idxs[mask], areas[mask]
+
+    def max_intersection(self, bbox: List[float]) -> Tuple[int | None, float]:
+        idxs, areas = self.intersection_areas(bbox)
+        if len(idxs) == 0:
+            return None, 0
+        best = areas.argmax()
+        return int(idxs[best]), areas[best]
+
+    def contained(self, bbox: List[float], min_pct: float) -> List[int]:
+        """
+        Returns the indices of the boxes that have more than `min_pct` of their area inside `bbox`.
+        """
+        idxs, areas = self.intersection_areas(bbox)
+        boxes = self.bboxes[idxs]
+        box_areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        pcts = areas / np.maximum(box_areas, 1)
+        return [int(idx) for idx in idxs[pcts > min_pct]]
+
+    @staticmethod
+    def gap(bbox: List[float], other: List[float]) -> float:
+        # Same result as PolygonBox.minimum_gap
+        x_gap = max(0, other[0] - bbox[2], bbox[0] - other[2])
+        y_gap = max(0, other[1] - bbox[3], bbox[1] - other[3])
+        if x_gap > 0 and y_gap > 0:
+            return (x_gap**2 + y_gap**2) ** 0.5
+        return max(x_gap, y_gap)
+
+    def nearest(self, bbox: List[float], exclude: int | None = None) -> Tuple[int | None, float | None]:
+        """
+        Returns the index of the box with the smallest gap to `bbox`, and the gap.
+        """
+        if len(self.bboxes) == 0 or (len(self.bboxes) == 1 and exclude == 0):
+            return None, None
+
+        bounds = [
+            self.bboxes[:, 0].min(),
+            self.bboxes[:, 1].min(),
+            self.bboxes[:, 2].max(),
+            self.bboxes[:, 3].max(),
+        ]
+        radius = max(self.cell_width, self.cell_height)
+        while True:
+            search_bbox = [bbox[0] - radius, bbox[1] - radius, bbox[2] + radius, bbox[3] + radius]
+            best_idx, best_gap = None, None
+            for idx in self.candidates(search_bbox):
+                if idx == exclude:
+                    continue
+                gap = self.gap(bbox, self.bboxes[idx].tolist())
+                if best_gap is None or gap < best_gap:
+                    best_idx, best_gap = int(idx), gap
+
+            # Boxes outside the search area are at least `radius` away
+            covers_all = (
+                search_bbox[0] <= bounds[0]
+                and search_bbox[1] <= bounds[1]
+                and search_bbox[2] >= bounds[2]
+                and search_bbox[3] >= bounds[3]
+            )
+            if covers_all or (best_gap is not None and best_gap <= radius):
+                return best_idx, best_gap
+            radius *= 2
+
+
 def matrix_distance(boxes1: List[List[float]], boxes2: List[List[float]]) -> np.ndarray:
     if len(boxes2) == 0:
         return np.zeros((len(boxes1), 0))
@@ -150,6 +321,97 @@ def sort_text_lines(lines: List[PolygonBox], tolerance=1.25):
 
     return sorted_lines
 
+def pipelined_batches(
+    items: Sequence[Any],
+    prepare: Callable[[Sequence[Any]], Any],
+    run: Callable[[Any], List[Any]],
+    batch_size: int,
+    depth: int = 2,
+    desc: str | None = None,
+    disable_tqdm: bool = False,
+) -> List[Any]:
+    """
+    Run `run` on each batch of items after `prepare`, and return the results in order.  Batches are prepared
+    on a background thread, so the next pages are rendered while the model runs on the current batch.  At most
+    `depth` prepared batches wait in the queue.  With a depth of 0, everything is prepared up front and run at once.
+    Progress is shown over all the batches, so the model's own progress bar should be disabled when pipelining.
+    """
+    if not should_pipeline(items, batch_size, depth):
+        return list(run(prepare(items))) if items else []
+
+    batches = [items[i : i + batch_size] for i in range(0, len(items), batch_size)]
+    prepared = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def producer():
+        for batch in batches:
+            try:
+                item = (prepare(batch), None)
+            except Exception as e:
+                item = (None, e)
+            while not stop.is_set():
+                try:
+                    prepared.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            if stop.is_set() or item[1] is not None:
+                return
+
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+
+    results = []
+    progress = tqdm(total=len(items), desc=desc, disable=disable_tqdm or desc is None)
+    try:
+        for batch in batches:
+            batch_input, error = prepared.get()
+            if error is not None:
+                raise error
+            results.extend(run(batch_input))
+            progress.update(len(batch))
+    finally:
+        stop.set()
+        thread.join()
+        progress.close()
+    return results
+
+
+def should_pipeline(items: Sequence[Any], batch_size: int, depth: int) -> bool:
+    return depth > 0 and len(items) > batch_size
+
+
+def run_async(coro):
+    """
+    Run a coroutine to completion from synchronous code.  If this thread is already running an event loop,
+    like in a notebook or an async server, the coroutine runs on its own loop in a worker thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+@lru_cache
+def marker_version() -> str:
+    # Source checkouts that were never installed fall back to the version in pyproject.toml
+    try:
+        return version("marker-pdf")
+    except PackageNotFoundError:
+        pass
+
+    pyproject = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pyproject.toml")
+    if os.path.exists(pyproject):
+        with open(pyproject) as f:
+            match = re.search(r'^version\s*=\s*"([^"]+)"', f.read(), re.MULTILINE)
+        if match:
+            return match.group(1)
+    return "unknown"
+
+
 def download_font():
     if not os.path.exists(settings.FONT_PATH):
         os.makedirs(os.path.dirname(settings.FONT_PATH), exist_ok=True)
@@ -1,6 +1,9 @@
 import pytest
 
+from marker.builders.document import DocumentBuilder
+from marker.providers import LazyPageImage
 from marker.schema import BlockTypes
+from marker.schema.polygon import PolygonBox
 from marker.schema.text.line import Line
 
 
@@ -21,3 +24,44 @@ def test_document_builder(pdf_document):
     assert first_span.text == 'Subspace Adversarial Training'
     assert first_span.font == 'NimbusRomNo9L-Medi'
     assert first_span.formats == ['plain']
+
+
+@pytest.mark.config({"page_range": [0, 1], "max_cached_page_images": 1})
+def test_lazy_page_images(config, doc_provider):
+    document = DocumentBuilder(config).build_document(doc_provider)
+    first_page, second_page = document.pages
+    assert isinstance(first_page.highres_image, LazyPageImage)
+
+    image_cache = first_page.highres_image.cache
+    assert len(image_cache.images) == 0
+
+    assert first_page.get_image(highres=True).size == (1632, 2112)
+    assert second_page.get_image(highres=False).size == (816, 1056)
+    assert list(image_cache.images.keys()) == [(1, 96)]
+
+
+@pytest.mark.config({"page_range": [0]})
+def test_derived_page_images(config, doc_provider):
+    document = DocumentBuilder(config).build_document(doc_provider)
+    page = document.pages[0]
+    image_cache = page.highres_image.cache
+
+    assert page.get_image(highres=True) is page.get_image(highres=True)
+
+    # Masked images are cached until the masked blocks change
+    block = page.add_block(Line, PolygonBox.from_bbox([10, 10, 100, 20]))
+    masked = page.get_image(highres=True, remove_blocks=[BlockTypes.Line])
+    assert masked is page.get_image(highres=True, remove_blocks=[BlockTypes.Line])
+    assert masked is not page.get_image(highres=True)
+
+    block.polygon = PolygonBox.from_bbox([10, 10, 200, 20])
+    assert masked is not page.get_image(highres=True, remove_blocks=[BlockTypes.Line])
+
+    crop = block.get_image(document, highres=True)
+    assert crop is block.get_image(document, highres=True)
+    assert crop is not block.get_image(document, highres=True, expansion=(0.1, 0.1))
+
+    # Derived images are dropped with their page image
+    image_cache.evict(0)
+    assert len(image_cache.derived) == 0
+    assert block.get_image(document, highres=True).size == crop.size
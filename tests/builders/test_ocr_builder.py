@@ -1,6 +1,10 @@
 from PIL import Image
 
 from marker.builders.ocr import OcrBuilder
+from marker.schema import BlockTypes
+from marker.schema.blocks import BlockId
+from marker.schema.polygon import PolygonBox
+from marker.schema.text.span import Span
 
 
 def test_blank_char_builder(recognition_model):
@@ -8,3 +12,34 @@ def test_blank_char_builder(recognition_model):
     image = Image.new("RGB", (100, 100))
     spans = builder.spans_from_html_chars([], None, image)  # Test with empty char list
     assert len(spans) == 0
+
+
+def test_link_and_break_span():
+    builder = OcrBuilder(None)
+    span = Span(
+        text="see the docs here",
+        formats=["plain"],
+        page_id=0,
+        block_id=3,
+        polygon=PolygonBox.from_bbox([0, 0, 100, 10]),
+        structure=[BlockId(page_id=0, block_id=1, block_type=BlockTypes.Char)],
+        minimum_position=0,
+        maximum_position=0,
+        font="Unknown",
+        font_weight=0,
+        font_size=0,
+    )
+    before, match, after = builder.link_and_break_span(
+        span, span.text, "docs", "https://example.com"
+    )
+
+    assert (before.text, match.text, after.text) == ("see the ", "docs", " here")
+    assert match.url == "https://example.com"
+    assert before.structure == [] and after.structure == []
+
+    # Clones don't share mutable state with the original span
+    match.formats.append("bold")
+    match.structure.append(BlockId(page_id=0, block_id=2, block_type=BlockTypes.Char))
+    assert span.formats == ["plain"]
+    assert len(span.structure) == 1
+    assert span.text == "see the docs here" and span.url is None
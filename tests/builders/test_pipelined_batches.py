@@ -0,0 +1,39 @@
+import threading
+
+import pytest
+
+from marker.util import pipelined_batches
+
+
+def test_pipelined_batches_keeps_order():
+    prepare_threads = set()
+
+    def prepare(batch):
+        prepare_threads.add(threading.get_ident())
+        return [item * 2 for item in batch]
+
+    results = pipelined_batches(list(range(10)), prepare, list, batch_size=3, depth=2)
+    assert results == [item * 2 for item in range(10)]
+    assert threading.get_ident() not in prepare_threads
+
+
+def test_pipelined_batches_depth_zero():
+    batches = []
+
+    def run(batch):
+        batches.append(batch)
+        return batch
+
+    results = pipelined_batches(list(range(10)), list, run, batch_size=3, depth=0)
+    assert results == list(range(10))
+    assert batches == [list(range(10))]
+
+
+def test_pipelined_batches_raises_prepare_errors():
+    def prepare(batch):
+        if 6 in batch:
+            raise ValueError("bad page")
+        return batch
+
+    with pytest.raises(ValueError, match="bad page"):
+        pipelined_batches(list(range(10)), prepare, list, batch_size=3, depth=1)
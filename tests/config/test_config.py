@@ -44,6 +44,7 @@ def test_config_parser():
     assert kwargs["output_dir"] == "output_dir"
 
     assert config_dict["pdftext_workers"] == 1  # disabling multiprocessing does this
+    assert config_dict["render_workers"] == 1
     assert config_dict["height_tolerance"] == 0.5
     assert "output_dir" not in config_dict  # This is not a config key
 
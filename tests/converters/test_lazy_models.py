@@ -0,0 +1,169 @@
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from marker.converters import BaseConverter
+from marker import models as models_module
+from marker.models import (
+    BatchedPredictor,
+    LazyModel,
+    ModelResidency,
+    create_shared_model_dict,
+    release_models,
+)
+
+
+class FakeParameter:
+    def __init__(self, size: int):
+        self.size = size
+
+    def numel(self):
+        return self.size
+
+    def element_size(self):
+        return 1
+
+
+class FakeModule:
+    def __init__(self, size: int):
+        self.size = size
+
+        self.shared = False
+
+    def parameters(self):
+        return [FakeParameter(self.size)]
+
+    def share_memory(self):
+        self.shared = True
+        return self
+
+
+class FakePredictor:
+    def __init__(self, size: int):
+        self.model = FakeModule(size)
+        self.disable_tqdm = False
+
+    def __call__(self, images):
+        return [self.disable_tqdm] * len(images)
+
+
+class FakeLoader:
+    def __init__(self, size: int):
+        self.size = size
+        self.loads = 0
+
+    def __call__(self):
+        self.loads += 1
+        return FakePredictor(self.size)
+
+
+class NeedsLayout:
+    def __init__(self, layout_model, config=None):
+        self.layout_model = layout_model
+
+
+def test_lazy_model_loads_on_first_use():
+    loader = FakeLoader(10)
+    model = LazyModel("layout_model", loader)
+    model.disable_tqdm = True
+    assert not model.is_loaded
+    assert loader.loads == 0
+
+    assert model(["image"]) == [True]
+    assert model.is_loaded
+    assert loader.loads == 1
+
+    # Settings on the proxy survive a reload
+    model.release()
+    assert not model.is_loaded
+    assert model(["image"]) == [True]
+    assert loader.loads == 2
+
+
+def test_model_residency_releases_least_recently_used():
+    residency = ModelResidency(max_memory=25)
+    models = {
+        name: LazyModel(name, FakeLoader(10), residency)
+        for name in ("layout_model", "detection_model", "recognition_model")
+    }
+
+    models["layout_model"]([])
+    models["detection_model"]([])
+    models["layout_model"]([])
+    models["recognition_model"]([])
+
+    assert models["layout_model"].is_loaded
+    assert not models["detection_model"].is_loaded
+    assert models["recognition_model"].is_loaded
+    assert residency.resident_memory == 20
+
+    release_models(models)
+    assert residency.resident_memory == 0
+    assert not any(model.is_loaded for model in models.values())
+
+
+def test_resolve_dependencies_loads_nothing():
+    loaders = {"layout_model": FakeLoader(10), "recognition_model": FakeLoader(10)}
+    converter = BaseConverter()
+    converter.artifact_dict = {
+        name: LazyModel(name, loader) for name, loader in loaders.items()
+    }
+
+    resolved = converter.resolve_dependencies(NeedsLayout)
+    assert resolved.layout_model is converter.artifact_dict["layout_model"]
+    assert all(loader.loads == 0 for loader in loaders.values())
+
+
+def test_lazy_model_pickles():
+    model = LazyModel("layout_model", FakeLoader(10))
+    model([])
+    restored = pickle.loads(pickle.dumps(model))
+    assert restored.is_loaded
+    assert restored(["image"]) == [False]
+
+
+class EchoPredictor:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, images, bboxes=None):
+        self.calls += 1
+        return [float(image.sum()) for image in images]
+
+
+def test_batched_predictor_identical_requests():
+    predictor = EchoPredictor()
+    batched = BatchedPredictor(
+        predictor,
+        batch_kwargs=("images", "bboxes"),
+        max_batch_images=3,
+        batch_wait_time=1,
+    )
+
+    # Two documents with the same pages send equal arguments, which are still separate requests
+    images = [np.ones((2, 2)), np.zeros((2, 2))]
+
+    def call(_):
+        return batched(list(images))
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(call, i) for i in range(2)]
+        results = [future.result(timeout=10) for future in futures]
+
+    assert results == [[4.0, 0.0], [4.0, 0.0]]
+    assert predictor.calls == 2
+
+
+def test_shared_model_dict_is_loaded_and_shared(monkeypatch):
+    monkeypatch.setitem(
+        models_module.MODEL_CLASSES,
+        "layout_model",
+        lambda device=None, dtype=None: FakePredictor(10),
+    )
+    model_dict = create_shared_model_dict(models=["layout_model"])
+
+    # Worker processes get this dict, so every model has to be loaded and shared before they start
+    model = model_dict["layout_model"]
+    assert not isinstance(model, LazyModel)
+    assert model.model.shared
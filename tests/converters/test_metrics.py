@@ -0,0 +1,87 @@
+import pytest
+
+from marker.converters.pdf import PdfConverter
+from marker.metrics import ConversionMetrics, InstrumentedModel, InstrumentedService
+from marker.renderers.markdown import MarkdownOutput
+
+
+class FakePredictor:
+    def __init__(self):
+        self.disable_tqdm = False
+
+    def __call__(self, images, batch_size=None):
+        return [None] * len(images)
+
+
+def test_instrumented_model_records_batch_fill():
+    metrics = ConversionMetrics()
+    predictor = FakePredictor()
+    model = InstrumentedModel("layout_model", predictor, metrics)
+    model.disable_tqdm = True
+    assert predictor.disable_tqdm
+
+    model(["image"] * 5, batch_size=4)
+    model(["image"] * 3, batch_size=4)
+
+    layout = metrics.to_dict()["models"]["layout_model"]
+    assert layout["calls"] == 2
+    assert layout["items"] == 8
+    assert layout["batches"] == 3
+    assert layout["batch_fill_ratio"] == pytest.approx(8 / 12)
+
+
+def test_instrumented_service_counts_failures():
+    metrics = ConversionMetrics()
+    responses = iter([{"markdown": "text"}, {}])
+    service = InstrumentedService(lambda *args, **kwargs: next(responses), metrics)
+    service("prompt", None, None, None)
+    service("prompt", None, None, None)
+
+    llm = metrics.to_dict()["llm"]["function"]
+    assert llm["requests"] == 2
+    assert llm["failures"] == 1
+
+
+def test_metrics_prometheus_text():
+    metrics = ConversionMetrics()
+    with metrics.stage("LayoutBuilder", "builder", items=2):
+        pass
+
+    text = metrics.to_prometheus()
+    assert '# TYPE marker_stage_wall_time_seconds gauge' in text
+    assert 'marker_stage_items{stage="LayoutBuilder",kind="builder"} 2' in text
+
+    metrics.reset()
+    assert metrics.to_dict()["stages"] == []
+
+
+def test_metrics_prometheus_sums_stage_windows():
+    metrics = ConversionMetrics()
+    # A streamed conversion runs each stage once per page window
+    for items in (2, 3):
+        with metrics.stage("TextProcessor", "processor", items=items):
+            pass
+    with metrics.stage("MarkdownRenderer", "renderer"):
+        pass
+
+    samples = [
+        line for line in metrics.to_prometheus().splitlines() if not line.startswith("#")
+    ]
+    series = [line.rsplit(" ", 1)[0] for line in samples]
+    assert len(series) == len(set(series))
+    assert 'marker_stage_items{stage="TextProcessor",kind="processor"} 5' in samples
+    assert 'marker_stage_runs{stage="TextProcessor",kind="processor"} 2' in samples
+    assert 'marker_stage_runs{stage="MarkdownRenderer",kind="renderer"} 1' in samples
+
+
+@pytest.mark.output_format("markdown")
+@pytest.mark.config({"page_range": [0], "collect_metrics": True})
+def test_pdf_converter_metrics(pdf_converter: PdfConverter, temp_doc):
+    markdown_output: MarkdownOutput = pdf_converter(temp_doc.name)
+    metrics = markdown_output.metadata["metrics"]
+
+    stage_names = [stage["name"] for stage in metrics["stages"]]
+    for name in ("LayoutBuilder", "LineBuilder", "OcrBuilder", "StructureBuilder"):
+        assert name in stage_names
+    assert "TextProcessor" in stage_names
+    assert metrics["models"]["layout_model"]["items"] == 1
@@ -1,7 +1,10 @@
 import io
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
+from marker.cache import ConversionCache
 from marker.converters.pdf import PdfConverter
+from marker.models import create_batched_model_dict
 from marker.renderers.markdown import MarkdownOutput
 
 
@@ -103,3 +106,87 @@ def test_pdf_converter_bytes(pdf_converter: PdfConverter, temp_doc):
     # Some assertions for line joining across columns
     assert "remain similar across a wide range of choices." in markdown  # pg: 2
     assert "a new scheme for designing more robust and efficient" in markdown  # pg: 8
+
+
+@pytest.mark.output_format("markdown")
+@pytest.mark.config({"page_range": [0, 1, 2, 3], "page_window_size": 2})
+def test_pdf_converter_stream(pdf_converter: PdfConverter, temp_doc):
+    outputs = list(pdf_converter.stream(temp_doc.name))
+    assert len(outputs) == 2
+    assert all(isinstance(output, MarkdownOutput) for output in outputs)
+
+    page_ids = [
+        page_stats["page_id"]
+        for output in outputs
+        for page_stats in output.metadata["page_stats"]
+    ]
+    assert page_ids == [0, 1, 2, 3]
+    assert "# Subspace Adversarial Training" in outputs[0].markdown
+
+    # Window state is only kept while streaming
+    assert all(p.window_state is None for p in pdf_converter.processor_list)
+
+
+@pytest.mark.output_format("markdown")
+@pytest.mark.config({"page_range": [0, 1]})
+def test_pdf_converter_batched_models(config, model_dict, temp_doc):
+    batched_model_dict = create_batched_model_dict(model_dict)
+
+    def convert(_):
+        converter = PdfConverter(artifact_dict=batched_model_dict, config=config)
+        return converter(temp_doc.name).markdown
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        markdowns = list(executor.map(convert, range(2)))
+
+    assert markdowns[0] == markdowns[1]
+    assert "# Subspace Adversarial Training" in markdowns[0]
+
+
+@pytest.mark.config({"page_range": [0]})
+def test_pdf_converter_cache(config, model_dict, temp_doc, tmp_path, monkeypatch):
+    config = {**config, "cache_dir": str(tmp_path)}
+    markdown = PdfConverter(artifact_dict=model_dict, config=config)(temp_doc.name).markdown
+    assert len(list(tmp_path.glob("*.pkl"))) == 4
+
+    # Only the renderer changed, so the processed document is loaded from the cache
+    def build_document_structure(*args):
+        raise AssertionError("Document should be loaded from the cache")
+
+    monkeypatch.setattr(PdfConverter, "build_document_structure", build_document_structure)
+    cached_markdown = PdfConverter(artifact_dict=model_dict, config=config)(temp_doc.name).markdown
+    assert cached_markdown == markdown
+
+    json_output = PdfConverter(
+        artifact_dict=model_dict,
+        config=config,
+        renderer="marker.renderers.json.JSONRenderer",
+    )(temp_doc.name)
+    assert len(json_output.children) == 1
+
+
+@pytest.mark.config({"page_range": [0]})
+def test_pdf_converter_progress(pdf_converter: PdfConverter, temp_doc):
+    stages = []
+    pdf_converter.progress_callback = lambda stage, **info: stages.append((stage, info))
+    pdf_converter(temp_doc.name)
+
+    stage_names = [stage for stage, _ in stages]
+    assert stage_names[:4] == ["provider", "layout", "lines", "ocr"]
+    assert stage_names[-1] == "render"
+
+    processor_steps = [info for stage, info in stages if stage == "processors"]
+    assert len(processor_steps) == len(pdf_converter.processor_list)
+    assert processor_steps[-1]["step"] == processor_steps[-1]["total"]
+
+
+def test_conversion_cache_key_version(tmp_path, monkeypatch):
+    filepath = tmp_path / "input.pdf"
+    filepath.write_bytes(b"%PDF-1.4")
+    cache = ConversionCache(str(tmp_path / "cache"))
+    key = cache.key("rendered", str(filepath), {}, [PdfConverter])
+    assert key == cache.key("rendered", str(filepath), {}, [PdfConverter])
+
+    # Entries from another marker version are never returned
+    monkeypatch.setattr("marker.cache.marker_version", lambda: "0.0.0")
+    assert key != cache.key("rendered", str(filepath), {}, [PdfConverter])
@@ -0,0 +1,22 @@
+import pytest
+
+from marker.converters.text_layer import TextLayerConverter
+from marker.renderers.markdown import MarkdownOutput
+
+
+@pytest.mark.output_format("markdown")
+@pytest.mark.config({"page_range": [0, 5]})
+def test_text_layer_converter(config, model_dict, temp_doc):
+    artifact_dict = {k: model_dict[k] for k in TextLayerConverter.required_models}
+    converter = TextLayerConverter(artifact_dict=artifact_dict, config=config)
+
+    markdown_output: MarkdownOutput = converter(temp_doc.name)
+    markdown = markdown_output.markdown
+
+    assert "# Subspace Adversarial Training" in markdown
+    assert "Schedule" in markdown
+
+    # Only the low resolution images were rendered
+    document = converter.build_document(temp_doc.name)
+    image_cache = document.pages[0].lowres_image.cache
+    assert all(dpi == 96 for _, dpi in image_cache.images)
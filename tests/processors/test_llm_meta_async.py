@@ -0,0 +1,190 @@
+import threading
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pytest
+from PIL import Image
+from pydantic import BaseModel
+
+from marker.metrics import ConversionMetrics, InstrumentedService
+from marker.processors.llm import BaseLLMSimpleBlockProcessor
+from marker.processors.llm.llm_meta import LLMSimpleBlockMetaProcessor
+from marker.schema.polygon import PolygonBox
+from marker.schema.text.line import Line
+from marker.services import BaseService
+
+
+class EchoService(BaseService):
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.threads = set()
+
+    def request(self, prompt, images, block, response_schema, timeout):
+        self.threads.add(threading.get_ident())
+        return {"text": prompt}, None
+
+
+class RecordingProcessor(BaseLLMSimpleBlockProcessor):
+    def __init__(self, prompts, config=None):
+        super().__init__(config)
+        self.prompts = prompts
+        self.responses = []
+
+    def inference_blocks(self, document):
+        return self.prompts
+
+    def block_prompts(self, document):
+        return [
+            {"prompt": prompt, "image": None, "block": None, "schema": None}
+            for prompt in self.prompts
+        ]
+
+    def rewrite_block(self, response, prompt_data, document):
+        self.responses.append((response["text"], threading.get_ident()))
+
+
+def test_meta_processor_awaits_async_service():
+    service = EchoService()
+    processors = [RecordingProcessor(["a", "b"]), RecordingProcessor(["c"])]
+    meta = LLMSimpleBlockMetaProcessor(
+        processors, service, {"use_llm": True, "disable_tqdm": True}
+    )
+    meta(None)
+
+    assert [text for text, _ in processors[0].responses] == ["a", "b"]
+    assert [text for text, _ in processors[1].responses] == ["c"]
+    # Responses are applied on the calling thread, and requests run on the scheduler's workers
+    assert {thread for _, thread in processors[0].responses} == {threading.get_ident()}
+    assert threading.get_ident() not in service.threads
+
+
+def test_meta_processor_calls_sync_service():
+    service = Mock()
+    service.return_value = {"text": "mocked"}
+    processor = RecordingProcessor(["a", "b"])
+    meta = LLMSimpleBlockMetaProcessor(
+        [processor], service, {"use_llm": True, "disable_tqdm": True}
+    )
+    meta(None)
+
+    assert [text for text, _ in processor.responses] == ["mocked", "mocked"]
+    assert service.call_count == 2
+
+
+class SyncOnlyService:
+    def __call__(self, prompt, image, block, response_schema, **kwargs):
+        return {"text": prompt}
+
+
+def test_meta_processor_with_metrics_on_sync_service():
+    metrics = ConversionMetrics()
+    service = InstrumentedService(SyncOnlyService(), metrics)
+    assert not hasattr(service, "acall")
+
+    processor = RecordingProcessor(["a", "b"])
+    meta = LLMSimpleBlockMetaProcessor(
+        [processor], service, {"use_llm": True, "disable_tqdm": True}
+    )
+    meta(None)
+
+    assert [text for text, _ in processor.responses] == ["a", "b"]
+    assert metrics.to_dict()["llm"]["SyncOnlyService"]["requests"] == 2
+
+
+def test_instrumented_service_records_async_calls():
+    metrics = ConversionMetrics()
+    service = InstrumentedService(EchoService(), metrics)
+    processor = RecordingProcessor(["a"])
+    meta = LLMSimpleBlockMetaProcessor(
+        [processor], service, {"use_llm": True, "disable_tqdm": True}
+    )
+    meta(None)
+
+    assert [text for text, _ in processor.responses] == ["a"]
+    assert metrics.to_dict()["llm"]["EchoService"]["requests"] == 1
+
+
+class TextSchema(BaseModel):
+    text: str
+
+
+class BatchingService(BaseService):
+    def __init__(self, config=None, drop_last: bool = False, short_by: int = 0):
+        super().__init__(config)
+        self.drop_last = drop_last
+        self.short_by = short_by
+        self.image_counts = []
+
+    def request(self, prompt, images, block, response_schema, timeout):
+        self.image_counts.append(len(images))
+        if block is not None:
+            block.update_metadata(llm_request_count=1, llm_tokens_used=10)
+        if "results" not in response_schema.model_fields:
+            return {"text": "single"}, None
+        results = [{"text": f"batched {i}"} for i in range(len(images) - self.short_by)]
+        if self.drop_last:
+            results[-1] = {"wrong": "shape"}
+        return {"results": results}, None
+
+
+class ImageProcessor(RecordingProcessor):
+    def __init__(self, prompts, config=None, blocks=None):
+        super().__init__(prompts, config)
+        self.blocks = blocks or [None] * len(prompts)
+
+    def block_prompts(self, document):
+        return [
+            {
+                "prompt": prompt,
+                "image": Image.new("RGB", (4, 4)),
+                "block": block,
+                "schema": TextSchema,
+                "page": SimpleNamespace(page_id=page_id),
+            }
+            for (prompt, page_id), block in zip(self.prompts, self.blocks)
+        ]
+
+
+def test_meta_processor_packs_blocks():
+    service = BatchingService(drop_last=True)
+    processor = ImageProcessor([("a", 0), ("b", 0), ("c", 0), ("d", 1)])
+    meta = LLMSimpleBlockMetaProcessor(
+        [processor],
+        service,
+        {"use_llm": True, "disable_tqdm": True, "max_blocks_per_request": 3},
+    )
+    meta(None)
+
+    # Blocks on page 0 share a request, and the block that didn't parse is sent again
+    assert sorted(service.image_counts) == [1, 1, 3]
+    assert [text for text, _ in processor.responses] == [
+        "batched 0",
+        "batched 1",
+        "single",
+        "single",
+    ]
+
+
+@pytest.mark.parametrize("short_by", [1, 3])
+def test_meta_processor_resends_short_batches(short_by):
+    blocks = [
+        Line(polygon=PolygonBox.from_bbox([0, 0, 10, 10]), page_id=0, block_id=i)
+        for i in range(3)
+    ]
+    service = BatchingService(short_by=short_by)
+    processor = ImageProcessor([("a", 0), ("b", 0), ("c", 0)], blocks=blocks)
+    meta = LLMSimpleBlockMetaProcessor(
+        [processor],
+        service,
+        {"use_llm": True, "disable_tqdm": True, "max_blocks_per_request": 3},
+    )
+    meta(None)
+
+    # A response with missing or the wrong number of results is thrown away, and every block is sent on its own
+    assert sorted(service.image_counts) == [1, 1, 1, 3]
+    assert [text for text, _ in processor.responses] == ["single"] * 3
+
+    # The packed request is spread across its blocks
+    assert sum(b.metadata.llm_request_count for b in blocks) == 4
+    assert sum(b.metadata.llm_tokens_used for b in blocks) == 40
+    assert all(b.metadata.llm_tokens_used > 10 for b in blocks)
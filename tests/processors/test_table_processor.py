@@ -5,7 +5,7 @@ from marker.renderers.json import JSONRenderer
 
 from marker.renderers.markdown import MarkdownRenderer
 from marker.schema import BlockTypes
-from marker.processors.table import TableProcessor
+from marker.processors.table import TableProcessor, TextLayerTableProcessor
 from marker.schema.blocks import TableCell
 
 
@@ -77,3 +77,40 @@ def test_split_rows(pdf_document, detection_model, recognition_model, table_rec_
     assert unique_rows == 6
 
 
+
+
+@pytest.mark.config({"page_range": [5]})
+def test_text_layer_table_processor(pdf_document):
+    processor = TextLayerTableProcessor()
+    processor(pdf_document)
+
+    tables = pdf_document.contained_blocks((BlockTypes.Table,))
+    assert len(tables) == 2
+    for table in tables:
+        cells = table.contained_blocks(pdf_document, (BlockTypes.TableCell,))
+        assert len(cells) > 0
+
+    renderer = MarkdownRenderer()
+    table_output = renderer(pdf_document)
+    assert "Schedule" in table_output.markdown
+
+
+def test_text_layer_table_cells():
+    text_lines = [
+        {"text": "Year", "bbox": [0, 0, 20, 10]},
+        {"text": "Revenue", "bbox": [100, 0, 140, 10]},
+        {"text": "2023", "bbox": [0, 15, 20, 25]},
+        {"text": "1,700", "bbox": [100, 15, 125, 25]},
+        {"text": "Total for all years", "bbox": [0, 30, 130, 40]},
+    ]
+    cells = TextLayerTableProcessor().build_cells(text_lines)
+
+    assert [(c["row_id"], c["col_id"], c["colspan"]) for c in cells] == [
+        (0, 0, 1),
+        (0, 1, 1),
+        (1, 0, 1),
+        (1, 1, 1),
+        (2, 0, 2),
+    ]
+    assert cells[3]["text_lines"] == ["1,700"]
+    assert cells[4]["text_lines"] == ["Total for all years"]
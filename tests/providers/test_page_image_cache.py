@@ -0,0 +1,34 @@
+from PIL import Image
+
+from marker.providers import PageImageCache
+
+
+class FakeProvider:
+    def __init__(self):
+        self.renders = 0
+
+    def get_images(self, idxs, dpi):
+        self.renders += len(idxs)
+        return [Image.new("RGB", (10, 10)) for _ in idxs]
+
+
+def test_derived_images_share_page_budget():
+    provider = FakeProvider()
+    # Room for two pages and their crops, at 300 bytes an image
+    cache = PageImageCache(provider, max_bytes=1500)
+
+    for key in range(3):
+        cache.get_derived(0, 96, key, lambda image: image.copy())
+    assert cache.total_bytes == 1200
+
+    cache.get(1, 96)
+    assert list(cache.images) == [(0, 96), (1, 96)]
+
+    # Crops of page 1 push out page 0, along with its crops
+    cache.get_derived(1, 96, "crop", lambda image: image.copy())
+    assert list(cache.images) == [(1, 96)]
+    assert (0, 96) not in cache.derived
+    assert cache.total_bytes == 600
+
+    cache.evict()
+    assert cache.total_bytes == 0
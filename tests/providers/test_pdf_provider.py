@@ -1,4 +1,10 @@
+import os
+
 import pytest
+from ftfy import fix_text
+
+from marker.providers import PagePlan
+from marker.providers.pdf import PdfProvider
 
 
 @pytest.mark.config({"page_range": [0]})
@@ -15,3 +21,49 @@ def test_pdf_provider(doc_provider):
     assert spans[0].text == "Subspace Adversarial Training"
     assert spans[0].font == "NimbusRomNo9L-Medi"
     assert spans[0].formats == ["plain"]
+
+
+@pytest.mark.config({"page_range": [0, 1, 2, 3], "render_workers": 2, "render_worker_page_threshold": 2})
+def test_pdf_provider_parallel_render(doc_provider):
+    images = doc_provider.get_images_for_dpis([0, 1, 2, 3], [96, 192])
+    assert [image.size for image in images[96]] == [(816, 1056)] * 4
+    assert [image.size for image in images[192]] == [(1632, 2112)] * 4
+
+    doc_provider.render_workers = 1
+    serial_images = doc_provider.get_images([0, 1, 2, 3], 96)
+    assert all(a.tobytes() == b.tobytes() for a, b in zip(images[96], serial_images))
+
+    doc_provider.downsample_images = True
+    downsampled = doc_provider.get_images_for_dpis([0], [96, 192])
+    assert downsampled[96][0].size == (816, 1056)
+
+
+@pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="Shared memory blocks are only listed in /dev/shm")
+@pytest.mark.config({"page_range": [0, 1, 2, 3], "render_workers": 2, "render_worker_page_threshold": 1})
+def test_pdf_provider_parallel_render_error_unlinks_images(doc_provider):
+    before = set(os.listdir("/dev/shm"))
+    # The second worker fails after writing page 2, while the first one succeeds
+    with pytest.raises(Exception):
+        doc_provider.get_images_for_dpis([0, 1, 2, 1000], [96, 192])
+    assert set(os.listdir("/dev/shm")) - before == set()
+
+
+@pytest.mark.config({"page_range": [0]})
+def test_pdf_provider_page_plan(doc_provider):
+    assert doc_provider.page_stats[0]["text_objects"] > 0
+    assert doc_provider.get_page_plan(0) == PagePlan.text
+
+
+@pytest.mark.filename("handwritten.pdf")
+@pytest.mark.config({"page_range": [0]})
+def test_pdf_provider_scanned_page_plan(doc_provider):
+    assert doc_provider.get_page_plan(0) == PagePlan.ocr
+
+
+def test_fix_span_texts():
+    # Only reads config, so no file is needed
+    provider = PdfProvider.__new__(PdfProvider)
+    texts = ["plain text", "Ã©t&eacute;", "a\nb", "<b>&amp;</b>", "\ufb01\u00a0x", "\u201cq\u201d"]
+    assert provider.fix_span_texts(texts) == [
+        PdfProvider.normalize_spaces(fix_text(text)) for text in texts
+    ]
@@ -0,0 +1,28 @@
+import random
+import re
+
+from marker.providers.utils import alphanum_ratio, text_stats
+
+CHARS = "ab1 \n\t 　 é漢�!."
+
+
+def test_text_stats_matches_regex():
+    rng = random.Random(0)
+    texts = ["", " ", "\n\n", "abc", "\ud800 a"] + [
+        "".join(rng.choice(CHARS) for _ in range(rng.randint(1, 50)))
+        for _ in range(500)
+    ]
+
+    for text in texts:
+        stats = text_stats(text, (chr(0xFFFD), "�"))
+        assert stats.length == len(text)
+        assert stats.whitespace_runs == len(re.findall(r"\s+", text))
+        assert stats.non_whitespace == len(re.sub(r"\s+", "", text))
+        assert stats.newline_runs == len(re.findall(r"\n+", text))
+        assert stats.non_newlines == len(re.sub(r"\n+", "", text))
+        assert stats.invalid_chars == text.count("�")
+
+        ratio = 1
+        if stats.non_space_newline > 0:
+            ratio = stats.alphanumeric / stats.non_space_newline
+        assert ratio == alphanum_ratio(text)
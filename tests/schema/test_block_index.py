@@ -0,0 +1,92 @@
+import pytest
+
+from marker.schema.blocks import Text
+from marker.schema.document import Document
+from marker.schema.groups.page import PageGroup
+from marker.schema.polygon import PolygonBox
+
+
+def make_document(page_count: int = 3, blocks_per_page: int = 4) -> Document:
+    pages = []
+    for page_id in range(page_count):
+        page = PageGroup(page_id=page_id, polygon=PolygonBox.from_bbox([0, 0, 612, 792]))
+        for i in range(blocks_per_page):
+            page.add_structure(page.add_block(Text, PolygonBox.from_bbox([0, i, 10, i + 1])))
+        pages.append(page)
+    return Document(filepath="test.pdf", pages=pages)
+
+
+def test_structure_index():
+    document = make_document()
+    page = document.pages[0]
+    blocks = page.structure_blocks(page)
+
+    assert document.get_next_block(blocks[1]) is blocks[2]
+    assert document.get_next_block(blocks[-1]) is document.pages[1].structure_blocks(document.pages[1])[0]
+    assert document.get_prev_block(blocks[0]) is None
+
+    # Index is kept up to date by the structure methods
+    page.update_structure_item(blocks[1].id, blocks[3].id)
+    assert page.structure_position(blocks[3].id) == 1
+    page.remove_structure_items([blocks[3].id])
+    assert page.structure_position(blocks[2].id) == 1
+
+    # And rebuilt when the structure is changed directly
+    page.structure.insert(0, page.structure.pop())
+    assert page.structure_position(blocks[2].id) == 0
+    with pytest.raises(ValueError):
+        page.structure_position(blocks[1].id)
+
+
+def test_page_index():
+    document = make_document()
+    assert document.get_page(2) is document.pages[2]
+    assert document.get_next_page(document.pages[0]) is document.pages[1]
+
+    document.pages = document.pages[:2]
+    assert document.get_page(2) is None
+
+
+def test_contained_blocks_index():
+    from marker.schema import BlockTypes
+    from marker.schema.text.line import Line
+
+    document = make_document(page_count=1)
+    page = document.pages[0]
+    blocks = page.structure_blocks(page)
+    for block in blocks:
+        block.add_structure(page.add_block(Line, PolygonBox.from_bbox([0, 0, 10, 1])))
+
+    lines = page.contained_blocks(document, (BlockTypes.Line,))
+    assert len(lines) == 4
+    assert blocks[1].contained_blocks(document, (BlockTypes.Line,)) == [lines[1]]
+
+    # Changing a structure in place or removing a block invalidates the index
+    blocks[1].structure.pop()
+    blocks[2].removed = True
+    assert page.contained_blocks(document, (BlockTypes.Line,)) == [lines[0], lines[3]]
+    assert page.contained_blocks(document) == page.walk_contained_blocks(document)
+
+
+def test_contained_blocks_index_per_document():
+    documents = [make_document(page_count=1), make_document(page_count=1)]
+    pages = [document.pages[0] for document in documents]
+
+    def index(i):
+        pages[i].contained_blocks(documents[i])
+        return pages[i].__dict__["_contained_index"]
+
+    first, second = index(0), index(1)
+
+    # Changing one document leaves the other document's index in place
+    pages[0].structure_blocks(pages[0])[0].removed = True
+    assert not first.is_valid(documents[0])
+    assert second.is_valid(documents[1])
+    first = index(0)
+
+    pages[1].structure.pop()
+    assert not second.is_valid(documents[1])
+    assert first.is_valid(documents[0])
+
+    assert len(pages[0].contained_blocks(documents[0])) == 3
+    assert len(pages[1].contained_blocks(documents[1])) == 3
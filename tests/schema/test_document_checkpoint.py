@@ -0,0 +1,66 @@
+import pytest
+
+from marker.checkpoint import load_document, save_document
+from marker.providers import LazyPageImage
+from marker.renderers.markdown import MarkdownRenderer
+from marker.schema.document import Document
+from marker.schema.groups.page import PageGroup
+from marker.schema.polygon import PolygonBox
+
+
+@pytest.mark.config({"page_range": [0, 1]})
+@pytest.mark.parametrize("external_images", [False, True])
+def test_document_checkpoint(pdf_document, tmp_path, external_images):
+    path = str(tmp_path / "document.ckpt")
+    save_document(pdf_document, path, external_images=external_images)
+    loaded = load_document(path)
+
+    assert len(loaded.pages) == len(pdf_document.pages)
+    assert isinstance(loaded.pages[0].highres_image, LazyPageImage)
+    assert (
+        loaded.pages[1].get_image(highres=True).size
+        == pdf_document.pages[1].get_image(highres=True).size
+    )
+    assert MarkdownRenderer()(loaded).markdown == MarkdownRenderer()(pdf_document).markdown
+
+
+@pytest.mark.config({"page_range": [0]})
+def test_checkpoint_references_unrendered_pages(pdf_document, tmp_path):
+    image_cache = pdf_document.pages[0].highres_image.cache
+    size = pdf_document.pages[0].get_image(highres=True).size
+    image_cache.evict()
+
+    path = str(tmp_path / "document.ckpt")
+    save_document(pdf_document, path, reference_source_images=True)
+    assert len(image_cache.images) == 0
+
+    # The page is rendered from the source pdf once it is needed
+    loaded = load_document(path)
+    assert loaded.pages[0].get_image(highres=True).size == size
+
+
+@pytest.mark.config({"page_range": [0]})
+def test_checkpoint_embeds_unrendered_pages(pdf_document, tmp_path):
+    pdf_document.pages[0].highres_image.cache.evict()
+
+    path = str(tmp_path / "document.ckpt")
+    save_document(pdf_document, path)
+
+    # Checkpoints don't depend on the source file by default
+    loaded = load_document(path)
+    assert loaded.pages[0].highres_image.cache.provider.source is None
+    assert loaded.pages[0].get_image(highres=True) is not None
+
+
+def test_checkpoint_refuses_other_versions(tmp_path, monkeypatch):
+    document = Document(
+        filepath="test.pdf",
+        pages=[PageGroup(page_id=0, polygon=PolygonBox.from_bbox([0, 0, 612, 792]))],
+    )
+    path = str(tmp_path / "document.ckpt")
+    save_document(document, path)
+    assert len(load_document(path).pages) == 1
+
+    monkeypatch.setattr("marker.checkpoint.marker_version", lambda: "0.0.0")
+    with pytest.raises(ValueError, match="marker"):
+        load_document(path)
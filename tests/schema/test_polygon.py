@@ -0,0 +1,12 @@
+from marker.schema.polygon import PolygonBox
+
+
+def test_polygon_from_bbox():
+    box = PolygonBox.from_bbox([1, 2, 1, 5], ensure_nonzero_area=True)
+    validated = PolygonBox(polygon=[[1, 2], [2, 2], [2, 5], [1, 5]])
+
+    # The unvalidated fast path matches a validated box, down to float coordinates
+    assert box == validated
+    assert box.model_dump() == validated.model_dump()
+    assert box.bbox == [1.0, 2.0, 2.0, 5.0]
+    assert box.merge([PolygonBox.from_bbox([0, 0, 1, 1])]).bbox == [0.0, 0.0, 2.0, 5.0]
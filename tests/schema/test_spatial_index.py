@@ -0,0 +1,61 @@
+import random
+
+import numpy as np
+
+from marker.schema.polygon import PolygonBox
+from marker.util import SpatialIndex, matrix_intersection_area
+
+
+def random_bboxes(rng: random.Random, count: int):
+    bboxes = []
+    for _ in range(count):
+        x, y = rng.uniform(0, 1000), rng.uniform(0, 1000)
+        bboxes.append([x, y, x + rng.uniform(0, 300), y + rng.uniform(0, 50)])
+    return bboxes
+
+
+def test_spatial_index_matches_dense():
+    rng = random.Random(0)
+    queries = random_bboxes(rng, 50)
+    bboxes = random_bboxes(rng, 200)
+    index = SpatialIndex(bboxes)
+    intersections = matrix_intersection_area(queries, bboxes)
+
+    for query, row in zip(queries, intersections):
+        idxs, areas = index.intersection_areas(query)
+        assert idxs.tolist() == np.nonzero(row)[0].tolist()
+        assert areas.tolist() == row[row > 0].tolist()
+
+        max_idx, max_area = index.max_intersection(query)
+        if row.sum() == 0:
+            assert max_idx is None
+        else:
+            assert max_idx == row.argmax()
+            assert max_area == row.max()
+
+
+def test_spatial_index_contained():
+    index = SpatialIndex([[0, 0, 10, 10], [5, 5, 25, 25], [100, 100, 110, 110]])
+    assert index.contained([0, 0, 30, 30], 0.95) == [0, 1]
+    assert index.contained([4, 4, 30, 30], 0.95) == [1]
+
+
+def test_spatial_index_nearest():
+    rng = random.Random(1)
+    bboxes = random_bboxes(rng, 100)
+    index = SpatialIndex(bboxes)
+    polygons = [PolygonBox.from_bbox(bbox) for bbox in bboxes]
+
+    for idx, polygon in enumerate(polygons):
+        _, gap = index.nearest(bboxes[idx], exclude=idx)
+        assert gap == min(
+            polygon.minimum_gap(other) for j, other in enumerate(polygons) if j != idx
+        )
+
+    # Moving a box is reflected in later queries
+    index.update(0, [5000, 5000, 5010, 5010])
+    nearest_idx, gap = index.nearest([5020, 5000, 5030, 5010])
+    assert nearest_idx == 0
+    assert gap == 10
+
+    assert SpatialIndex([[0, 0, 1, 1]]).nearest([0, 0, 1, 1], exclude=0) == (None, None)
@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import HTTPException
+
+from marker.scripts import server
+from marker.scripts.server import CommonParams, JobQueue, QueueFullError
+
+
+class FailingQueue(JobQueue):
+    def convert(self, job):
+        raise OSError("Could not encode images")
+
+
+class BlockingQueue(JobQueue):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def convert(self, job):
+        self.started.set()
+        self.release.wait(timeout=10)
+        return {"success": True}
+
+
+def test_job_fails_outside_conversion():
+    queue = FailingQueue({})
+    job = queue.submit(CommonParams(filepath="missing.pdf"))
+    result = job.future.result(timeout=10)
+
+    assert job.status == "failed"
+    assert result == {"success": False, "error": "Could not encode images"}
+    assert job.finished_at is not None
+    queue.shutdown()
+
+
+def test_full_queue_rejects_jobs(monkeypatch):
+    queue = BlockingQueue({}, workers=1, max_queue_depth=1)
+    monkeypatch.setitem(server.app_data, "queue", queue)
+    params = CommonParams(filepath="test.pdf")
+
+    running = queue.submit(params)
+    assert queue.started.wait(timeout=10)
+    queued = queue.submit(params)
+
+    with pytest.raises(QueueFullError):
+        queue.submit(params)
+    with pytest.raises(HTTPException) as e:
+        server.submit_job(params)
+    assert e.value.status_code == 429
+
+    queue.release.set()
+    assert running.future.result(timeout=10) == {"success": True}
+    assert queued.future.result(timeout=10) == {"success": True}
+    assert queued.status == "completed"
+    queue.shutdown()
@@ -0,0 +1,89 @@
+from io import BytesIO
+
+from PIL import Image
+from pydantic import BaseModel
+
+from marker.services import BaseService
+from marker.services.images import ImageEncoder
+
+
+class ImageService(BaseService):
+    pass
+
+
+def test_encoder_downscales_to_budget():
+    encoder = ImageEncoder("PNG", max_pixels=10_000)
+    data = encoder.encode(Image.new("RGB", (400, 100), "white"))
+
+    encoded = Image.open(BytesIO(data))
+    assert encoded.format == "PNG"
+    assert encoded.size == (200, 50)
+
+
+def test_encoder_reuses_bytes_for_identical_images(monkeypatch):
+    encoder = ImageEncoder("WEBP")
+    saves = []
+    original_save = Image.Image.save
+
+    def counting_save(self, *args, **kwargs):
+        saves.append(kwargs.get("format"))
+        return original_save(self, *args, **kwargs)
+
+    monkeypatch.setattr(Image.Image, "save", counting_save)
+
+    image = Image.new("RGB", (20, 20), "red")
+    first = encoder.encode(image)
+    assert encoder.encode(image.copy()) is first
+    assert encoder.encode(Image.new("RGB", (20, 20), "blue")) != first
+    assert saves == ["WEBP", "WEBP"]
+
+
+def test_encoder_evicts_oldest():
+    encoder = ImageEncoder("PNG", max_cache_bytes=1)
+    encoder.encode(Image.new("RGB", (20, 20), "red"))
+    encoder.encode(Image.new("RGB", (20, 20), "blue"))
+    assert len(encoder.encoded) == 1
+
+
+def test_service_image_settings():
+    service = ImageService({"image_format": "jpeg", "image_quality": 50})
+    assert service.image_mime_type() == "image/jpeg"
+
+    data = service.encode_image(Image.new("RGBA", (10, 10), "white"))
+    assert Image.open(BytesIO(data)).format == "JPEG"
+
+
+def test_images_hashed_once_per_request(tmp_path, monkeypatch):
+    from marker.services import images as images_module
+
+    hashes = []
+    original_digest = images_module.image_digest
+
+    def counting_digest(img):
+        hashes.append(img)
+        return original_digest(img)
+
+    monkeypatch.setattr(images_module, "image_digest", counting_digest)
+
+    class EncodingService(BaseService):
+        def request(self, prompt, images, block, response_schema, timeout):
+            return {"size": len(self.encode_image(images[0]))}, None
+
+    class Schema(BaseModel):
+        size: int
+
+    service = EncodingService({"llm_cache_dir": str(tmp_path)})
+    service("prompt", Image.new("RGB", (10, 10)), None, Schema)
+    assert len(hashes) == 1
+
+
+def test_cache_key_includes_image_encoding(tmp_path):
+    class Schema(BaseModel):
+        text: str
+
+    image = Image.new("RGB", (10, 10))
+    webp = ImageService({"llm_cache_dir": str(tmp_path)})
+    small = ImageService({"llm_cache_dir": str(tmp_path), "image_max_pixels": 50})
+    assert webp.cache_key("prompt", [image], Schema) != small.cache_key(
+        "prompt", [image], Schema
+    )
@@ -0,0 +1,65 @@
+import time
+
+from PIL import Image
+from pydantic import BaseModel
+
+from marker.cache import LLMResponseCache
+from marker.schema.text.line import Line
+from marker.schema.polygon import PolygonBox
+from marker.services import BaseService
+
+
+class ResponseSchema(BaseModel):
+    markdown: str
+
+
+class CountingService(BaseService):
+    calls = 0
+
+    def request(self, prompt, images, block, response_schema, timeout):
+        self.calls += 1
+        return {"markdown": prompt}, None
+
+
+def make_block():
+    return Line(
+        polygon=PolygonBox.from_bbox([0, 0, 10, 10]),
+        page_id=0,
+        block_id=0,
+    )
+
+
+def test_service_caches_responses(tmp_path):
+    service = CountingService({"llm_cache_dir": str(tmp_path)})
+    block = make_block()
+    image = Image.new("RGB", (10, 10), "white")
+
+    assert service("prompt", image, block, ResponseSchema) == {"markdown": "prompt"}
+    assert service("prompt", image.copy(), block, ResponseSchema) == {"markdown": "prompt"}
+    assert service.calls == 1
+
+    # A different image is a different request
+    service("prompt", Image.new("RGB", (10, 10), "black"), block, ResponseSchema)
+    assert service.calls == 2
+    assert block.metadata.llm_cache_hits == 1
+    assert block.metadata.llm_cache_misses == 2
+
+    # The cache is on disk, so a new service picks it up
+    other_service = CountingService({"llm_cache_dir": str(tmp_path)})
+    other_service("prompt", image, block, ResponseSchema)
+    assert other_service.calls == 0
+
+
+def test_response_cache_ttl_and_size(tmp_path):
+    cache = LLMResponseCache(str(tmp_path), ttl_days=1)
+    cache.set("key", {"a": 1})
+    assert cache.get("key") == {"a": 1}
+
+    cache.ttl = 0
+    time.sleep(0.01)
+    assert cache.get("key") is None
+
+    cache = LLMResponseCache(str(tmp_path / "small"), max_size_mb=0)
+    cache.set("key", {"a": 1})
+    cache.evict()
+    assert cache.get("key") is None
@@ -0,0 +1,98 @@
+import threading
+import time
+
+from marker.services import BaseService
+from marker.services.scheduler import LLMScheduler, RetryableError, TokenBucket
+
+
+class CountingRequest:
+    def __init__(self, rate_limited_calls: int = 0):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+        self.rate_limited_calls = rate_limited_calls
+
+    def __call__(self, value):
+        with self.lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            rate_limited = self.calls <= self.rate_limited_calls
+        time.sleep(0.01)
+        with self.lock:
+            self.in_flight -= 1
+        if rate_limited:
+            raise RetryableError("429")
+        return {"value": value}, 10
+
+
+def test_scheduler_limits_concurrency():
+    request = CountingRequest()
+    scheduler = LLMScheduler(max_concurrency=4, initial_concurrency=2)
+    futures = [scheduler.submit(request, i) for i in range(20)]
+
+    assert [f.result()["value"] for f in futures] == list(range(20))
+    assert request.max_in_flight <= 4
+    # Concurrency grows while requests succeed
+    assert scheduler.concurrency > 2
+
+
+def test_scheduler_backs_off_and_retries():
+    request = CountingRequest(rate_limited_calls=1)
+    scheduler = LLMScheduler(max_concurrency=4, initial_concurrency=4, retry_wait_time=0.01)
+    assert scheduler.submit(request, 1, max_retries=2).result() == {"value": 1}
+    assert request.calls == 2
+
+    request = CountingRequest(rate_limited_calls=10)
+    scheduler = LLMScheduler(max_concurrency=4, initial_concurrency=4, retry_wait_time=0.01)
+    assert scheduler.submit(request, 1, max_retries=2, default={}).result() == {}
+    assert request.calls == 2
+    # Each rate limited attempt halves the limit
+    assert scheduler.concurrency == 1
+
+
+def test_token_bucket_wait_time():
+    bucket = TokenBucket(per_minute=60)
+    now = bucket.updated
+    assert bucket.wait_time(60, now) == 0
+    bucket.take(60)
+    assert bucket.wait_time(2, now) == 2
+    # Requests bigger than the bucket wait for it to fill
+    assert bucket.wait_time(120, now) == 60
+
+
+class EchoService(BaseService):
+    def request(self, prompt, images, block, response_schema, timeout):
+        return {"prompt": prompt, "images": len(images)}, None
+
+
+def test_service_requests_go_through_scheduler():
+    service = EchoService({"max_concurrency": 2})
+    assert service("prompt", None, None, None) == {"prompt": "prompt", "images": 1}
+    assert service.get_scheduler().max_concurrency == 2
+
+
+def test_scheduler_close_stops_threads():
+    scheduler = LLMScheduler(max_concurrency=2, requests_per_minute=1)
+    first = scheduler.submit(CountingRequest(), 1)
+    assert first.result() == {"value": 1}
+    # The bucket is empty, so this one stays queued
+    queued = scheduler.submit(CountingRequest(), 2, default={})
+    dispatcher = scheduler.dispatcher
+
+    scheduler.close()
+    dispatcher.join(timeout=5)
+    assert not dispatcher.is_alive()
+    assert queued.result(timeout=5) == {}
+
+
+def test_service_close_releases_scheduler():
+    service = EchoService()
+    service("prompt", None, None, None)
+    dispatcher = service.scheduler.dispatcher
+
+    service.close()
+    dispatcher.join(timeout=5)
+    assert not dispatcher.is_alive()
+    assert service.scheduler is None